@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""Benchmark the hashed n-gram fallback embedder against the old character-frequency one.
+
+Usage:
+    python benchmarks/bench_fallback_embedder.py --texts 2000 --length 500
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.hashed_embedder import HashedNgramEmbedder
+
+WORDS = [
+    'def', 'class', 'return', 'import', 'self', 'process_repository', 'vector_store', 'embedding',
+    'index', 'search', 'config', 'path', 'file', 'for', 'in', 'if', 'else', 'None', 'True', 'value',
+    'getUserName', 'HTTP_TIMEOUT', 'json', 'request', 'response', '(', ')', ':', '=', '.', ',',
+]
+
+
+def legacy_simple_embedding(text: str) -> np.ndarray:
+    """The previous EmbeddingModel._simple_embedding, kept verbatim for comparison"""
+    chars = set(''.join(c.lower() for c in text if c.isalnum()))
+    embedding = np.zeros(768)
+    for i, c in enumerate(chars):
+        embedding[hash(c) % 768] = text.lower().count(c) / len(text)
+    return embedding / (np.linalg.norm(embedding) + 1e-8)
+
+
+def make_texts(count: int, length: int, seed: int = 0):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        parts = []
+        size = 0
+        while size < length:
+            word = rng.choice(WORDS)
+            parts.append(word)
+            size += len(word) + 1
+        texts.append(' '.join(parts))
+    return texts
+
+
+def time_it(func, repeats: int):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def fingerprint(method: str) -> str:
+    """Embed a fixed text in a fresh interpreter and return a digest of the vector"""
+    code = (
+        "import sys, hashlib, numpy as np; sys.path.insert(0, %r);"
+        "from benchmarks.bench_fallback_embedder import legacy_simple_embedding;"
+        "from models.hashed_embedder import HashedNgramEmbedder;"
+        "t = 'def process_repository(self, repo_path): return self.index';"
+        "v = legacy_simple_embedding(t) if %r == 'legacy' else HashedNgramEmbedder().embed([t])[0];"
+        "print(hashlib.sha256(np.asarray(v, dtype='float32').tobytes()).hexdigest())"
+    ) % (os.path.dirname(os.path.dirname(os.path.abspath(__file__))), method)
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fallback embedder benchmark')
+    parser.add_argument('--texts', type=int, default=2000, help='Number of texts to embed')
+    parser.add_argument('--length', type=int, default=500, help='Approximate characters per text')
+    parser.add_argument('--repeats', type=int, default=3, help='Timing repetitions (best is reported)')
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts, args.length)
+    embedder = HashedNgramEmbedder()
+
+    legacy_seconds = time_it(lambda: np.array([legacy_simple_embedding(t) for t in texts]), args.repeats)
+    hashed_seconds = time_it(lambda: embedder.embed(texts), args.repeats)
+
+    # Determinism across processes (PYTHONHASHSEED differs per interpreter by default)
+    legacy_prints = {fingerprint('legacy') for _ in range(3)}
+    hashed_prints = {fingerprint('hashed') for _ in range(3)}
+
+    print(json.dumps({
+        'texts': args.texts,
+        'chars_per_text': args.length,
+        'legacy': {
+            'seconds': round(legacy_seconds, 4),
+            'texts_per_second': round(args.texts / legacy_seconds, 1),
+            'stable_across_processes': len(legacy_prints) == 1,
+        },
+        'hashed_ngram': {
+            'seconds': round(hashed_seconds, 4),
+            'texts_per_second': round(args.texts / hashed_seconds, 1),
+            'stable_across_processes': len(hashed_prints) == 1,
+        },
+        'speedup': round(legacy_seconds / hashed_seconds, 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""Compare recall and search latency of the VectorStore index types.
+
+Usage:
+    python benchmarks/bench_index_types.py --vectors 50000 --dimension 384 --k 10
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.vector_store import VectorStore
+
+CONFIGS = [
+    {'index_type': 'flat'},
+    {'index_type': 'ivf_flat'},
+    {'index_type': 'ivf_pq'},
+    {'index_type': 'hnsw'},
+]
+
+
+def make_vectors(count: int, dimension: int, clusters: int, seed: int = 0):
+    """Clustered Gaussian data, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype('float32')
+    labels = rng.integers(0, clusters, count)
+    return (centers[labels] + 0.35 * rng.normal(size=(count, dimension))).astype('float32')
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int, metric: str) -> np.ndarray:
+    """True top-k IDs from the raw vectors (IDs are insertion order)"""
+    if metric == 'cosine':
+        vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    if metric == 'l2':
+        scores = -((queries ** 2).sum(1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(1)[None, :])
+    else:
+        scores = queries @ vectors.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vector index benchmark')
+    parser.add_argument('--vectors', type=int, default=50000, help='Number of stored vectors')
+    parser.add_argument('--queries', type=int, default=500, help='Number of queries')
+    parser.add_argument('--dimension', type=int, default=384, help='Vector dimension')
+    parser.add_argument('--clusters', type=int, default=100, help='Number of synthetic clusters')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours per query')
+    parser.add_argument('--metric', default='cosine', choices=VectorStore.METRICS)
+    parser.add_argument('--batch', type=int, default=1000, help='Vectors added per add_documents call')
+    args = parser.parse_args()
+
+    data = make_vectors(args.vectors + args.queries, args.dimension, args.clusters)
+    vectors, queries = data[:args.vectors], data[args.vectors:]
+    documents = [{'content': '', 'source': str(i)} for i in range(args.vectors)]
+    ground_truth = exact_neighbours(vectors, queries, args.k, args.metric)
+
+    results = []
+    for config in CONFIGS:
+        store = VectorStore(dimension=args.dimension, metric=args.metric, **config)
+        start = time.perf_counter()
+        for offset in range(0, args.vectors, args.batch):
+            store.add_documents(documents[offset:offset + args.batch], vectors[offset:offset + args.batch])
+        build_seconds = time.perf_counter() - start
+
+        report = store.evaluate(queries, k=args.k, ground_truth=ground_truth)
+        report['requested_index_type'] = config['index_type']
+        report['build_seconds'] = round(build_seconds, 3)
+        results.append(report)
+
+    print(json.dumps({
+        'vectors': args.vectors,
+        'queries': args.queries,
+        'dimension': args.dimension,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+"""Retrieval quality and latency of the full ingestion and search path, for one or two configurations.
+
+A labelled repository is ingested through RepositoryHandler -> Chunker ->
+EmbeddingModel -> VectorStore (via IngestionPipeline) and every question is
+searched. The report gives recall@k and MRR over expected files, ingestion
+throughput and search latency percentiles as JSON.
+
+By default a synthetic repository is generated (deterministic for a seed);
+``--write-fixture DIR`` pins it to DIR/repo and DIR/questions.json, and ``--repo DIR`` benchmarks a
+fixture repository whose ``--questions`` file is a JSON list of
+``{"question": ..., "expected": ["path/in/repo", ...]}``.
+
+Configurations are JSON objects (inline or a path to a .json file) with any of
+model_name, chunk_size, chunk_overlap, index_type, metric, hybrid, mmr_lambda
+and deduplicate. Sentence-transformers models load from the local cache only;
+without sentence-transformers the hashed n-gram embedder is used.
+
+Usage:
+    python benchmarks/bench_retrieval.py --files 300
+    python benchmarks/bench_retrieval.py --baseline '{"hybrid": false}' --candidate '{"hybrid": true}'
+    python benchmarks/bench_retrieval.py --repo fixtures/shop/repo --questions fixtures/shop/questions.json --output report.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+# Never reach out to the model hub; only locally cached models are used
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.embeddings import EmbeddingModel
+from utils.chunker import Chunker
+from utils.ingestion import IngestionPipeline
+from utils.repo_handler import RepositoryHandler
+from utils.vector_store import VectorStore
+
+DEFAULT_CONFIG = {
+    'model_name': 'all-MiniLM-L6-v2',
+    'chunk_size': 500,
+    'chunk_overlap': None,
+    'index_type': 'flat',
+    'metric': 'l2',
+    'hybrid': True,
+    'mmr_lambda': None,
+    'deduplicate': True,
+}
+
+DOMAINS = ['billing', 'shipping', 'accounts', 'search', 'catalog', 'reports', 'media', 'scheduler',
+           'notifications', 'inventory', 'payments', 'analytics']
+ACTIONS = ['validate', 'parse', 'compute', 'render', 'sync', 'retry', 'export', 'merge', 'encode',
+           'archive', 'refresh', 'reconcile']
+# How a person might ask for each action without using its name
+SYNONYMS = {'validate': 'check', 'parse': 'read in', 'compute': 'work out', 'render': 'draw', 'sync': 'mirror',
+            'retry': 'try again on', 'export': 'dump', 'merge': 'combine', 'encode': 'serialise',
+            'archive': 'put away', 'refresh': 'reload', 'reconcile': 'match up'}
+OBJECTS = ['invoice', 'token', 'order', 'session', 'query', 'payload', 'address', 'thumbnail', 'batch',
+           'ledger', 'coupon', 'webhook', 'receipt', 'profile', 'forecast', 'manifest']
+DETAILS = ['exponential backoff', 'a checksum of the raw bytes', 'the tenant time zone', 'a rolling window',
+           'optimistic locking', 'a bloom filter', 'rounding to the nearest cent', 'an LRU cache',
+           'a dead letter queue', 'gzip compression', 'ISO week numbers', 'a signed URL',
+           'a two phase commit', 'idempotency keys', 'a priority heap', 'utf-8 normalisation']
+
+BOILERPLATE = '''import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _log_call(name, **fields):
+    """Shared tracing helper copied into every module"""
+    logger.debug("%s %s", name, fields)
+'''
+
+
+def camel(*words):
+    return ''.join(word.capitalize() for word in words)
+
+
+def generate_repository(path: str, files: int, seed: int = 0):
+    """Write a synthetic repository into ``path`` and return its labelled questions.
+
+    Every module implements one (domain, action, object) operation with a
+    distinctive implementation detail. Modules share boilerplate and other
+    modules use the same action or object names, so a question has to be
+    matched on the right combination. Each module gets one question naming
+    its function and one paraphrasing its behaviour in plain words; each
+    (object, detail) pair gets one question whose answer is every module
+    sharing it.
+    """
+    rng = random.Random(seed)
+    combinations = [(d, a, o) for d in DOMAINS for a in ACTIONS for o in OBJECTS]
+    rng.shuffle(combinations)
+    questions = []
+    by_detail = {}
+
+    for domain, action, obj in combinations[:files]:
+        detail = rng.choice(DETAILS)
+        helper_action, helper_object = rng.choice(ACTIONS), rng.choice(OBJECTS)
+        function = f'{action}_{obj}'
+        rel_path = f'{domain}/{function}.py'
+        body = f'''{BOILERPLATE}
+
+class {camel(domain, obj)}{camel(action)}er:
+    """{action.capitalize()}s {domain} {obj} records using {detail}."""
+
+    def __init__(self, store, limit=100):
+        self.store = store
+        self.limit = limit
+
+    def {function}(self, {obj}_id):
+        """{action.capitalize()} one {obj} of the {domain} service; relies on {detail}."""
+        _log_call("{function}", {obj}_id={obj}_id)
+        record = self.store.get("{domain}", {obj}_id)
+        if record is None:
+            raise KeyError({obj}_id)
+        return self._{helper_action}_{helper_object}(record)
+
+    def {function}_all(self, ids):
+        return [self.{function}(i) for i in ids[:self.limit]]
+
+    def _{helper_action}_{helper_object}(self, record):
+        # Internal step, named after an unrelated operation on purpose
+        record["{helper_object}_state"] = "{helper_action}"
+        return record
+'''
+        full_path = os.path.join(path, rel_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w', encoding='utf-8') as f:
+            f.write(body)
+
+        questions.append({'question': f'Where is {function} implemented for {domain}?',
+                          'expected': [rel_path], 'kind': 'identifier'})
+        questions.append({'question': f'How does the {domain} code {SYNONYMS[action]} a {obj}?',
+                          'expected': [rel_path], 'kind': 'paraphrase'})
+        by_detail.setdefault((obj, detail), []).append(rel_path)
+
+    for (obj, detail), paths in sorted(by_detail.items()):
+        questions.append({'question': f'Which code relies on {detail} when handling a {obj}?',
+                          'expected': sorted(paths), 'kind': 'shared_detail'})
+
+    # Unlabelled prose that mentions many names, as READMEs do
+    with open(os.path.join(path, 'README.md'), 'w', encoding='utf-8') as f:
+        f.write('# Synthetic service\n\n')
+        for domain in DOMAINS:
+            f.write(f'## {domain.capitalize()}\n\nThe {domain} package can '
+                    + ', '.join(f'{rng.choice(ACTIONS)} a {rng.choice(OBJECTS)}' for _ in range(6)) + '.\n\n')
+
+    return questions
+
+
+def load_config(value):
+    """A configuration from inline JSON or a .json file, over the defaults"""
+    if value is None:
+        return None
+    if os.path.isfile(value):
+        with open(value, encoding='utf-8') as f:
+            overrides = json.load(f)
+    else:
+        overrides = json.loads(value)
+    unknown = set(overrides) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown configuration keys: {sorted(unknown)}")
+    return {**DEFAULT_CONFIG, **overrides}
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        'p50': round(float(np.percentile(samples, 50)), 3),
+        'p95': round(float(np.percentile(samples, 95)), 3),
+        'p99': round(float(np.percentile(samples, 99)), 3),
+        'mean': round(float(samples.mean()), 3),
+    }
+
+
+def ranked_files(results):
+    """Distinct files in result order; aliased duplicates count as retrieved too"""
+    files = []
+    for result in results:
+        for source in [result['source']] + [alias['source'] for alias in result.get('aliases', [])]:
+            if source not in files:
+                files.append(source)
+    return files
+
+
+def run_config(name, config, repo_dir, questions, ks, repeats, embedding_models):
+    """Ingest the repository with one configuration and evaluate its questions"""
+    model_name = config['model_name']
+    if model_name not in embedding_models:
+        embedding_models[model_name] = EmbeddingModel(model_name=model_name)
+    embedding_model = embedding_models[model_name]
+
+    store = VectorStore(dimension=embedding_model.dimension, index_type=config['index_type'],
+                        metric=config['metric'], hybrid=config['hybrid'])
+    pipeline = IngestionPipeline(
+        repo_handler=RepositoryHandler(),
+        embedding_model=embedding_model,
+        vector_store=store,
+        chunker=Chunker(chunk_size=config['chunk_size'], chunk_overlap=config['chunk_overlap']),
+        deduplicate=config['deduplicate']
+    )
+    start = time.perf_counter()
+    stats = pipeline.run(repo_dir)
+    ingest_seconds = time.perf_counter() - start
+    repo_bytes = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(repo_dir) for f in files)
+
+    max_k = max(ks)
+    # Several chunks of one file may rank together, so fetch more chunks than files
+    chunk_k = max_k * 3
+    embed_times, search_times, total_times = [], [], []
+    hits = {k: 0.0 for k in ks}
+    reciprocal_ranks = []
+    by_kind = {}
+
+    # Warm up lazily built structures (lexical index, direct maps) outside the timings
+    store.search(embedding_model.embed_query(questions[0]['question']), k=chunk_k, max_chars=None,
+                 query_text=questions[0]['question'], mmr_lambda=config['mmr_lambda'])
+
+    for repeat in range(repeats):
+        for question in questions:
+            start = time.perf_counter()
+            query_vector = embedding_model.embed_query(question['question'])
+            embedded = time.perf_counter()
+            results = store.search(query_vector, k=chunk_k, max_chars=None, query_text=question['question'],
+                                   mmr_lambda=config['mmr_lambda'])
+            done = time.perf_counter()
+            embed_times.append(embedded - start)
+            search_times.append(done - embedded)
+            total_times.append(done - start)
+            if repeat:
+                continue
+
+            files = ranked_files(results)[:max_k]
+            expected = set(question['expected'])
+            for k in ks:
+                hits[k] += len(expected & set(files[:k])) / len(expected)
+            rank = next((i + 1 for i, path in enumerate(files) if path in expected), None)
+            reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+            kind = by_kind.setdefault(question.get('kind', 'all'), [])
+            kind.append(1.0 / rank if rank else 0.0)
+
+    count = len(questions)
+    return {
+        'name': name,
+        'config': config,
+        'embedding_model': embedding_model.model_id,
+        'index_type': store.index_type,
+        'ingestion': {
+            'seconds': round(ingest_seconds, 3),
+            'files': stats['files_indexed'],
+            'chunks_embedded': stats['chunks_embedded'],
+            'duplicate_chunks': stats['duplicate_chunks'],
+            'files_per_second': round(stats['files_indexed'] / ingest_seconds, 1),
+            'chunks_per_second': round((stats['chunks_embedded'] + stats['duplicate_chunks']) / ingest_seconds, 1),
+            'mb_per_second': round(repo_bytes / 1e6 / ingest_seconds, 3),
+        },
+        'retrieval': {
+            'questions': count,
+            **{f'recall@{k}': round(hits[k] / count, 4) for k in ks},
+            'mrr': round(sum(reciprocal_ranks) / count, 4),
+            'mrr_by_kind': {kind: round(sum(values) / len(values), 4) for kind, values in sorted(by_kind.items())},
+        },
+        'latency_ms': {
+            'samples': len(total_times),
+            'query_embedding': percentiles(embed_times),
+            'search': percentiles(search_times),
+            'end_to_end': percentiles(total_times),
+        },
+    }
+
+
+def compare(baseline, candidate):
+    """Candidate minus baseline for every headline number"""
+    def headline(report):
+        numbers = {key: value for key, value in report['retrieval'].items() if isinstance(value, float)}
+        numbers.update({f'ingestion_{key}': report['ingestion'][key]
+                        for key in ('seconds', 'files_per_second', 'chunks_per_second')})
+        numbers.update({f'search_{key}_ms': report['latency_ms']['end_to_end'][key] for key in ('p50', 'p95', 'p99')})
+        return numbers
+
+    base, cand = headline(baseline), headline(candidate)
+    return {key: {'baseline': base[key], 'candidate': cand[key], 'delta': round(cand[key] - base[key], 4)}
+            for key in base}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Retrieval quality and latency benchmark')
+    parser.add_argument('--files', type=int, default=200, help='Modules in the synthetic repository')
+    parser.add_argument('--seed', type=int, default=0, help='Synthetic repository seed')
+    parser.add_argument('--repo', help='Fixture repository directory instead of a synthetic one')
+    parser.add_argument('--questions', help='Labelled questions JSON for --repo')
+    parser.add_argument('--write-fixture', metavar='DIR',
+                        help='Write the synthetic repository to DIR/repo and its questions to DIR/questions.json')
+    parser.add_argument('--baseline', default='{}', help='Configuration JSON or .json file')
+    parser.add_argument('--candidate', help='Second configuration to compare against the baseline')
+    parser.add_argument('--k', default='1,3,5,10', help='Comma-separated cut-offs for recall@k')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed passes over the questions')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+
+    if args.files > len(DOMAINS) * len(ACTIONS) * len(OBJECTS):
+        parser.error(f"--files is limited to {len(DOMAINS) * len(ACTIONS) * len(OBJECTS)}")
+    if args.repo and not args.questions:
+        parser.error('--repo needs --questions')
+    ks = sorted({int(k) for k in args.k.split(',')})
+
+    if args.write_fixture:
+        # Questions sit next to the repository, not in it, so they are not indexed
+        questions = generate_repository(os.path.join(args.write_fixture, 'repo'), args.files, args.seed)
+        with open(os.path.join(args.write_fixture, 'questions.json'), 'w', encoding='utf-8') as f:
+            json.dump(questions, f, indent=2)
+        print(f"Wrote {args.files} modules to {args.write_fixture}/repo and "
+              f"{len(questions)} questions to {args.write_fixture}/questions.json")
+        return
+
+    workdir = None
+    try:
+        if args.repo:
+            repo_dir = args.repo
+            with open(args.questions, encoding='utf-8') as f:
+                questions = json.load(f)
+            dataset = {'repository': os.path.abspath(repo_dir), 'questions_file': os.path.abspath(args.questions)}
+        else:
+            workdir = tempfile.mkdtemp()
+            repo_dir = os.path.join(workdir, 'repo')
+            questions = generate_repository(repo_dir, args.files, args.seed)
+            dataset = {'synthetic_files': args.files, 'seed': args.seed}
+        dataset['questions'] = len(questions)
+
+        embedding_models = {}
+        configs = [('baseline', load_config(args.baseline))]
+        if args.candidate:
+            configs.append(('candidate', load_config(args.candidate)))
+        reports = [run_config(name, config, repo_dir, questions, ks, args.repeats, embedding_models)
+                   for name, config in configs]
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'dataset': dataset, 'k': ks, 'configs': reports}
+    if len(reports) == 2:
+        report['comparison'] = compare(*reports)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
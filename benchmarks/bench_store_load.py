@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""Compare VectorStore cold-start time of the mmap format against the old pickle format.
+
+Usage:
+    python benchmarks/bench_store_load.py --documents 100000 --chars 1500
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import shutil
+import argparse
+import tempfile
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.vector_store import VectorStore
+
+
+def legacy_save(store: VectorStore, path: str):
+    """The previous VectorStore.save: FAISS index plus one pickle of every document"""
+    faiss.write_index(store.index, f"{path}.index")
+    with open(f"{path}.docs", 'wb') as f:
+        pickle.dump({'documents': dict(store.documents.items()), 'next_id': store._next_id}, f)
+
+
+def legacy_load(path: str):
+    index = faiss.read_index(f"{path}.index")
+    with open(f"{path}.docs", 'rb') as f:
+        data = pickle.load(f)
+    return index, data['documents']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vector store load benchmark')
+    parser.add_argument('--documents', type=int, default=100000, help='Number of stored chunks')
+    parser.add_argument('--chars', type=int, default=1500, help='Characters per chunk')
+    parser.add_argument('--dimension', type=int, default=384, help='Vector dimension')
+    parser.add_argument('--index-type', default='flat', choices=VectorStore.INDEX_TYPES)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.documents, args.dimension)).astype('float32')
+    filler = ('def handler(request):\n    return process(request)\n' * (args.chars // 48 + 1))[:args.chars]
+    documents = [{'content': filler, 'source': f'src/module_{i % 500}.py', 'start_line': 1,
+                  'end_line': 40, 'chunk_index': i % 10} for i in range(args.documents)]
+
+    store = VectorStore(dimension=args.dimension, index_type=args.index_type)
+    for offset in range(0, args.documents, 5000):
+        store.add_documents(documents[offset:offset + 5000], vectors[offset:offset + 5000])
+
+    workdir = tempfile.mkdtemp()
+    try:
+        legacy_path = os.path.join(workdir, 'legacy')
+        mmap_path = os.path.join(workdir, 'store')
+        legacy_save(store, legacy_path)
+        store.save(mmap_path)
+        query = vectors[0]
+
+        start = time.perf_counter()
+        index, docs = legacy_load(legacy_path)
+        legacy_load_seconds = time.perf_counter() - start
+        _, ids = index.search(query.reshape(1, -1), 3)
+        [docs[int(i)] for i in ids[0]]
+        legacy_first_query = time.perf_counter() - start
+        del index, docs
+
+        start = time.perf_counter()
+        loaded = VectorStore(dimension=args.dimension)
+        loaded.load(mmap_path)
+        mmap_load_seconds = time.perf_counter() - start
+        loaded.search(query, k=3)
+        mmap_first_query = time.perf_counter() - start
+
+        print(json.dumps({
+            'documents': args.documents,
+            'chars_per_document': args.chars,
+            'index_type': store.index_type,
+            'legacy_pickle': {
+                'load_ms': round(legacy_load_seconds * 1000, 2),
+                'first_query_ms': round(legacy_first_query * 1000, 2),
+            },
+            'mmap': {
+                'load_ms': round(mmap_load_seconds * 1000, 2),
+                'first_query_ms': round(mmap_first_query * 1000, 2),
+            },
+            'speedup': round(legacy_first_query / mmap_first_query, 1),
+        }, indent=2))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -107,6 +107,8 @@ class Sidebar:
                     help="Maximum number of parallel processes for repository analysis. Higher values may improve speed but increase resource usage."
                 )
                 
+                # Not read yet: the Streamlit UI has no ingestion path. The web UI sends the same
+                # chunk size (characters per chunk) with /api/repository.
                 st.session_state.chunk_size = chunk_size
                 st.session_state.max_parallel = max_parallel
 
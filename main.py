@@ -9,11 +9,24 @@ def main():
                         help='UI type to run: "streamlit" (default) or "web"')
     parser.add_argument('--port', type=int, default=8080,
                         help='Port to run the web UI on (default: 8080)')
+    parser.add_argument('--asgi', action='store_true',
+                        help='Serve the web UI chat asynchronously with uvicorn')
     args = parser.parse_args()
     
     if args.ui == 'streamlit':
         # Run Streamlit app
         os.system(f"streamlit run app.py")
+    elif args.asgi:
+        # Run the async server; the Flask app serves all non-chat routes inside it
+        try:
+            import uvicorn
+            from ui.web_ui.asgi import app
+        except ImportError as e:
+            print(f"Error loading web UI: {str(e)}")
+            print("Make sure the ASGI server is installed: pip install starlette a2wsgi uvicorn")
+            sys.exit(1)
+        print(f"Starting async web UI on port {args.port}...")
+        uvicorn.run(app, host='0.0.0.0', port=args.port)
     else:
         # Run Flask web app
         try:
@@ -1,4 +1,6 @@
 import os
+import asyncio
+import threading
 from typing import Dict, List, Any, Optional
 from langchain_groq import ChatGroq
 from langchain_openai import ChatOpenAI
@@ -7,9 +9,32 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_ollama import ChatOllama
 from langchain_core.messages import SystemMessage
 from dotenv import load_dotenv
+from models.client_pool import ClientPool, ConnectionStats
+from models.stub_chat_model import StubChatModel
 
 load_dotenv()
 
+# Context windows (prompt + completion tokens) published by the providers
+CONTEXT_WINDOWS = {
+    "llama-3.3-70b-versatile": 131072,
+    "llama-3.1-8b-instant": 131072,
+    "mixtral-8x7b-32768": 32768,
+    "llama-guard-3-8b": 8192,
+    "llama3-70b-8192": 8192,
+    "llama3-8b-8192": 8192,
+    "gemma2-9b-it": 8192,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-3.5-turbo": 16385,
+    "gemini-pro": 32760,
+    "gemini-ultra": 32760,
+    "palm-2": 8192,
+    "claude-3-opus": 200000,
+    "claude-3-sonnet": 200000,
+    "claude-2.1": 200000,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
 
 class AIModels:
 
@@ -20,9 +45,23 @@ class AIModels:
         self.google_api_key = os.getenv("GOOGLE_API_KEY", "")
         self.ollama_base_url = os.getenv("OLLAMA_BASE_URL",
                                          "http://localhost:11434")
+        # Ollama truncates prompts past num_ctx silently, so the window is set rather than assumed
+        self.ollama_context_window = int(os.getenv("OLLAMA_CONTEXT_WINDOW", DEFAULT_CONTEXT_WINDOW))
+        # Offline stand-in models for exercising routing, e.g. "fast=0.05,flaky=0.2:0.5"
+        self.stub_models = StubChatModel.parse_specs(os.getenv("LLM_STUB_MODELS", ""))
         self.providers = self._initialize_providers()
         self.models = self._initialize_models()
 
+        # Constructed clients are reused across requests and dropped when idle
+        self.client_pool = ClientPool(
+            idle_timeout=float(os.getenv("LLM_CLIENT_IDLE_SECONDS", 600)),
+            max_clients=int(os.getenv("LLM_CLIENT_POOL_SIZE", 64)))
+        # One keep-alive HTTP connection pool per provider, shared by its clients
+        self.max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+        self._http_clients: Dict[str, Any] = {}
+        self._connection_stats: Dict[str, ConnectionStats] = {}
+        self._http_lock = threading.Lock()
+
     def _initialize_providers(self) -> Dict[str, Dict[str, Any]]:
         """Initialize model providers with their available production models"""
         return {
@@ -68,6 +107,10 @@ class AIModels:
                 "display_name": "Anthropic",
                 "models": ["claude-3-opus", "claude-3-sonnet", "claude-2.1"],
                 "api_key": self.anthropic_api_key
+            },
+            "stub": {
+                "display_name": "Stub (Local)",
+                "models": list(self.stub_models)
             }
         }
 
@@ -84,26 +127,25 @@ class AIModels:
                     "provider":
                     "groq",
                     "tokens":
-                    32768 if "32768" in model_name else 16384,
+                    CONTEXT_WINDOWS.get(model_name, DEFAULT_CONTEXT_WINDOW),
                     "model":
-                    lambda name=model_name: ChatGroq(
-                        groq_api_key=self.groq_api_key, model_name=name)
+                    lambda name=model_name, **options: ChatGroq(
+                        groq_api_key=self.groq_api_key, model_name=name, **options)
                 }
 
         # OpenAI models
         if self.openai_api_key:
             for model_name in self.providers["openai"]["models"]:
-                tokens = 16384 if "gpt-4" in model_name else 4096
                 models[f"openai/{model_name}"] = {
                     "name":
                     model_name,
                     "provider":
                     "openai",
                     "tokens":
-                    tokens,
+                    CONTEXT_WINDOWS.get(model_name, DEFAULT_CONTEXT_WINDOW),
                     "model":
-                    lambda name=model_name: ChatOpenAI(
-                        api_key=self.openai_api_key, model_name=name)
+                    lambda name=model_name, **options: ChatOpenAI(
+                        api_key=self.openai_api_key, model_name=name, **options)
                 }
 
         # Google models
@@ -115,28 +157,41 @@ class AIModels:
                     "provider":
                     "google",
                     "tokens":
-                    16384 if "ultra" in model_name else 8192,
+                    CONTEXT_WINDOWS.get(model_name, DEFAULT_CONTEXT_WINDOW),
                     "model":
-                    lambda name=model_name: ChatGoogleGenerativeAI(
-                        google_api_key=self.google_api_key, model=name)
+                    lambda name=model_name, **options: ChatGoogleGenerativeAI(
+                        google_api_key=self.google_api_key, model=name, **options)
                 }
 
         # Anthropic models
         if self.anthropic_api_key:
             for model_name in self.providers["anthropic"]["models"]:
-                tokens = 32768 if "opus" in model_name else 16384
                 models[f"anthropic/{model_name}"] = {
                     "name":
                     model_name,
                     "provider":
                     "anthropic",
                     "tokens":
-                    tokens,
+                    CONTEXT_WINDOWS.get(model_name, DEFAULT_CONTEXT_WINDOW),
                     "model":
-                    lambda name=model_name: ChatAnthropic(
-                        api_key=self.anthropic_api_key, model_name=name)
+                    lambda name=model_name, **options: ChatAnthropic(
+                        api_key=self.anthropic_api_key, model_name=name, **options)
                 }
 
+        # Stub models (local, no network)
+        for model_name, settings in self.stub_models.items():
+            models[f"stub/{model_name}"] = {
+                "name":
+                model_name,
+                "provider":
+                "stub",
+                "tokens":
+                DEFAULT_CONTEXT_WINDOW,
+                "model":
+                lambda name=model_name, settings=settings, **options: StubChatModel(
+                    name, **settings, **options)
+            }
+
         # Ollama models
         for model_name in self.providers["ollama"]["models"]:
             models[f"ollama/{model_name}"] = {
@@ -145,19 +200,30 @@ class AIModels:
                 "provider":
                 "ollama",
                 "tokens":
-                8192,  # Default context window for most Ollama models
+                self.ollama_context_window,
                 "model":
-                lambda name=model_name: ChatOllama(
-                    model=name, base_url=self.ollama_base_url)
+                lambda name=model_name, **options: ChatOllama(
+                    model=name, base_url=self.ollama_base_url, num_ctx=self.ollama_context_window, **options)
             }
 
         return models
 
-    def get_model(self, model_key: str):
-        """Get a model instance by its key (provider/model_name)"""
+    def get_model(self, model_key: str, client_options: Optional[Dict[str, Any]] = None, **call_params):
+        """Get a model instance by its key (provider/model_name)
+
+        Instances are pooled per (provider, model, client_options) and shared
+        between requests. Per-request settings such as ``temperature`` and
+        ``max_tokens`` given as ``call_params`` are bound to the shared
+        client instead of constructing a new one.
+        """
         if model_key not in self.models:
             raise ValueError(f"Model {model_key} not found")
-        return self.models[model_key]["model"]()
+        info = self.models[model_key]
+        options = dict(client_options or {})
+        key = (info["provider"], info["name"], tuple(sorted(options.items())))
+        model = self.client_pool.get(
+            key, lambda: info["model"](**self._connection_options(info["provider"]), **options))
+        return model.bind(**call_params) if call_params else model
 
     def get_model_names(self) -> List[str]:
         """Get all available model keys"""
@@ -180,13 +246,77 @@ class AIModels:
         """Get information about a specific model"""
         return self.models.get(model_key, {})
 
+    def get_stats(self) -> Dict:
+        """Client pool reuse and setup time, and request/connection counts per provider"""
+        with self._http_lock:
+            connections = {provider: stats.get_stats() for provider, stats in self._connection_stats.items()}
+        return {'clients': self.client_pool.get_stats(), 'connections': connections}
+
+    def close(self):
+        """Drop pooled clients and close the shared HTTP connection pools.
+
+        Only for synchronous code: inside a running event loop, await aclose() instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(self.aclose())
+            return
+        raise RuntimeError("AIModels.close() called from a running event loop; await aclose() instead")
+
+    async def aclose(self):
+        """Drop pooled clients and close the shared HTTP connection pools"""
+        self.client_pool.clear()
+        with self._http_lock:
+            http_clients = list(self._http_clients.values())
+            self._http_clients.clear()
+        for http_client, http_async_client in http_clients:
+            http_client.close()
+            await http_async_client.aclose()
+
     def is_provider_configured(self, provider: str) -> bool:
         """Check if a provider is configured (has API key)"""
         if provider == "ollama":
             return True  # Ollama is always available (local)
+        if provider == "stub":
+            return bool(self.stub_models)
 
         if provider not in self.providers:
             return False
 
         api_key = self.providers[provider].get("api_key", "")
         return api_key != ""
+
+    def _connection_options(self, provider: str) -> Dict[str, Any]:
+        """Constructor arguments that route a provider's clients through its shared HTTP pools
+
+        Only the OpenAI-compatible clients (OpenAI, Groq) accept external
+        httpx clients, and only releases with a separate ``http_async_client``
+        can take them: older ones (such as the pinned langchain-openai 0.0.3
+        and langchain-groq 0.0.1) hand ``http_client`` to the async SDK client
+        as well, which rejects a sync one. Otherwise each pooled client keeps
+        its own connection pools.
+        """
+        model_class = {"openai": ChatOpenAI, "groq": ChatGroq}.get(provider)
+        fields = getattr(model_class, 'model_fields', None) or getattr(model_class, '__fields__', {})
+        if 'http_async_client' not in fields:
+            return {}
+        try:
+            import httpx
+        except ImportError:
+            return {}
+
+        with self._http_lock:
+            if provider not in self._http_clients:
+                stats = ConnectionStats()
+                self._connection_stats[provider] = stats
+                pool = {
+                    'limits': httpx.Limits(max_connections=self.max_connections,
+                                           max_keepalive_connections=self.max_connections),
+                    'timeout': httpx.Timeout(60.0, connect=10.0),
+                }
+                self._http_clients[provider] = (
+                    httpx.Client(event_hooks={'request': [stats.on_request]}, **pool),
+                    httpx.AsyncClient(event_hooks={'request': [stats.on_async_request]}, **pool))
+            http_client, http_async_client = self._http_clients[provider]
+            return {"http_client": http_client, "http_async_client": http_async_client}
@@ -0,0 +1,143 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class ClientPool:
+    """Thread-safe cache of constructed LLM clients, evicted after sitting idle.
+
+    Clients are keyed by whatever identifies their construction (provider,
+    model, client options); per-request settings such as temperature are
+    bound at call time so one client serves every request for its key.
+    Concurrent requests for a missing key build it once.
+    """
+
+    def __init__(self, idle_timeout: float = 600.0, max_clients: int = 64):
+        self.idle_timeout = idle_timeout
+        self.max_clients = max(1, max_clients)
+        # key → [client, last_used]; ordered from least to most recently used
+        self._clients: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._building: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stats = {'created': 0, 'reused': 0, 'evicted_idle': 0, 'evicted_capacity': 0,
+                       'setup_seconds': 0.0, 'last_setup_seconds': 0.0}
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the client for ``key``, building it with ``factory`` if there is none"""
+        self.evict_idle()
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None:
+                entry[1] = time.monotonic()
+                self._clients.move_to_end(key)
+                self._stats['reused'] += 1
+                return entry[0]
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        with build_lock:
+            # Another thread may have built it while we waited
+            with self._lock:
+                entry = self._clients.get(key)
+                if entry is not None:
+                    entry[1] = time.monotonic()
+                    self._stats['reused'] += 1
+                    return entry[0]
+
+            start = time.perf_counter()
+            client = factory()
+            seconds = time.perf_counter() - start
+
+            with self._lock:
+                self._clients[key] = [client, time.monotonic()]
+                self._building.pop(key, None)
+                self._stats['created'] += 1
+                self._stats['setup_seconds'] += seconds
+                self._stats['last_setup_seconds'] = seconds
+                while len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+                    self._stats['evicted_capacity'] += 1
+            return client
+
+    def evict_idle(self) -> int:
+        """Drop clients unused for longer than the idle timeout; returns how many"""
+        if not self.idle_timeout:
+            return 0
+        cutoff = time.monotonic() - self.idle_timeout
+        evicted = 0
+        with self._lock:
+            # Least recently used first, so stop at the first fresh one
+            while self._clients:
+                key, (_, last_used) = next(iter(self._clients.items()))
+                if last_used >= cutoff:
+                    break
+                del self._clients[key]
+                evicted += 1
+            self._stats['evicted_idle'] += evicted
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def get_stats(self) -> Dict:
+        """Pool size, reuse counts and client construction time"""
+        with self._lock:
+            created = self._stats['created']
+            lookups = created + self._stats['reused']
+            return {
+                'clients': len(self._clients),
+                'created': created,
+                'reused': self._stats['reused'],
+                'reuse_rate': round(self._stats['reused'] / lookups, 4) if lookups else 0.0,
+                'evicted_idle': self._stats['evicted_idle'],
+                'evicted_capacity': self._stats['evicted_capacity'],
+                'setup_ms_total': round(self._stats['setup_seconds'] * 1000, 2),
+                'setup_ms_avg': round(self._stats['setup_seconds'] * 1000 / created, 2) if created else 0.0,
+                'setup_ms_last': round(self._stats['last_setup_seconds'] * 1000, 2),
+            }
+
+
+class ConnectionStats:
+    """Counts requests and new connections of one shared HTTP connection pool.
+
+    Installed as an httpx event hook plus an httpcore trace callback (the
+    async variants on an AsyncClient), so the share of requests that reused
+    a kept-alive connection is observable.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self._lock = threading.Lock()
+
+    def on_request(self, request):
+        with self._lock:
+            self.requests += 1
+        # httpcore reports connection setup through the "trace" extension
+        request.extensions['trace'] = self._trace
+
+    def _trace(self, event_name: str, info: Optional[Dict]):
+        if event_name == 'connection.connect_tcp.complete':
+            with self._lock:
+                self.connections_opened += 1
+
+    async def on_async_request(self, request):
+        """on_request for an httpx.AsyncClient, whose hooks and traces are awaited"""
+        self.on_request(request)
+        request.extensions['trace'] = self._async_trace
+
+    async def _async_trace(self, event_name: str, info: Optional[Dict]):
+        self._trace(event_name, info)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            reused = max(0, self.requests - self.connections_opened)
+            return {
+                'requests': self.requests,
+                'connections_opened': self.connections_opened,
+                'connection_reuse_rate': round(reused / self.requests, 4) if self.requests else 0.0,
+            }
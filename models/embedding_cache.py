@@ -0,0 +1,139 @@
+import os
+import time
+import math
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """On-disk, content-addressed embedding cache with a size cap and LRU eviction.
+
+    Vectors are keyed by ``sha256(model_id, text)`` so identical chunks
+    (vendored code, licenses, the same file on another branch) are embedded
+    once per model. Entries live in a SQLite file, which makes the cache safe
+    to share between threads and worker processes.
+    """
+
+    # SQLite limits the number of bound parameters per statement
+    _MAX_PARAMS = 500
+
+    def __init__(self, path: str, model_id: str, dimension: int, max_size_mb: int = 512):
+        self.path = path
+        self.model_id = model_id
+        self.dimension = dimension
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def key(self, text: str) -> str:
+        """Content-addressed key for a text under this cache's model"""
+        digest = hashlib.sha256(self.model_id.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8', errors='surrogatepass'))
+        return digest.hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Look up vectors by key, refreshing their LRU position; missing keys are omitted"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique_keys), self._MAX_PARAMS):
+                group = unique_keys[start:start + self._MAX_PARAMS]
+                placeholders = ','.join('?' * len(group))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", group
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype='float32')
+
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+                self._conn.commit()
+
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        """Store vectors by key and evict least recently used entries over the size cap"""
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        now = time.time()
+        rows = []
+        for key, vector in zip(keys, vectors):
+            blob = vector.tobytes()
+            rows.append((key, blob, len(blob), now))
+
+        with self._lock:
+            existing = set()
+            for start in range(0, len(rows), self._MAX_PARAMS):
+                group = [row[0] for row in rows[start:start + self._MAX_PARAMS]]
+                placeholders = ','.join('?' * len(group))
+                existing.update(key for (key,) in self._conn.execute(
+                    f"SELECT key FROM embeddings WHERE key IN ({placeholders})", group))
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?)", rows)
+            self._total_size += sum(row[2] for row in rows if row[0] not in existing)
+            self._evict()
+            self._conn.commit()
+
+    def get_stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'size_bytes': self._total_size,
+                'max_size_bytes': self.max_size_bytes,
+            }
+
+    def clear(self):
+        """Remove every cached vector"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._total_size = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is back under 90% of its cap"""
+        if self._total_size <= self.max_size_bytes:
+            return
+
+        entry_size = self.dimension * 4
+        target = int(self.max_size_bytes * 0.9)
+        count = math.ceil((self._total_size - target) / entry_size)
+        removed = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM "
+            "(SELECT size FROM embeddings ORDER BY last_used LIMIT ?)", (count,)
+        ).fetchone()
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (count,))
+        self.evictions += removed[0]
+        self._total_size -= removed[1]
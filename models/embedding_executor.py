@@ -0,0 +1,201 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# Model replica owned by each worker process
+_worker_model = None
+
+
+def _init_worker(model_name: str):
+    """Load a model replica in a worker process"""
+    global _worker_model
+    from models.embeddings import EmbeddingModel
+    _worker_model = EmbeddingModel(model_name, processes=0)
+
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    """Encode a batch with the worker's model replica"""
+    return _worker_model._encode(texts)
+
+
+class EmbeddingExecutor:
+    """Batches texts for an encode function and tunes the batch size as it goes.
+
+    Texts are sorted by length before batching so each batch holds texts of
+    similar length and padding waste drops. The batch size is hill-climbed
+    on measured tokens/s and capped by available memory. With ``processes``
+    set, batches are fanned out to a pool of worker processes that each hold
+    their own model replica.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], dimension: int,
+                 model_name: Optional[str] = None, processes: int = 0,
+                 initial_batch_size: int = 32, min_batch_size: int = 4, max_batch_size: int = 512,
+                 max_seq_tokens: int = 256, memory_fraction: float = 0.25):
+        self.encode = encode
+        self.dimension = dimension
+        self.model_name = model_name
+        self.processes = processes
+        self.batch_size = initial_batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.max_seq_tokens = max_seq_tokens
+        self.memory_fraction = memory_fraction
+
+        self._throughput: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._stats = {'texts': 0, 'tokens': 0, 'seconds': 0.0, 'batches': 0}
+
+    @property
+    def preferred_batch_size(self) -> int:
+        """How many texts callers should hand over at once to keep every worker busy"""
+        return self.batch_size * max(1, self.processes)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in length-bucketed, adaptively sized batches, preserving order"""
+        if not texts:
+            return np.zeros((0, self.dimension), dtype='float32')
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        output = np.zeros((len(texts), self.dimension), dtype='float32')
+
+        if self.processes > 0 and self.model_name:
+            self._embed_in_pool(texts, order, output)
+        else:
+            position = 0
+            while position < len(order):
+                batch_size = self._current_batch_size()
+                indices = order[position:position + batch_size]
+                batch = [texts[i] for i in indices]
+                try:
+                    start = time.perf_counter()
+                    embeddings = self.encode(batch)
+                    self._record(batch, time.perf_counter() - start)
+                except MemoryError:
+                    if batch_size <= self.min_batch_size:
+                        raise
+                    self._shrink(batch_size)
+                    continue
+                output[indices] = embeddings
+                position += len(indices)
+
+        return output
+
+    def get_stats(self) -> Dict:
+        """Throughput statistics for sizing hosts"""
+        with self._lock:
+            seconds = self._stats['seconds']
+            return {
+                'texts': self._stats['texts'],
+                'tokens': self._stats['tokens'],
+                'batches': self._stats['batches'],
+                'seconds': round(seconds, 3),
+                'texts_per_second': round(self._stats['texts'] / seconds, 2) if seconds else 0.0,
+                'tokens_per_second': round(self._stats['tokens'] / seconds, 2) if seconds else 0.0,
+                'batch_size': self.batch_size,
+                'processes': self.processes,
+            }
+
+    def close(self):
+        """Shut down the worker pool, if any"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    # ------------------------------------------------------------------
+    # Process pool
+    # ------------------------------------------------------------------
+
+    def _embed_in_pool(self, texts: List[str], order: List[int], output: np.ndarray):
+        """Fan batches out to worker processes and gather the results"""
+        if self._pool is None:
+            # Spawn rather than fork so workers don't inherit torch/FAISS thread state
+            context = multiprocessing.get_context('spawn')
+            self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=context,
+                                             initializer=_init_worker, initargs=(self.model_name,))
+
+        batch_size = self._current_batch_size()
+        start = time.perf_counter()
+        futures = []
+        for position in range(0, len(order), batch_size):
+            indices = order[position:position + batch_size]
+            futures.append((indices, self._pool.submit(_encode_in_worker, [texts[i] for i in indices])))
+
+        for indices, future in futures:
+            output[indices] = future.result()
+
+        # Workers run concurrently, so tune on the wall-clock time of the whole call
+        self._record(texts, time.perf_counter() - start, batch_size=batch_size, batches=len(futures))
+
+    # ------------------------------------------------------------------
+    # Batch size tuning
+    # ------------------------------------------------------------------
+
+    def _estimate_tokens(self, text: str) -> int:
+        """Rough token count (about four characters per token), capped at the model's sequence length"""
+        return min(self.max_seq_tokens, len(text) // 4 + 1)
+
+    def _memory_batch_limit(self) -> int:
+        """Largest batch whose activations fit in the allowed share of available memory"""
+        available = _available_memory()
+        if not available:
+            return self.max_batch_size
+        # Transformer activations are roughly dimension * 4 bytes * ~32 live copies per token
+        bytes_per_text = self.max_seq_tokens * self.dimension * 4 * 32
+        return max(self.min_batch_size, int(available * self.memory_fraction // bytes_per_text))
+
+    def _current_batch_size(self) -> int:
+        with self._lock:
+            return max(self.min_batch_size, min(self.batch_size, self.max_batch_size, self._memory_batch_limit()))
+
+    def _record(self, batch: List[str], elapsed: float, batch_size: Optional[int] = None, batches: int = 1):
+        """Update stats and hill-climb the batch size on measured tokens/s"""
+        tokens = sum(self._estimate_tokens(text) for text in batch)
+        batch_size = batch_size or len(batch)
+        with self._lock:
+            self._stats['texts'] += len(batch)
+            self._stats['tokens'] += tokens
+            self._stats['seconds'] += elapsed
+            self._stats['batches'] += batches
+
+            # Partial trailing batches say little about throughput at the configured size
+            if batch_size != self.batch_size or elapsed <= 0:
+                return
+
+            rate = tokens / elapsed
+            previous = self._throughput.get(batch_size)
+            self._throughput[batch_size] = rate if previous is None else 0.7 * previous + 0.3 * rate
+
+            best = max(self._throughput, key=self._throughput.get)
+            larger = batch_size * 2
+            if best == batch_size and larger <= self.max_batch_size and larger not in self._throughput:
+                # Still improving: explore the next size up
+                self.batch_size = larger
+            else:
+                self.batch_size = best
+
+    def _shrink(self, batch_size: int):
+        """Halve the batch size after running out of memory"""
+        with self._lock:
+            self.max_batch_size = max(self.min_batch_size, batch_size // 2)
+            self.batch_size = self.max_batch_size
+            self._throughput = {size: rate for size, rate in self._throughput.items() if size <= self.max_batch_size}
+
+
+def _available_memory() -> Optional[int]:
+    """Available physical memory in bytes, if it can be determined"""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
@@ -1,33 +1,101 @@
 import numpy as np
 from langchain_core.embeddings import Embeddings
+from typing import Optional
+from models.embedding_executor import EmbeddingExecutor
+from models.embedding_cache import EmbeddingCache
+from models.hashed_embedder import HashedNgramEmbedder
 
 class EmbeddingModel:
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', processes: int = 0,
+                 cache_path: Optional[str] = None, cache_size_mb: int = 512):
+        self.model_name = model_name
+        self.fallback = None
         try:
             from sentence_transformers import SentenceTransformer
             self.model = SentenceTransformer(model_name)
+            self.dimension = self.model.get_sentence_embedding_dimension()
+            self.model_id = f"{model_name}:{self.dimension}"
+            max_seq_tokens = self.model.get_max_seq_length() or 256
         except ImportError:
             # Fallback to a simpler embedding method if sentence-transformers is not available
             self.model = None
+            self.fallback = HashedNgramEmbedder(dimension=768)
+            self.dimension = self.fallback.dimension
+            self.model_id = f"hashed-ngram-v1:{self.dimension}"
+            max_seq_tokens = 256
+
+        # Replicas only pay off for a real model; the fallback is cheaper than pickling
+        self.executor = EmbeddingExecutor(
+            encode=self._encode,
+            dimension=self.dimension,
+            model_name=model_name,
+            processes=processes if self.model is not None else 0,
+            max_seq_tokens=max_seq_tokens
+        )
+
+        # The hashed fallback is cheaper to recompute than to look up on disk
+        self.cache = None
+        if cache_path and self.model is not None:
+            self.cache = EmbeddingCache(cache_path, model_id=self.model_id,
+                                        dimension=self.dimension, max_size_mb=cache_size_mb)
+
+    @property
+    def preferred_batch_size(self) -> int:
+        """Number of texts to pass to embed_texts at once for best throughput"""
+        return self.executor.preferred_batch_size
 
     def embed_text(self, text: str) -> np.ndarray:
         """Generate embeddings for a single text"""
         if self.model is None:
-            # Simple fallback using character frequency as embeddings
-            return self._simple_embedding(text)
+            # Hashed n-gram fallback embedding
+            return self.fallback.embed([text])[0]
         return self.model.encode(text)
 
     def embed_texts(self, texts: list) -> np.ndarray:
-        """Generate embeddings for multiple texts"""
+        """Generate embeddings for multiple texts, reusing cached vectors where possible"""
+        texts = list(texts)
+        if self.cache is None:
+            return self.executor.embed(texts)
+
+        keys = [self.cache.key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # Embed each distinct uncached text once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.executor.embed(list(missing.values()))
+            self.cache.put_many(list(missing.keys()), vectors)
+            cached.update(zip(missing.keys(), vectors))
+
+        return np.array([cached[key] for key in keys], dtype='float32').reshape(len(texts), self.dimension)
+
+    def embed_documents(self, texts: list) -> np.ndarray:
+        """Generate embeddings for documents to be indexed"""
+        return self.embed_texts(texts)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Generate the embedding for a search query"""
+        return self.embed_text(text)
+
+    def embed_queries(self, texts: list) -> np.ndarray:
+        """Generate embeddings for several search queries in one model call"""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype='float32')
+        return np.asarray(self._encode(texts), dtype='float32').reshape(len(texts), self.dimension)
+
+    def get_stats(self) -> dict:
+        """Embedding throughput statistics (texts/s, tokens/s, batch size, cache hits)"""
+        stats = self.executor.get_stats()
+        if self.cache is not None:
+            stats['cache'] = self.cache.get_stats()
+        return stats
+
+    def _encode(self, texts: list) -> np.ndarray:
+        """Encode one batch with the underlying model"""
         if self.model is None:
-            return np.array([self._simple_embedding(text) for text in texts])
-        return self.model.encode(texts)
-
-    def _simple_embedding(self, text: str) -> np.ndarray:
-        """Simple fallback embedding method using character frequency"""
-        # Create a simple frequency-based embedding
-        chars = set(''.join(c.lower() for c in text if c.isalnum()))
-        embedding = np.zeros(768)  # Same dimension as MiniLM
-        for i, c in enumerate(chars):
-            embedding[hash(c) % 768] = text.lower().count(c) / len(text)
-        return embedding / (np.linalg.norm(embedding) + 1e-8)
\ No newline at end of file
+            return self.fallback.embed(texts)
+        return self.model.encode(texts, batch_size=len(texts))
@@ -0,0 +1,119 @@
+from typing import List
+
+import numpy as np
+
+# Fixed odd 64-bit multipliers. All hashing is integer arithmetic modulo 2**64,
+# so vectors are identical across processes, platforms and Python versions.
+_PRIME_A = np.uint64(0x9E3779B97F4A7C15)
+_PRIME_B = np.uint64(0xC2B2AE3D27D4EB4F)
+_PRIME_C = np.uint64(0x165667B19E3779F9)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+# Bytes that belong to a token: ASCII letters and digits, plus any non-ASCII
+# UTF-8 byte so identifiers in other scripts stay whole
+_TOKEN_BYTES = np.zeros(256, dtype=bool)
+_TOKEN_BYTES[ord('0'):ord('9') + 1] = True
+_TOKEN_BYTES[ord('a'):ord('z') + 1] = True
+_TOKEN_BYTES[ord('A'):ord('Z') + 1] = True
+_TOKEN_BYTES[128:] = True
+
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: spreads hash bits so buckets and signs are independent"""
+    h = h ^ (h >> np.uint64(30))
+    h = h * _MIX_1
+    h = h ^ (h >> np.uint64(27))
+    h = h * _MIX_2
+    return h ^ (h >> np.uint64(31))
+
+
+class HashedNgramEmbedder:
+    """Deterministic, NumPy-vectorized feature-hashing embedder.
+
+    Each text contributes hashed character trigrams and hashed token
+    unigrams/bigrams (tokens are runs of letters and digits, so snake_case
+    and dotted names split) to a signed ``dimension``-sized vector. Counts
+    are log-scaled and the result is L2-normalized. A whole batch is hashed
+    and accumulated with a handful of array operations.
+    """
+
+    def __init__(self, dimension: int = 768, char_weight: float = 1.0, token_weight: float = 2.0):
+        self.dimension = dimension
+        self.char_weight = char_weight
+        self.token_weight = token_weight
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts into a (len(texts), dimension) float32 array"""
+        output = np.zeros((len(texts), self.dimension), dtype='float32')
+        if not texts:
+            return output
+
+        encoded = [text.lower().encode('utf-8', errors='surrogatepass') for text in texts]
+        lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+        # A zero byte after every text keeps n-grams from spanning two texts
+        data = np.frombuffer(b'\0'.join(encoded) + b'\0', dtype=np.uint8)
+        doc_ids = np.repeat(np.arange(len(texts)), lengths + 1)
+
+        buckets = []
+        weights = []
+        owners = []
+        dimension = np.uint64(self.dimension)
+        for doc, hashes, weight in (self._char_trigrams(data, doc_ids) + self._tokens(data, doc_ids)):
+            mixed = _mix(hashes)
+            # Multiply-shift range reduction on the high bits; the low bit picks the sign
+            buckets.append((((mixed >> np.uint64(32)) * dimension) >> np.uint64(32)).astype(np.int64))
+            weights.append((mixed & np.uint64(1)).astype(np.float64) * (-2.0 * weight) + weight)
+            owners.append(doc)
+
+        if not owners:
+            return output
+
+        flat = np.concatenate(owners) * self.dimension + np.concatenate(buckets)
+        counts = np.bincount(flat, weights=np.concatenate(weights), minlength=len(texts) * self.dimension)
+        output[:] = counts.reshape(len(texts), self.dimension)
+
+        # Sublinear term frequency, then unit length
+        np.copyto(output, np.sign(output) * np.log1p(np.abs(output)))
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        return output / (norms + 1e-8)
+
+    def _char_trigrams(self, data: np.ndarray, doc_ids: np.ndarray):
+        """Hashes of every byte trigram that lies within one text"""
+        if len(data) < 3:
+            return []
+        valid = np.flatnonzero((data[:-2] != 0) & (data[1:-1] != 0) & (data[2:] != 0))
+        # Pack the three bytes into one integer; _mix does the hashing
+        wide = data.astype(np.uint64)
+        hashes = (wide[valid] << np.uint64(16)) | (wide[valid + 1] << np.uint64(8)) | wide[valid + 2]
+        return [(doc_ids[valid], hashes * _PRIME_A, self.char_weight)]
+
+    def _tokens(self, data: np.ndarray, doc_ids: np.ndarray):
+        """Hashes of token unigrams and adjacent-token bigrams"""
+        is_token = _TOKEN_BYTES[data]
+        if not is_token.any():
+            return []
+
+        # Token boundaries: positions where is_token switches on or off
+        padded = np.concatenate(([False], is_token, [False]))
+        edges = np.flatnonzero(padded[1:] != padded[:-1])
+        starts, ends = edges[0::2], edges[1::2]
+
+        # Polynomial hash of each token's bytes: sum(b[j] * A**(j - start)), computed
+        # for all tokens at once with a power table and a segmented sum
+        positions = np.flatnonzero(is_token)
+        token_index = np.repeat(np.arange(len(starts)), ends - starts)
+        offsets = positions - starts[token_index]
+        powers = np.ones(int(offsets.max()) + 1, dtype=np.uint64)
+        powers[1:] = np.cumprod(np.full(len(powers) - 1, _PRIME_A, dtype=np.uint64))
+        terms = data[positions].astype(np.uint64) * powers[offsets]
+        token_hashes = np.add.reduceat(terms, np.flatnonzero(offsets == 0)) ^ (ends - starts).astype(np.uint64)
+        token_docs = doc_ids[starts]
+
+        features = [(token_docs, token_hashes * _PRIME_B, self.token_weight)]
+
+        same_doc = token_docs[:-1] == token_docs[1:]
+        if same_doc.any():
+            bigrams = (token_hashes[:-1] * _PRIME_C) ^ token_hashes[1:]
+            features.append((token_docs[:-1][same_doc], bigrams[same_doc], self.token_weight))
+        return features
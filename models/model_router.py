@@ -0,0 +1,372 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+def _has_text(chunk) -> bool:
+    """Whether a streamed chunk carries answer text (some providers stream lists of content blocks)"""
+    content = getattr(chunk, 'content', chunk)
+    if isinstance(content, list):
+        return any(block.get('text') if isinstance(block, dict) else block for block in content)
+    return bool(content)
+
+
+class LatencyTracker:
+    """Rolling latency and error rate per model, over the last ``window`` calls.
+
+    Invocations and streams are tracked separately: a stream's latency is
+    its time to the first chunk with text, which is not comparable to a full answer.
+    """
+
+    def __init__(self, window: int = 100):
+        self.window = window
+        self._calls: Dict[Tuple[str, str], deque] = {}
+        self._last_error: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_key: str, seconds: float, ok: bool, kind: str = 'invoke', error: Optional[str] = None):
+        with self._lock:
+            calls = self._calls.setdefault((model_key, kind), deque(maxlen=self.window))
+            calls.append((seconds, ok))
+            if error is not None:
+                self._last_error[model_key] = error
+
+    def quantile(self, model_key: str, q: float, kind: str = 'invoke', min_samples: int = 1) -> Optional[float]:
+        """Latency quantile of successful calls, or None with fewer than ``min_samples``"""
+        with self._lock:
+            latencies = [seconds for seconds, ok in self._calls.get((model_key, kind), ()) if ok]
+        if len(latencies) < max(1, min_samples):
+            return None
+        return float(np.quantile(latencies, q))
+
+    def error_rate(self, model_key: str, min_samples: int = 1) -> float:
+        """Share of failed calls of any kind, 0 with fewer than ``min_samples``"""
+        with self._lock:
+            outcomes = [ok for kind in ('invoke', 'stream') for _, ok in self._calls.get((model_key, kind), ())]
+        if len(outcomes) < max(1, min_samples):
+            return 0.0
+        return 1.0 - sum(outcomes) / len(outcomes)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            keys = sorted({model_key for model_key, _ in self._calls})
+        stats = {}
+        for model_key in keys:
+            entry = {'error_rate': round(self.error_rate(model_key), 4)}
+            for kind in ('invoke', 'stream'):
+                with self._lock:
+                    samples = len(self._calls.get((model_key, kind), ()))
+                if not samples:
+                    continue
+                p50 = self.quantile(model_key, 0.5, kind)
+                p95 = self.quantile(model_key, 0.95, kind)
+                entry[kind] = {
+                    'samples': samples,
+                    'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+                    'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+                }
+            if model_key in self._last_error:
+                entry['last_error'] = self._last_error[model_key]
+            stats[model_key] = entry
+        return stats
+
+
+class ModelRouter:
+    """Routes chat calls across equivalent models using rolling latency and error stats.
+
+    A request goes to the requested model first unless its recent error
+    rate is above ``max_error_rate``, in which case its configured
+    equivalents are tried first. Failed calls fail over to the next
+    equivalent. With hedging on, a non-streaming call that has not answered
+    after the model's p95 latency fires one extra request at the next
+    equivalent and the first answer wins. Streams fail over only before
+    their first chunk with text, since tokens already sent cannot be taken
+    back. Messages are packed for the requested model, so with
+    ``fits_context`` equivalents whose context window can't hold them plus
+    ``max_tokens`` of reply are skipped.
+
+    Every call fills a routing report: the requested and serving model and
+    each attempt with its outcome and latency.
+    """
+
+    def __init__(self, get_model: Callable[..., Any], available: Callable[[str], bool],
+                 equivalents: Optional[Dict[str, List[str]]] = None, hedging: bool = False,
+                 hedge_quantile: float = 0.95, hedge_min_delay: float = 0.5, hedge_default_delay: float = 10.0,
+                 hedge_min_samples: int = 20, max_error_rate: float = 0.5, error_min_samples: int = 5,
+                 tracker: Optional[LatencyTracker] = None, max_workers: int = 64,
+                 fits_context: Optional[Callable[[str, List, Optional[int]], bool]] = None):
+        self.get_model = get_model
+        self.available = available
+        self.equivalents = equivalents or {}
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.max_error_rate = max_error_rate
+        self.error_min_samples = error_min_samples
+        self.tracker = tracker or LatencyTracker()
+        # (model_key, messages, max_tokens) → whether the prompt and reply fit that model's window
+        self.fits_context = fits_context
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-call')
+        self._stats = {'requests': 0, 'failovers': 0, 'hedges': 0, 'hedge_wins': 0}
+        self._lock = threading.Lock()
+
+    def candidates(self, model_key: str) -> List[str]:
+        """Models to try for a request, in order"""
+        if not self.available(model_key):
+            raise ValueError(f"Model {model_key} not found")
+        keys = [model_key] + [key for key in self.equivalents.get(model_key, [])
+                              if key != model_key and self.available(key)]
+        # Stable sort: healthy models keep their configured order ahead of failing ones
+        return sorted(keys, key=lambda key: self.tracker.error_rate(key, self.error_min_samples) > self.max_error_rate)
+
+    def hedge_delay(self, model_key: str) -> float:
+        """Seconds to wait for a model before hedging with the next one"""
+        delay = self.tracker.quantile(model_key, self.hedge_quantile, min_samples=self.hedge_min_samples)
+        return max(self.hedge_min_delay, self.hedge_default_delay if delay is None else delay)
+
+    def invoke(self, model_key: str, messages: List, **call_params) -> Tuple[Any, Dict]:
+        """Answer with the first model that succeeds; returns (response, routing report)"""
+        routing = self._new_routing(model_key)
+        queue = self._route(routing, messages, call_params)
+        pending = {}
+
+        def launch(key):
+            attempt = {'model': key, 'started_ms': self._elapsed_ms(routing)}
+            routing['attempts'].append(attempt)
+            pending[self._executor.submit(self._call, key, messages, call_params)] = attempt
+
+        launch(queue.pop(0))
+        last_error = None
+        while pending:
+            timeout = None
+            if self.hedging and queue and not routing['hedged']:
+                # Measured from the latest attempt, which may itself be a failover
+                latest = routing['attempts'][-1]
+                timeout = max(0.0, self.hedge_delay(latest['model'])
+                              - (self._elapsed_ms(routing) - latest['started_ms']) / 1000)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                routing['hedged'] = True
+                self._count('hedges')
+                launch(queue.pop(0))
+                continue
+
+            for future in done:
+                attempt = pending.pop(future)
+                response, seconds, error = future.result()
+                attempt['latency_ms'] = round(seconds * 1000, 1)
+                if error is None:
+                    attempt['outcome'] = 'ok'
+                    for other in pending.values():
+                        # Cannot interrupt a blocking call; it finishes in the background
+                        other['outcome'] = 'abandoned'
+                    return response, self._finish(routing, attempt)
+                attempt['outcome'] = 'error'
+                attempt['error'] = str(error)
+                last_error = error
+            if not pending and queue:
+                self._count('failovers')
+                launch(queue.pop(0))
+
+        raise self._failed(routing, last_error)
+
+    async def ainvoke(self, model_key: str, messages: List, **call_params) -> Tuple[Any, Dict]:
+        """Async invoke(): losing hedged requests are cancelled"""
+        routing = self._new_routing(model_key)
+        queue = self._route(routing, messages, call_params)
+        pending = {}
+
+        def launch(key):
+            attempt = {'model': key, 'started_ms': self._elapsed_ms(routing)}
+            routing['attempts'].append(attempt)
+            pending[asyncio.ensure_future(self._acall(key, messages, call_params))] = attempt
+
+        launch(queue.pop(0))
+        last_error = None
+        while pending:
+            timeout = None
+            if self.hedging and queue and not routing['hedged']:
+                # Measured from the latest attempt, which may itself be a failover
+                latest = routing['attempts'][-1]
+                timeout = max(0.0, self.hedge_delay(latest['model'])
+                              - (self._elapsed_ms(routing) - latest['started_ms']) / 1000)
+            done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                routing['hedged'] = True
+                self._count('hedges')
+                launch(queue.pop(0))
+                continue
+
+            for task in done:
+                attempt = pending.pop(task)
+                response, seconds, error = task.result()
+                attempt['latency_ms'] = round(seconds * 1000, 1)
+                if error is None:
+                    attempt['outcome'] = 'ok'
+                    for other_task, other in pending.items():
+                        other_task.cancel()
+                        other['outcome'] = 'cancelled'
+                    return response, self._finish(routing, attempt)
+                attempt['outcome'] = 'error'
+                attempt['error'] = str(error)
+                last_error = error
+            if not pending and queue:
+                self._count('failovers')
+                launch(queue.pop(0))
+
+        raise self._failed(routing, last_error)
+
+    def stream(self, model_key: str, messages: List, routing: Dict, **call_params) -> Iterator[Any]:
+        """Stream chunks from the first model that starts answering; fills ``routing`` as it goes"""
+        routing.update(self._new_routing(model_key))
+        last_error = None
+        for index, key in enumerate(self._route(routing, messages, call_params)):
+            if index:
+                self._count('failovers')
+            attempt = {'model': key, 'started_ms': self._elapsed_ms(routing)}
+            routing['attempts'].append(attempt)
+            start = time.perf_counter()
+            started = False
+            try:
+                for chunk in self.get_model(key, **call_params).stream(messages):
+                    # Role-only and metadata chunks carry nothing the client has shown yet
+                    if not started and _has_text(chunk):
+                        started = True
+                        seconds = time.perf_counter() - start
+                        self.tracker.record(key, seconds, True, kind='stream')
+                        attempt['first_chunk_ms'] = round(seconds * 1000, 1)
+                    yield chunk
+            except Exception as error:
+                attempt['outcome'] = 'error'
+                attempt['error'] = str(error)
+                if started:
+                    # Part of the answer is already out; switching models would garble it
+                    raise self._failed(routing, error)
+                self.tracker.record(key, time.perf_counter() - start, False, kind='stream', error=str(error))
+                last_error = error
+                continue
+            attempt['outcome'] = 'ok'
+            self._finish(routing, attempt)
+            return
+        raise self._failed(routing, last_error)
+
+    async def astream(self, model_key: str, messages: List, routing: Dict, **call_params):
+        """Async stream()"""
+        routing.update(self._new_routing(model_key))
+        last_error = None
+        for index, key in enumerate(self._route(routing, messages, call_params)):
+            if index:
+                self._count('failovers')
+            attempt = {'model': key, 'started_ms': self._elapsed_ms(routing)}
+            routing['attempts'].append(attempt)
+            start = time.perf_counter()
+            started = False
+            try:
+                async for chunk in self.get_model(key, **call_params).astream(messages):
+                    if not started and _has_text(chunk):
+                        started = True
+                        seconds = time.perf_counter() - start
+                        self.tracker.record(key, seconds, True, kind='stream')
+                        attempt['first_chunk_ms'] = round(seconds * 1000, 1)
+                    yield chunk
+            except Exception as error:
+                attempt['outcome'] = 'error'
+                attempt['error'] = str(error)
+                if started:
+                    raise self._failed(routing, error)
+                self.tracker.record(key, time.perf_counter() - start, False, kind='stream', error=str(error))
+                last_error = error
+                continue
+            attempt['outcome'] = 'ok'
+            self._finish(routing, attempt)
+            return
+        raise self._failed(routing, last_error)
+
+    def get_stats(self) -> Dict:
+        """Routing counters and rolling latency/error stats per model"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['hedging'] = self.hedging
+        stats['models'] = self.tracker.get_stats()
+        return stats
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _call(self, model_key: str, messages: List, call_params: Dict):
+        """One blocking model call; returns (response, seconds, error) and records its outcome"""
+        start = time.perf_counter()
+        try:
+            response = self.get_model(model_key, **call_params).invoke(messages)
+        except Exception as error:
+            seconds = time.perf_counter() - start
+            self.tracker.record(model_key, seconds, False, error=str(error))
+            return None, seconds, error
+        seconds = time.perf_counter() - start
+        self.tracker.record(model_key, seconds, True)
+        return response, seconds, None
+
+    async def _acall(self, model_key: str, messages: List, call_params: Dict):
+        start = time.perf_counter()
+        try:
+            response = await self.get_model(model_key, **call_params).ainvoke(messages)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            seconds = time.perf_counter() - start
+            self.tracker.record(model_key, seconds, False, error=str(error))
+            return None, seconds, error
+        seconds = time.perf_counter() - start
+        self.tracker.record(model_key, seconds, True)
+        return response, seconds, None
+
+    def _new_routing(self, model_key: str) -> Dict:
+        self._count('requests')
+        return {'requested': model_key, 'served_by': None, 'rerouted': False, 'failover': False,
+                'hedged': False, 'skipped': [], 'attempts': [], '_start': time.perf_counter()}
+
+    def _route(self, routing: Dict, messages: List, call_params: Dict) -> List[str]:
+        """Candidate order for a request, noting when an unhealthy requested model is skipped
+
+        Equivalents too small for the prompt are dropped and listed in ``skipped``.
+        """
+        keys = self.candidates(routing['requested'])
+        if self.fits_context is not None:
+            routing['skipped'] = [key for key in keys if key != routing['requested']
+                                  and not self.fits_context(key, messages, call_params.get('max_tokens'))]
+            keys = [key for key in keys if key not in routing['skipped']]
+        routing['rerouted'] = keys[0] != routing['requested']
+        return keys
+
+    def _finish(self, routing: Dict, winner: Optional[Dict]) -> Dict:
+        routing.pop('_start', None)
+        routing['failover'] = any(attempt.get('outcome') == 'error' for attempt in routing['attempts'])
+        if winner is not None:
+            routing['served_by'] = winner['model']
+            if routing['hedged'] and winner is not routing['attempts'][0]:
+                self._count('hedge_wins')
+        return routing
+
+    def _failed(self, routing: Dict, error: Exception) -> Exception:
+        """The error to raise when no model answered, carrying the routing report"""
+        self._finish(routing, None)
+        try:
+            error.routing = routing
+        except AttributeError:
+            pass
+        return error
+
+    def _elapsed_ms(self, routing: Dict) -> float:
+        return round((time.perf_counter() - routing['_start']) * 1000, 1)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
@@ -0,0 +1,90 @@
+import time
+import random
+import asyncio
+from typing import Dict, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+
+class StubChatModel:
+    """Local stand-in for a LangChain chat model with set latency and failure rate.
+
+    Answers echo the model name and the last message's length, so routing,
+    failover and hedging can be exercised without network access or keys.
+    ``latency`` is the time to the first token; streams then emit
+    ``tokens`` chunks ``token_interval`` seconds apart.
+    """
+
+    def __init__(self, name: str, latency: float = 0.1, error_rate: float = 0.0, jitter: float = 0.0,
+                 tokens: int = 20, token_interval: float = 0.01, seed: Optional[int] = None, **call_params):
+        self.name = name
+        self.latency = latency
+        self.error_rate = error_rate
+        self.jitter = jitter
+        self.tokens = tokens
+        self.token_interval = token_interval
+        self.call_params = call_params
+        self._random = random.Random(seed)
+
+    @classmethod
+    def parse_specs(cls, spec: str) -> Dict[str, Dict]:
+        """Parse ``name=latency[:error_rate],...`` (seconds, fraction) into constructor arguments"""
+        models = {}
+        for item in filter(None, (part.strip() for part in spec.split(','))):
+            name, _, settings = item.partition('=')
+            values = [float(v) for v in settings.split(':') if v] if settings else []
+            models[name.strip()] = {'latency': values[0] if values else 0.1,
+                                    'error_rate': values[1] if len(values) > 1 else 0.0}
+        return models
+
+    def bind(self, **call_params) -> 'StubChatModel':
+        bound = StubChatModel(self.name, self.latency, self.error_rate, self.jitter, self.tokens,
+                              self.token_interval, **{**self.call_params, **call_params})
+        bound._random = self._random
+        return bound
+
+    def invoke(self, messages: List, **call_params) -> AIMessage:
+        time.sleep(self._first_token_delay())
+        self._maybe_fail()
+        time.sleep(self.token_interval * (self.tokens - 1))
+        return AIMessage(content=''.join(self._words(messages)))
+
+    async def ainvoke(self, messages: List, **call_params) -> AIMessage:
+        await asyncio.sleep(self._first_token_delay())
+        self._maybe_fail()
+        await asyncio.sleep(self.token_interval * (self.tokens - 1))
+        return AIMessage(content=''.join(self._words(messages)))
+
+    def stream(self, messages: List, **call_params):
+        time.sleep(self._first_token_delay())
+        self._maybe_fail()
+        for i, word in enumerate(self._words(messages)):
+            if i:
+                time.sleep(self.token_interval)
+            yield AIMessageChunk(content=word)
+
+    async def astream(self, messages: List, **call_params):
+        await asyncio.sleep(self._first_token_delay())
+        self._maybe_fail()
+        for i, word in enumerate(self._words(messages)):
+            if i:
+                await asyncio.sleep(self.token_interval)
+            yield AIMessageChunk(content=word)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _first_token_delay(self) -> float:
+        return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def _maybe_fail(self):
+        if self._random.random() < self.error_rate:
+            raise RuntimeError(f"Stub model {self.name} failed (simulated error)")
+
+    def _words(self, messages: List) -> List[str]:
+        last = messages[-1] if messages else ''
+        content = last.get('content', '') if isinstance(last, dict) else getattr(last, 'content', str(last))
+        words = [f"Answer from stub/{self.name} to a {len(content)}-character prompt."]
+        words += [f" token{i}" for i in range(1, self.tokens)]
+        return words
@@ -0,0 +1,170 @@
+import os
+import re
+import math
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# (substring of the model name, family, closest tiktoken encoding, scale from that encoding's counts).
+# First match wins. Only OpenAI publishes its tokenizers; the other families are counted with
+# cl100k_base and scaled up where their vocabularies are known to split text finer.
+MODEL_FAMILIES = [
+    ('gpt-4o', 'openai-o200k', 'o200k_base', 1.0),
+    ('gpt-', 'openai', 'cl100k_base', 1.0),
+    ('claude', 'anthropic', 'cl100k_base', 1.15),
+    ('llama-3', 'llama3', 'cl100k_base', 1.05),
+    ('llama3', 'llama3', 'cl100k_base', 1.05),
+    ('gemma', 'gemma', 'cl100k_base', 1.05),
+    ('gemini', 'gemini', 'cl100k_base', 1.05),
+    ('palm', 'gemini', 'cl100k_base', 1.05),
+    # SentencePiece models with ~32k vocabularies
+    ('mixtral', 'sentencepiece', 'cl100k_base', 1.25),
+    ('mistral', 'sentencepiece', 'cl100k_base', 1.25),
+    ('llama', 'sentencepiece', 'cl100k_base', 1.25),
+    ('neural-chat', 'sentencepiece', 'cl100k_base', 1.25),
+    ('starling', 'sentencepiece', 'cl100k_base', 1.25),
+]
+DEFAULT_FAMILY = ('default', 'cl100k_base', 1.25)
+
+# Pieces a BPE tokenizer rarely merges across: words (split at camelCase), digit groups,
+# punctuation runs, line breaks and indentation
+_PIECE_PATTERN = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d{1,3}|[^\sA-Za-z\d]+|\n+|[ \t]{2,}")
+
+# Encodings loaded so far; None records one that could not be loaded (no package, offline)
+_encodings: Dict[str, Any] = {}
+_encodings_lock = threading.Lock()
+
+
+def approximate_tokens(text: str) -> int:
+    """Tokenizer-free estimate of a cl100k_base count"""
+    tokens = 0
+    for piece in _PIECE_PATTERN.findall(text):
+        first = piece[0]
+        if not first.isascii():
+            # Non-Latin scripts and emoji take about a token per character
+            tokens += len(piece)
+        elif first.isalpha():
+            tokens += math.ceil(len(piece) / 6)
+        elif first.isdigit() or first in '\n \t':
+            tokens += 1
+        else:
+            tokens += math.ceil(len(piece) / 2)
+    # Single spaces are not matched: BPE vocabularies fold them into the next word
+    return tokens
+
+
+def _load_encoding(name: str):
+    """The tiktoken encoding ``name``, or None without tiktoken or its (downloaded, cached) encoding file"""
+    with _encodings_lock:
+        if name not in _encodings:
+            try:
+                import tiktoken
+                _encodings[name] = tiktoken.get_encoding(name)
+            except Exception as e:
+                logger.warning(f"Tokenizer {name} unavailable, using approximate token counts: {str(e)[:200]}")
+                _encodings[name] = None
+        return _encodings[name]
+
+
+class TokenCounter:
+    """Counts prompt tokens the way one model family's tokenizer does.
+
+    Uses the family's tiktoken encoding when it can be loaded (it is fetched
+    once and cached under ``TIKTOKEN_CACHE_DIR``), otherwise a regex
+    estimate, so counting works offline. ``exact`` is only true for a
+    family's own tokenizer; ``safety_margin`` is the share of the context
+    window to hold back for the counting error.
+    """
+
+    def __init__(self, family: str, encoding_name: Optional[str] = None, scale: float = 1.0,
+                 message_overhead: int = 4, reply_overhead: int = 3):
+        self.family = family
+        self.scale = scale
+        # Role markers and separators around each chat message, and the primed reply
+        self.message_overhead = message_overhead
+        self.reply_overhead = reply_overhead
+        self.encoding = _load_encoding(encoding_name) if encoding_name else None
+        self.method = f"tiktoken:{encoding_name}" if self.encoding is not None else 'approximate'
+
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None and self.scale == 1.0
+
+    @property
+    def safety_margin(self) -> float:
+        if self.exact:
+            return 0.02
+        return 0.05 if self.encoding is not None else 0.1
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            tokens = len(self.encoding.encode(text, disallowed_special=()))
+        else:
+            tokens = approximate_tokens(text)
+        return math.ceil(tokens * self.scale)
+
+    def count_messages(self, messages: List) -> int:
+        """Tokens of a chat prompt: every message's content plus its framing"""
+        total = self.reply_overhead
+        for message in messages:
+            content = message.get('content', '') if isinstance(message, dict) else getattr(message, 'content', '')
+            total += self.message_overhead + self.count(content if isinstance(content, str) else str(content))
+        return total
+
+    def to_dict(self) -> Dict:
+        return {'family': self.family, 'method': self.method, 'exact': self.exact}
+
+
+class TokenCounters:
+    """One TokenCounter per model family, created on first use.
+
+    ``TOKEN_COUNTER=approximate`` skips tiktoken entirely, e.g. on hosts
+    where its first encoding download would have to time out.
+    """
+
+    def __init__(self, mode: Optional[str] = None):
+        self.mode = (mode or os.getenv("TOKEN_COUNTER", "auto")).lower()
+        self._counters: Dict[str, TokenCounter] = {}
+        self._lock = threading.Lock()
+
+    def for_model(self, model_key: str) -> TokenCounter:
+        """Counter for a model key (provider/model_name)"""
+        family, encoding_name, scale = self.family_of(model_key)
+        with self._lock:
+            if family not in self._counters:
+                self._counters[family] = TokenCounter(
+                    family, encoding_name if self.mode != 'approximate' else None, scale)
+            return self._counters[family]
+
+    @staticmethod
+    def family_of(model_key: str):
+        """(family, encoding, scale) for a model key"""
+        name = model_key.split('/', 1)[-1].lower()
+        for pattern, family, encoding_name, scale in MODEL_FAMILIES:
+            if pattern in name:
+                return family, encoding_name, scale
+        return DEFAULT_FAMILY
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {family: counter.to_dict() for family, counter in self._counters.items()}
+
+
+def reported_usage(message) -> Optional[Dict[str, int]]:
+    """Prompt/completion token counts reported by the provider with a model response, if any"""
+    usage = getattr(message, 'usage_metadata', None)
+    if usage:
+        return {'prompt_tokens': usage.get('input_tokens', 0), 'completion_tokens': usage.get('output_tokens', 0)}
+
+    metadata = getattr(message, 'response_metadata', None) or {}
+    # OpenAI and Groq report "token_usage", Anthropic "usage", Ollama eval counts
+    usage = metadata.get('token_usage') or metadata.get('usage') or {}
+    prompt = usage.get('prompt_tokens', usage.get('input_tokens', metadata.get('prompt_eval_count')))
+    completion = usage.get('completion_tokens', usage.get('output_tokens', metadata.get('eval_count')))
+    if prompt is None or completion is None:
+        return None
+    return {'prompt_tokens': int(prompt), 'completion_tokens': int(completion)}
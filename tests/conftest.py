@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+
+# Modules import each other as top-level packages (utils.*, models.*), as in app.py
+repo_root = str(Path(__file__).parent.parent)
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+import os
+import time
+
+import pytest
+
+from models.hashed_embedder import HashedNgramEmbedder
+
+
+class FakeRepoHandler:
+    """Lists and reads files of a local directory, optionally failing on some paths"""
+
+    def __init__(self, fail_on=(), fail_after=0.0):
+        self.fail_on = set(fail_on)
+        # Lets files read before the failing one reach the vector store first
+        self.fail_after = fail_after
+
+    def iter_repository_files(self, path):
+        for root, _, files in sorted(os.walk(path)):
+            for name in sorted(files):
+                yield os.path.join(root, name)
+
+    def _process_file(self, file_path):
+        if os.path.basename(file_path) in self.fail_on:
+            time.sleep(self.fail_after)
+            raise RuntimeError(f"cannot read {file_path}")
+        with open(file_path, encoding='utf-8') as f:
+            return f.read()
+
+
+class FakeEmbeddingModel:
+    """Deterministic offline embeddings"""
+
+    dimension = 64
+    preferred_batch_size = 4
+
+    def __init__(self):
+        self.embedder = HashedNgramEmbedder(dimension=self.dimension)
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return self.embedder.embed(texts)
+
+    def embed_query(self, text):
+        return self.embedder.embed([text])[0]
+
+
+def write_repo(repo_dir, files):
+    for rel_path, content in files.items():
+        path = os.path.join(repo_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+def python_module(name, functions=6):
+    return ''.join(f"def {name}_step_{i}(value):\n    total = value * {i} + {len(name)}\n    return total\n\n\n"
+                   for i in range(functions))
+
+
+@pytest.fixture
+def embedding_model():
+    return FakeEmbeddingModel()
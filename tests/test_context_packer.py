@@ -0,0 +1,61 @@
+from utils.chunker import Chunker
+from utils.context_packer import ContextPacker
+
+
+def _file_chunks(ranges, source='pkg/module.py', total=40):
+    lines = [f"value_{i} = {i}\n" for i in range(1, total + 1)]
+    return [{'source': source, 'content': ''.join(lines[start - 1:end]), 'start_line': start, 'end_line': end}
+            for start, end in ranges]
+
+
+def test_adjacent_chunks_merge_without_losing_lines():
+    chunks = _file_chunks([(1, 10), (11, 19), (20, 28), (29, 37), (38, 40)])
+
+    pieces = ContextPacker().pack(chunks, budget_tokens=100000)
+
+    assert len(pieces) == 1
+    assert (pieces[0]['start_line'], pieces[0]['end_line']) == (1, 40)
+    assert pieces[0]['content'].splitlines() == [f"value_{i} = {i}" for i in range(1, 41)]
+
+
+def test_piece_end_line_matches_chunk():
+    pieces = ContextPacker().pack(_file_chunks([(5, 12)]), budget_tokens=100000)
+
+    assert [(p['start_line'], p['end_line']) for p in pieces] == [(5, 12)]
+    assert len(pieces[0]['content'].splitlines()) == 8
+
+
+def test_overlapping_chunks_are_not_repeated():
+    chunks = _file_chunks([(1, 12), (10, 20)])
+
+    pieces = ContextPacker().pack(chunks, budget_tokens=100000)
+
+    assert [(p['start_line'], p['end_line']) for p in pieces] == [(1, 20)]
+    assert len(pieces[0]['content'].splitlines()) == 20
+
+
+def test_chunker_output_round_trips_through_packer():
+    content = ''.join(f"def f{i}():\n    return {i}\n\n" for i in range(30))
+    chunks = Chunker(chunk_size=120, chunk_overlap=0).chunk(content, 'pkg/funcs.py')
+    assert len(chunks) > 2
+
+    pieces = ContextPacker().pack(chunks, budget_tokens=100000)
+
+    assert len(pieces) == 1
+    assert pieces[0]['content'].split('\n') == content.splitlines()
+    assert pieces[0]['end_line'] == chunks[-1]['end_line']
+
+
+def test_trims_to_budget_around_query_match():
+    chunks = _file_chunks([(1, 40)])
+    packer = ContextPacker()
+
+    pieces = packer.pack(chunks, budget_tokens=80, query='value_30')
+
+    assert len(pieces) == 1
+    piece = pieces[0]
+    assert piece['trimmed']
+    assert piece['start_line'] <= 30 <= piece['end_line']
+    assert packer.count_tokens(packer.render(pieces)) <= 80
+    lines = piece['content'].splitlines()
+    assert lines == [f"value_{i} = {i}" for i in range(piece['start_line'], piece['end_line'] + 1)]
@@ -0,0 +1,70 @@
+import time
+
+from utils.conversation_memory import ConversationMemory
+
+
+def _add_turns(memory, key, n):
+    for i in range(n):
+        memory.add_turn(key, f"How does step {i} work?",
+                        f"Step {i} parses the config file first. Then it ```code {i}``` runs the rest.",
+                        [f"pkg/step{i}.py"], [(f"pkg/step{i}.py", i + 1)])
+
+
+def test_old_turns_are_summarized_one_line_each():
+    memory = ConversationMemory(recent_turns=2, summary_tokens=1000)
+    _add_turns(memory, 'c', 5)
+
+    history = memory.history('c', max_tokens=10000)
+
+    assert [turn['query'] for turn in history['turns']] == ['How does step 3 work?', 'How does step 4 work?']
+    lines = history['summary'].split('\n')
+    assert len(lines) == 3 and history['summarized'] == 3
+    assert lines[0] == "- Q: How does step 0 work? A: Step 0 parses the config file first. (files: pkg/step0.py)"
+
+
+def test_summary_drops_oldest_lines_past_its_budget():
+    memory = ConversationMemory(recent_turns=1, summary_tokens=40)
+    _add_turns(memory, 'c', 10)
+
+    summary = memory.history('c', max_tokens=10000)['summary']
+
+    assert memory.count_tokens(summary) <= 40
+    assert 'step 8' in summary and 'step 0' not in summary
+
+
+def test_history_fits_token_budget_with_most_recent_turns():
+    memory = ConversationMemory(recent_turns=4)
+    _add_turns(memory, 'c', 4)
+    per_turn = memory.count_tokens('How does step 3 work?') + memory.count_tokens(
+        'Step 3 parses the config file first. Then it ```code 3``` runs the rest.')
+
+    history = memory.history('c', max_tokens=per_turn * 2)
+
+    assert [turn['query'] for turn in history['turns']] == ['How does step 2 work?', 'How does step 3 work?']
+    assert history['turn_count'] == 4
+
+
+def test_follow_up_reuses_named_files_only():
+    memory = ConversationMemory()
+    memory.add_turn('c', 'Where is parsing done?', 'In two places.', ['pkg/a.py', 'pkg/b.py'],
+                    [('pkg/a.py', 3), ('pkg/b.py', 7)])
+
+    named = memory.follow_up('c', 'Show me the tests for b.py')
+    referring = memory.follow_up('c', 'Where is it called?')
+
+    assert named['sources'] == ['pkg/b.py'] and named['locations'] == [('pkg/b.py', 7)]
+    assert referring['sources'] == ['pkg/a.py', 'pkg/b.py']
+    assert memory.follow_up('c', 'How are database schema migrations applied?') is None
+
+
+def test_conversations_expire_and_are_evicted():
+    memory = ConversationMemory(max_conversations=2, ttl_seconds=60)
+    for key in ('a', 'b', 'c'):
+        _add_turns(memory, key, 1)
+
+    assert memory.history('a', 1000)['turn_count'] == 0
+    assert memory.get_stats()['evictions'] == 1
+
+    memory._conversations['b']['updated'] = time.time() - 120
+    assert memory.history('b', 1000)['turn_count'] == 0
+    assert memory.history('c', 1000)['turn_count'] == 1
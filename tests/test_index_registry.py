@@ -0,0 +1,100 @@
+import threading
+
+from utils.index_registry import IndexRegistry
+from utils.read_write_lock import ReadWriteLock
+
+
+class FakeStore:
+    """Stands in for a VectorStore: a set memory usage and save/load calls that can be held up"""
+
+    dimension = 8
+
+    def __init__(self, memory_bytes=0):
+        self.memory_bytes = memory_bytes
+        self.documents = {}
+        self.lock = ReadWriteLock()
+        self.saves = 0
+        self.save_started = threading.Event()
+        self.release_save = threading.Event()
+        self.release_save.set()
+
+    def save(self, path):
+        self.save_started.set()
+        self.release_save.wait()
+        self.saves += 1
+
+    def load(self, path):
+        pass
+
+    def memory_usage(self):
+        return self.memory_bytes
+
+
+def _registry(tmp_path, memory_budget_mb=1024, memory_bytes=0):
+    return IndexRegistry(str(tmp_path), lambda: FakeStore(memory_bytes), memory_budget_mb=memory_budget_mb)
+
+
+def test_saving_one_store_does_not_block_others(tmp_path):
+    registry = _registry(tmp_path)
+    with registry.checkout('slow', write=True) as slow:
+        slow.release_save.clear()
+    saver = threading.Thread(target=registry.save, args=('slow',), daemon=True)
+    saver.start()
+    slow.save_started.wait(1)
+    checked_out = threading.Event()
+
+    def use_other():
+        registry.exists('other')
+        with registry.checkout('other'):
+            checked_out.set()
+
+    try:
+        threading.Thread(target=use_other, daemon=True).start()
+        assert checked_out.wait(1)
+        assert registry.get_stats()['resident'][0]['in_use']
+    finally:
+        slow.release_save.set()
+    saver.join()
+    assert slow.saves == 1
+    assert not registry.get_stats()['resident'][0]['dirty']
+
+
+def _resident(registry):
+    return [entry['key'] for entry in registry.get_stats()['resident']]
+
+
+def test_least_recently_used_stores_are_evicted_over_budget(tmp_path):
+    registry = _registry(tmp_path, memory_budget_mb=1, memory_bytes=400 * 1024)
+    with registry.checkout('a', write=True) as a:
+        pass
+    with registry.checkout('b'):
+        pass
+    with registry.checkout('a'):
+        pass
+
+    with registry.checkout('c'):
+        pass
+
+    # b was used least recently; a was modified, but it is still within budget
+    assert _resident(registry) == ['a', 'c']
+    assert registry.evictions == 1 and a.saves == 0
+
+
+def test_checked_out_stores_are_never_evicted(tmp_path):
+    registry = _registry(tmp_path, memory_budget_mb=1, memory_bytes=800 * 1024)
+    with registry.checkout('a', write=True) as a:
+        with registry.checkout('b'):
+            pass
+        with registry.checkout('c'):
+            pass
+        # Over budget with only a left, but a is in use
+        assert _resident(registry) == ['a']
+        assert not registry.evict('a')
+
+    with registry.checkout('d'):
+        pass
+
+    # Evicted once released; saved first because it was modified
+    assert _resident(registry) == ['d']
+    assert a.saves == 1
+    assert registry.get_stats()['evictions'] == 3
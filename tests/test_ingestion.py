@@ -0,0 +1,156 @@
+import os
+from collections import Counter
+
+import pytest
+
+from conftest import FakeRepoHandler, python_module, write_repo
+from utils.chunker import Chunker
+from utils.index_manifest import IndexManifest
+from utils.ingestion import IngestionPipeline, sync_manifest
+from utils.symbol_index import SymbolIndex
+from utils.vector_store import VectorStore
+
+SETTINGS = {'chunk_size': 200, 'chunk_overlap': 0, 'embedding_model': 'fake'}
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo_dir = tmp_path / 'repo'
+    write_repo(str(repo_dir), {f"pkg/{name}.py": python_module(name) for name in ('alpha', 'beta', 'gamma')})
+    return str(repo_dir)
+
+
+def _ingest(repo_dir, store, manifest_path, embedding_model, repo_handler=None, deduplicate=False,
+            symbol_index=None, batch_size=2):
+    manifest = IndexManifest.load(manifest_path)
+    incremental = sync_manifest(manifest, store, SETTINGS)
+    pipeline = IngestionPipeline(repo_handler or FakeRepoHandler(), embedding_model, store,
+                                 Chunker(chunk_size=200, chunk_overlap=0), read_workers=1, batch_size=batch_size,
+                                 deduplicate=deduplicate, symbol_index=symbol_index)
+    return incremental, pipeline.run(repo_dir, manifest=manifest)
+
+
+def _chunks_per_file(store):
+    return Counter(store.documents[doc_id]['source'] for doc_id in store.documents)
+
+
+def _expected_chunks(repo_dir):
+    chunker = Chunker(chunk_size=200, chunk_overlap=0)
+    expected = {}
+    for root, _, files in os.walk(repo_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, encoding='utf-8') as f:
+                expected[os.path.relpath(path, repo_dir)] = len(chunker.chunk(f.read(), name))
+    return expected
+
+
+def test_unchanged_repository_is_not_reembedded(repo, tmp_path, embedding_model):
+    store = VectorStore(dimension=embedding_model.dimension)
+    manifest_path = str(tmp_path / 'manifest.json')
+    _ingest(repo, store, manifest_path, embedding_model)
+    calls = embedding_model.calls
+
+    incremental, stats = _ingest(repo, store, manifest_path, embedding_model)
+
+    assert incremental
+    assert embedding_model.calls == calls
+    assert stats['chunks_embedded'] == 0
+    assert stats['skipped'] == 3
+    assert dict(_chunks_per_file(store)) == _expected_chunks(repo)
+
+
+def test_files_read_again_for_symbols_are_skipped_once(repo, tmp_path, embedding_model):
+    store = VectorStore(dimension=embedding_model.dimension)
+    manifest_path = str(tmp_path / 'manifest.json')
+    _ingest(repo, store, manifest_path, embedding_model)
+
+    # A new symbol index has no entries, so every unchanged file is read once more for it
+    _, stats = _ingest(repo, store, manifest_path, embedding_model, symbol_index=SymbolIndex())
+
+    assert stats['files_read'] == 3
+    assert stats['chunks_embedded'] == 0
+    assert stats['skipped'] == 3
+    assert stats['reembedded'] == 0
+
+
+def test_failed_run_leaves_manifest_matching_store(repo, tmp_path, embedding_model):
+    store = VectorStore(dimension=embedding_model.dimension)
+    manifest_path = str(tmp_path / 'manifest.json')
+    _ingest(repo, store, manifest_path, embedding_model)
+    write_repo(repo, {'pkg/alpha.py': python_module('alpha_v2'), 'pkg/delta.py': python_module('delta'),
+                      'pkg/zeta.py': python_module('zeta')})
+
+    with pytest.raises(RuntimeError):
+        _ingest(repo, store, manifest_path, embedding_model, FakeRepoHandler(fail_on={'zeta.py'}, fail_after=0.5))
+
+    # The store was changed before the failure; the saved manifest has to describe it
+    assert _chunks_per_file(store)['pkg/delta.py'] > 0
+    assert store.holds_exactly(IndexManifest.load(manifest_path).vector_ids())
+    incremental, _ = _ingest(repo, store, manifest_path, embedding_model)
+    assert incremental
+    assert dict(_chunks_per_file(store)) == _expected_chunks(repo)
+
+
+def test_store_out_of_sync_with_manifest_is_rebuilt_once(repo, tmp_path, embedding_model):
+    store = VectorStore(dimension=embedding_model.dimension)
+    manifest_path = str(tmp_path / 'manifest.json')
+    _ingest(repo, store, manifest_path, embedding_model)
+    # Vectors the manifest doesn't know about, as left by a run that died before saving it
+    orphan = {'source': 'pkg/alpha.py', 'content': 'def orphan(): pass\n', 'start_line': 1, 'end_line': 1}
+    store.add_documents([orphan], embedding_model.embed_documents([orphan['content']]))
+
+    incremental, stats = _ingest(repo, store, manifest_path, embedding_model)
+
+    assert not incremental
+    assert dict(_chunks_per_file(store)) == _expected_chunks(repo)
+    assert store.index.ntotal == len(store.documents)
+    assert store.holds_exactly(IndexManifest.load(manifest_path).vector_ids())
+
+
+def test_changed_settings_reset_store(repo, tmp_path, embedding_model):
+    store = VectorStore(dimension=embedding_model.dimension)
+    manifest_path = str(tmp_path / 'manifest.json')
+    _ingest(repo, store, manifest_path, embedding_model)
+
+    manifest = IndexManifest.load(manifest_path)
+    assert not sync_manifest(manifest, store, dict(SETTINGS, chunk_size=400))
+    assert len(store.documents) == 0 and store.index.ntotal == 0
+    assert manifest.vector_ids() == []
+
+
+def test_alias_of_a_replaced_chunk_is_promoted(repo, tmp_path, embedding_model):
+    store = VectorStore(dimension=embedding_model.dimension)
+    manifest_path = str(tmp_path / 'manifest.json')
+    _ingest(repo, store, manifest_path, embedding_model, deduplicate=True)
+    # Read before alpha.py, so its aliases reach the store before alpha.py's old chunks are replaced
+    write_repo(repo, {'pkg/alpha.py': python_module('alpha_v2'), 'pkg/a_copy.py': python_module('alpha')})
+
+    _, stats = _ingest(repo, store, manifest_path, embedding_model, deduplicate=True)
+
+    assert stats['files_indexed'] == 2
+    assert stats['duplicate_chunks'] == _expected_chunks(repo)['pkg/a_copy.py']
+    assert dict(_chunks_per_file(store)) == _expected_chunks(repo)
+    assert store.holds_exactly(IndexManifest.load(manifest_path).vector_ids())
+
+
+def test_alias_of_a_removed_chunk_is_retried_next_run(repo, tmp_path, embedding_model):
+    store = VectorStore(dimension=embedding_model.dimension)
+    manifest_path = str(tmp_path / 'manifest.json')
+    _ingest(repo, store, manifest_path, embedding_model, deduplicate=True)
+    # Read after alpha.py: with one chunk per batch, alpha.py is committed (and its old chunks removed)
+    # before the copy's aliases are indexed
+    write_repo(repo, {'pkg/alpha.py': python_module('alpha_v2'), 'pkg/copy.py': python_module('alpha')})
+
+    _, stats = _ingest(repo, store, manifest_path, embedding_model, deduplicate=True, batch_size=1)
+
+    assert stats['files_done'] == 2 and stats['files_indexed'] == 1
+    assert stats['duplicate_chunks'] == 0
+    assert 'pkg/copy.py' not in _chunks_per_file(store)
+    assert store.holds_exactly(IndexManifest.load(manifest_path).vector_ids())
+
+    _, stats = _ingest(repo, store, manifest_path, embedding_model, deduplicate=True)
+
+    assert stats['files_indexed'] == 1
+    assert dict(_chunks_per_file(store)) == _expected_chunks(repo)
+    assert store.holds_exactly(IndexManifest.load(manifest_path).vector_ids())
@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+from utils.ingestion import IngestionCancelled
+from utils.ingestion_jobs import IngestionJobManager
+
+
+class Work:
+    """A ``work(job)`` callable that blocks until released or cancelled, then returns or raises"""
+
+    def __init__(self, result=None, error=None):
+        self.result = result or {'files_indexed': 1}
+        self.error = error
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def __call__(self, job):
+        self.calls += 1
+        self.started.set()
+        while not self.release.wait(0.01) and not job.cancelled:
+            pass
+        if job.cancelled:
+            raise IngestionCancelled("Ingestion was cancelled")
+        if self.error:
+            raise self.error
+        return self.result
+
+
+@pytest.fixture
+def manager():
+    manager = IngestionJobManager(max_workers=1)
+    yield manager
+    manager.shutdown()
+
+
+def _wait(job):
+    job.future.result(5)
+    return job
+
+
+def test_one_active_job_per_repository(manager):
+    work = Work()
+    job = manager.submit('repo', '/src/repo', work)
+    work.started.wait(5)
+
+    assert manager.submit('repo', '/src/repo', Work()) is job
+    other = manager.submit('other', '/src/other', Work(result={'files_indexed': 2}))
+    assert other is not job and other.status == 'queued'
+
+    work.release.set()
+    assert _wait(job).status == 'succeeded' and job.result == {'files_indexed': 1}
+    # Finished: the next submission starts a new job
+    assert manager.submit('repo', '/src/repo', Work()) is not job
+    assert work.calls == 1
+
+
+def test_cancelling_queued_job_never_runs_it(manager):
+    running = Work()
+    manager.submit('repo', '/src/repo', running)
+    running.started.wait(5)
+    queued_work = Work()
+    queued = manager.submit('other', '/src/other', queued_work)
+
+    assert manager.cancel(queued.id)
+    running.release.set()
+
+    assert queued.status == 'cancelled' and queued.finished_at is not None
+    assert queued_work.calls == 0
+    assert not manager.cancel(queued.id)
+
+
+def test_cancelling_running_job(manager):
+    work = Work()
+    job = manager.submit('repo', '/src/repo', work)
+    work.started.wait(5)
+
+    assert manager.cancel(job.id)
+    work.release.set()
+
+    assert _wait(job).status == 'cancelled'
+
+
+def test_failed_job_keeps_its_error(manager):
+    work = Work(error=RuntimeError('clone failed'))
+    work.release.set()
+
+    job = _wait(manager.submit('repo', '/src/repo', work))
+
+    assert job.status == 'failed' and job.error == 'clone failed'
+    assert manager.list_jobs()[0]['status'] == 'failed'
+
+
+def test_oldest_finished_jobs_are_pruned():
+    manager = IngestionJobManager(max_workers=1, max_finished=2)
+    try:
+        jobs = []
+        for i in range(4):
+            work = Work()
+            work.release.set()
+            jobs.append(_wait(manager.submit(f"repo{i}", f"/src/repo{i}", work)))
+        work = Work()
+        active = manager.submit('active', '/src/active', work)
+
+        # Pruned on submit: the two newest finished jobs and the active one are kept
+        assert [manager.get(job.id) for job in jobs[:2]] == [None, None]
+        assert [manager.get(job.id) for job in jobs[2:]] == jobs[2:]
+        assert manager.get(active.id) is active
+        work.release.set()
+    finally:
+        manager.shutdown()
@@ -0,0 +1,96 @@
+import pytest
+
+from utils.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+DOCS = {
+    1: 'def getUserName(user): return user.name',
+    2: 'GROQ_API_KEY = os.environ["GROQ_API_KEY"]',
+    3: 'def parse_config(path): config = load(path); return config',
+    4: 'class UserCache: """Caches user objects by name"""',
+    5: 'def render_page(view): return view.html',
+}
+
+
+def _index(docs=DOCS):
+    index = LexicalIndex()
+    for doc_id, text in docs.items():
+        index.add(doc_id, text)
+    return index
+
+
+def _round_trip(index, path):
+    path = str(path)
+    index.write(path)
+    return LexicalIndex.open(path)
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize('getUserName') == ['getusername', 'get', 'user', 'name']
+    assert tokenize('GROQ_API_KEY') == ['groq_api_key', 'groq', 'api', 'key']
+    assert tokenize('HTTPServer x') == ['httpserver', 'http', 'server']
+    assert tokenize('parse(path)') == ['parse', 'path']
+
+
+def test_bm25_ranks_by_term_frequency_and_rarity():
+    index = _index()
+
+    results = index.search('config', k=5)
+    assert [doc_id for doc_id, _ in results] == [3]
+
+    ranked = [doc_id for doc_id, _ in index.search('user name', k=5)]
+    # getUserName mentions both terms more often than UserCache
+    assert ranked[:2] == [1, 4]
+    assert index.search('nothing matches', k=5) == []
+
+
+def test_search_respects_k_and_allowed_ids():
+    index = _index()
+
+    assert len(index.search('def return', k=2)) == 2
+    allowed = index.search('user', k=5, allowed=[4])
+    assert [doc_id for doc_id, _ in allowed] == [4]
+    # Scores of a filtered search match the unfiltered ones
+    assert allowed[0][1] == pytest.approx(dict(index.search('user', k=5))[4])
+
+
+def test_reciprocal_rank_fusion_favours_ids_ranked_well_in_both():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]])
+
+    assert fused[0] == 1
+    assert set(fused) == {1, 2, 3, 4}
+    assert fused.index(3) < fused.index(2)
+
+
+def test_removed_documents_leave_results_and_statistics():
+    index = _index()
+    index.remove([1, 99])
+
+    assert len(index) == len(DOCS) - 1
+    assert [doc_id for doc_id, _ in index.search('user', k=5)] == [4]
+    # Same scores as an index that never had the document
+    fresh = _index({doc_id: text for doc_id, text in DOCS.items() if doc_id != 1})
+    assert dict(index.search('user name', k=5)) == pytest.approx(dict(fresh.search('user name', k=5)))
+
+
+def test_round_trip_keeps_scores_with_changes_on_top(tmp_path):
+    index = _index()
+    expected = index.search('user name config', k=5)
+
+    opened = _round_trip(index, tmp_path / 'first')
+    assert len(opened) == len(DOCS)
+    assert dict(opened.search('user name config', k=5)) == pytest.approx(dict(expected))
+
+    # Overlay on a mapped index: drop a compacted document, add a new one
+    opened.remove([3])
+    opened.add(6, 'def load_config(name): return read(name)')
+    docs = {doc_id: text for doc_id, text in DOCS.items() if doc_id != 3}
+    docs[6] = 'def load_config(name): return read(name)'
+    fresh = _index(docs)
+    assert dict(opened.search('config name', k=5)) == pytest.approx(dict(fresh.search('config name', k=5)))
+
+    # Writing again merges the overlay
+    reopened = _round_trip(opened, tmp_path / 'second')
+    assert len(reopened) == len(docs)
+    assert dict(reopened.search('config name', k=5)) == pytest.approx(dict(fresh.search('config name', k=5)))
+    reopened.remove([6])
+    assert [doc_id for doc_id, _ in reopened.search('config', k=5)] == []
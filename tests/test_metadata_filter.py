@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from utils.metadata_filter import MetadataFilter
+from utils.vector_store import VectorStore
+
+DIMENSION = 8
+JAN_2024 = datetime(2024, 1, 1).timestamp()
+
+
+def test_from_dict_builds_filter_or_none():
+    metadata_filter = MetadataFilter.from_dict({'paths': 'src/', 'extensions': ['PY', '.js'],
+                                                'min_size': '10', 'modified_after': '2024-01-01'})
+
+    assert metadata_filter.paths == ['src/*']
+    assert metadata_filter.extensions == {'.py', '.js'}
+    assert metadata_filter.min_size == 10
+    assert metadata_filter.modified_after == JAN_2024
+    assert MetadataFilter.from_dict(None) is None
+    assert MetadataFilter.from_dict({'paths': [], 'min_size': None}) is None
+
+
+@pytest.mark.parametrize('data', [
+    ['src/'],
+    {'path': 'src/'},
+    {'paths': 5},
+    {'languages': ['python', 3]},
+    {'min_size': 'large'},
+    {'modified_before': 'last week'},
+])
+def test_from_dict_rejects_invalid_filters(data):
+    with pytest.raises(ValueError):
+        MetadataFilter.from_dict(data)
+
+
+def test_path_and_exclude_globs():
+    metadata_filter = MetadataFilter(paths=['./src/', '*.md'], exclude_paths=['src/vendor/'])
+
+    assert metadata_filter.matches('src/app/main.py', 100, 0)
+    assert metadata_filter.matches('README.md', 100, 0)
+    assert metadata_filter.matches('src\\util.py', 100, 0)
+    assert not metadata_filter.matches('src/vendor/lib.py', 100, 0)
+    assert not metadata_filter.matches('tests/test_app.py', 100, 0)
+
+
+def test_languages_size_and_mtime_ranges():
+    metadata_filter = MetadataFilter(languages=['Python'], min_size=10, max_size=1000,
+                                     modified_after=JAN_2024, modified_before=JAN_2024 + 86400)
+    inside = int(JAN_2024) + 3600
+
+    assert metadata_filter.matches('app.py', 10, inside)
+    assert metadata_filter.matches('app.py', 1000, inside)
+    assert not metadata_filter.matches('app.js', 100, inside)
+    assert not metadata_filter.matches('app.py', 9, inside)
+    assert not metadata_filter.matches('app.py', 1001, inside)
+    assert not metadata_filter.matches('app.py', 100, int(JAN_2024) - 1)
+    assert not metadata_filter.matches('app.py', 100, int(JAN_2024) + 86401)
+
+
+def test_filtered_search_returns_only_matching_files():
+    store = VectorStore(dimension=DIMENSION)
+    files = [('src/app.py', 500, JAN_2024), ('src/vendor/lib.py', 500, JAN_2024), ('docs/guide.md', 50, JAN_2024),
+             ('src/big.py', 50000, JAN_2024), ('src/old.py', 500, JAN_2024 - 86400)]
+    docs = [{'source': path, 'content': f"chunk {i} of {path}\n", 'file_size': size, 'file_mtime': int(mtime)}
+            for path, size, mtime in files for i in range(3)]
+    vectors = np.random.default_rng(0).random((len(docs), DIMENSION), dtype='float32')
+    store.add_documents(docs, vectors)
+    metadata_filter = MetadataFilter.from_dict({'paths': 'src/', 'exclude_paths': 'src/vendor/',
+                                                'max_size': 1000, 'modified_after': '2024-01-01'})
+
+    for query_text in (None, 'chunk'):
+        results = store.search(vectors[4], k=10, query_text=query_text, filters=metadata_filter)
+        assert {doc['source'] for doc in results} == {'src/app.py'}
@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from models.model_router import ModelRouter
+
+
+class FakeChatModel:
+    """Answers with its name, or raises; streams start with a role-only (empty) chunk"""
+
+    def __init__(self, name, fail=False, fail_after_chunks=None):
+        self.name = name
+        self.fail = fail
+        self.fail_after_chunks = fail_after_chunks
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        return SimpleNamespace(content=f"answer from {self.name}")
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+    def stream(self, messages):
+        self.calls += 1
+        for i, text in enumerate(['', 'answer ', f"from {self.name}"]):
+            if self.fail_after_chunks is not None and i >= self.fail_after_chunks:
+                raise RuntimeError(f"{self.name} dropped the stream")
+            yield SimpleNamespace(content=text)
+
+
+def _router(models, equivalents, windows=None):
+    windows = windows or {}
+    return ModelRouter(
+        get_model=lambda key, **call_params: models[key],
+        available=lambda key: key in models,
+        equivalents=equivalents,
+        fits_context=lambda key, messages, max_tokens: len(messages) * 100 + (max_tokens or 0)
+        <= windows.get(key, 10 ** 6))
+
+
+def test_failover_to_equivalent():
+    models = {'a/primary': FakeChatModel('primary', fail=True), 'b/backup': FakeChatModel('backup')}
+    router = _router(models, {'a/primary': ['b/backup']})
+
+    response, routing = router.invoke('a/primary', ['question'], max_tokens=100)
+
+    assert response.content == 'answer from backup'
+    assert routing['served_by'] == 'b/backup'
+    assert routing['failover']
+    assert [attempt['outcome'] for attempt in routing['attempts']] == ['error', 'ok']
+
+
+def test_async_failover_to_equivalent():
+    models = {'a/primary': FakeChatModel('primary', fail=True), 'b/backup': FakeChatModel('backup')}
+    router = _router(models, {'a/primary': ['b/backup']})
+
+    response, routing = asyncio.run(router.ainvoke('a/primary', ['question'], max_tokens=100))
+
+    assert response.content == 'answer from backup'
+    assert routing['served_by'] == 'b/backup'
+
+
+def test_equivalents_too_small_for_the_prompt_are_skipped():
+    models = {'a/primary': FakeChatModel('primary', fail=True), 'b/small': FakeChatModel('small'),
+              'c/large': FakeChatModel('large')}
+    router = _router(models, {'a/primary': ['b/small', 'c/large']}, windows={'b/small': 1000})
+
+    response, routing = router.invoke('a/primary', ['system', 'question'], max_tokens=900)
+
+    assert response.content == 'answer from large'
+    assert routing['skipped'] == ['b/small']
+    assert models['b/small'].calls == 0
+
+
+def test_no_fitting_equivalent_raises_the_original_error():
+    models = {'a/primary': FakeChatModel('primary', fail=True), 'b/small': FakeChatModel('small')}
+    router = _router(models, {'a/primary': ['b/small']}, windows={'b/small': 100})
+
+    with pytest.raises(RuntimeError, match='primary is down') as raised:
+        router.invoke('a/primary', ['question'], max_tokens=500)
+    assert raised.value.routing['skipped'] == ['b/small']
+
+
+def test_stream_fails_over_after_an_empty_first_chunk():
+    models = {'a/primary': FakeChatModel('primary', fail_after_chunks=1), 'b/backup': FakeChatModel('backup')}
+    router = _router(models, {'a/primary': ['b/backup']})
+    routing = {}
+
+    text = ''.join(chunk.content for chunk in router.stream('a/primary', ['question'], routing, max_tokens=10))
+
+    assert text == 'answer from backup'
+    assert routing['served_by'] == 'b/backup'
+
+
+def test_stream_does_not_fail_over_once_text_was_sent():
+    models = {'a/primary': FakeChatModel('primary', fail_after_chunks=2), 'b/backup': FakeChatModel('backup')}
+    router = _router(models, {'a/primary': ['b/backup']})
+
+    with pytest.raises(RuntimeError, match='dropped the stream'):
+        list(router.stream('a/primary', ['question'], {}, max_tokens=10))
+    assert models['b/backup'].calls == 0
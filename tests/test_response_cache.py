@@ -0,0 +1,88 @@
+import time
+
+import numpy as np
+
+from utils.response_cache import ResponseCache, normalize_query
+
+SCOPE = ('repo', 3)
+PARAMS = {'model': 'groq/llama', 'k': 5}
+
+
+def _embedding(*values):
+    return np.array(values, dtype='float32')
+
+
+def test_exact_hit_ignores_case_whitespace_and_punctuation():
+    cache = ResponseCache()
+    cache.put(SCOPE, 'How is the config  loaded?', PARAMS, {'answer': 'lazily'})
+
+    value, info = cache.get(SCOPE, 'how is the CONFIG loaded', PARAMS)
+
+    assert value == {'answer': 'lazily'} and info['type'] == 'exact'
+    assert normalize_query(' Why?! ') == 'why'
+    # Other parameters or another index version don't match
+    assert cache.get(SCOPE, 'How is the config loaded?', dict(PARAMS, k=10)) is None
+    assert cache.get(('repo', 4), 'How is the config loaded?', PARAMS) is None
+
+
+def test_semantic_hit_needs_similar_embedding_and_same_parameters():
+    cache = ResponseCache(similarity_threshold=0.9)
+    cache.put(SCOPE, 'How is the config loaded?', PARAMS, {'answer': 'lazily'}, embedding=_embedding(1, 0, 0))
+
+    value, info = cache.get_similar(SCOPE, PARAMS, _embedding(0.95, 0.1, 0))
+    assert value == {'answer': 'lazily'}
+    assert info['type'] == 'semantic' and info['matched_query'] == 'how is the config loaded'
+
+    assert cache.get_similar(SCOPE, PARAMS, _embedding(0, 1, 0)) is None
+    assert cache.get_similar(SCOPE, dict(PARAMS, k=10), _embedding(1, 0, 0)) is None
+    stats = cache.get_stats()
+    assert stats['semantic_hits'] == 1 and stats['misses'] == 2
+
+
+def test_semantic_level_can_be_disabled():
+    cache = ResponseCache(similarity_threshold=None)
+    cache.put(SCOPE, 'How is the config loaded?', PARAMS, {'answer': 'lazily'}, embedding=_embedding(1, 0, 0))
+
+    assert cache.get_similar(SCOPE, PARAMS, _embedding(1, 0, 0)) is None
+
+
+def test_expired_entries_are_not_returned():
+    cache = ResponseCache(ttl_seconds=60)
+    cache.put(SCOPE, 'old question', PARAMS, {'answer': 'old'}, embedding=_embedding(1, 0, 0))
+    cache.put(SCOPE, 'new question', PARAMS, {'answer': 'new'})
+
+    for entry in cache._entries.values():
+        if entry['query'] == 'old question':
+            entry['created'] = time.time() - 120
+
+    assert cache.get(SCOPE, 'old question', PARAMS) is None
+    assert cache.get_similar(SCOPE, PARAMS, _embedding(1, 0, 0)) is None
+    assert cache.get(SCOPE, 'new question', PARAMS)[0] == {'answer': 'new'}
+    assert cache.get_stats()['entries'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put(SCOPE, 'first', PARAMS, {'answer': 1})
+    cache.put(SCOPE, 'second', PARAMS, {'answer': 2})
+    cache.get(SCOPE, 'first', PARAMS)
+
+    cache.put(SCOPE, 'third', PARAMS, {'answer': 3})
+
+    assert cache.get(SCOPE, 'second', PARAMS) is None
+    assert cache.get(SCOPE, 'first', PARAMS) is not None
+    assert cache.get(SCOPE, 'third', PARAMS) is not None
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_invalidate_drops_one_repository():
+    cache = ResponseCache()
+    cache.put(('repo', 1), 'question', PARAMS, {'answer': 'a'}, embedding=_embedding(1, 0, 0))
+    cache.put(('repo', 2), 'question', PARAMS, {'answer': 'b'})
+    cache.put(('other', 1), 'question', PARAMS, {'answer': 'c'})
+
+    assert cache.invalidate('repo') == 2
+
+    assert cache.get(('repo', 1), 'question', PARAMS) is None
+    assert cache.get_similar(('repo', 1), PARAMS, _embedding(1, 0, 0)) is None
+    assert cache.get(('other', 1), 'question', PARAMS)[0] == {'answer': 'c'}
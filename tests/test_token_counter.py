@@ -0,0 +1,93 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from models import token_counter
+from models.token_counter import TokenCounter, TokenCounters, approximate_tokens, reported_usage
+
+
+class FakeEncoding:
+    """One token per whitespace-separated word"""
+
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+
+@pytest.fixture
+def fake_tiktoken(monkeypatch):
+    for name in ('cl100k_base', 'o200k_base'):
+        monkeypatch.setitem(token_counter._encodings, name, FakeEncoding())
+
+
+@pytest.mark.parametrize('model_key, family, scale', [
+    ('openai/gpt-4o-mini', 'openai-o200k', 1.0),
+    ('openai/gpt-3.5-turbo', 'openai', 1.0),
+    ('anthropic/claude-3-haiku', 'anthropic', 1.15),
+    ('groq/llama-3.1-8b-instant', 'llama3', 1.05),
+    ('groq/llama2-70b-4096', 'sentencepiece', 1.25),
+    ('groq/mixtral-8x7b-32768', 'sentencepiece', 1.25),
+    ('ollama/phi3', 'default', 1.25),
+])
+def test_family_of_maps_model_names(model_key, family, scale):
+    assert TokenCounters.family_of(model_key)[0] == family
+    assert TokenCounters.family_of(model_key)[2] == scale
+
+
+def test_safety_margin_follows_counting_method(fake_tiktoken):
+    counters = TokenCounters(mode='auto')
+
+    exact = counters.for_model('openai/gpt-4o')
+    scaled = counters.for_model('groq/mixtral-8x7b-32768')
+    approximate = TokenCounter('default')
+
+    assert exact.method == 'tiktoken:o200k_base' and exact.exact and exact.safety_margin == 0.02
+    assert scaled.method == 'tiktoken:cl100k_base' and not scaled.exact and scaled.safety_margin == 0.05
+    assert approximate.method == 'approximate' and approximate.safety_margin == 0.1
+    assert scaled.count('one two three four') == 5
+    # One counter per family
+    assert counters.for_model('groq/mistral-saba-24b') is scaled
+
+
+def test_approximate_mode_skips_tiktoken(fake_tiktoken):
+    counter = TokenCounters(mode='approximate').for_model('openai/gpt-4o')
+
+    assert counter.method == 'approximate' and not counter.exact
+    assert counter.count('def parse_config(path):') == approximate_tokens('def parse_config(path):')
+
+
+def test_missing_tiktoken_falls_back_to_approximate(monkeypatch, caplog):
+    monkeypatch.setitem(sys.modules, 'tiktoken', None)
+    monkeypatch.setattr(token_counter, '_encodings', {})
+
+    counter = TokenCounter('openai', 'cl100k_base')
+
+    assert counter.method == 'approximate'
+    assert 'using approximate token counts' in caplog.text
+    assert counter.count('') == 0
+    assert 0 < counter.count('Hello world, this is a test.') < 20
+
+
+def test_approximate_tokens_count_code_pieces():
+    assert approximate_tokens('getUserName') == 3
+    assert approximate_tokens('x = 1000') == 4
+    assert approximate_tokens('日本語') == 3
+
+
+def test_count_messages_adds_framing(fake_tiktoken):
+    counter = TokenCounter('openai', 'cl100k_base', message_overhead=4, reply_overhead=3)
+    messages = [{'role': 'system', 'content': 'You answer questions'},
+                SimpleNamespace(content='How does it work?'), {'role': 'user'}]
+
+    assert counter.count_messages(messages) == 3 + 3 * 4 + 3 + 4
+    assert counter.count_messages([]) == 3
+
+
+def test_reported_usage_reads_provider_metadata():
+    assert reported_usage(SimpleNamespace(usage_metadata={'input_tokens': 10, 'output_tokens': 5})) == {
+        'prompt_tokens': 10, 'completion_tokens': 5}
+    groq = SimpleNamespace(response_metadata={'token_usage': {'prompt_tokens': 7, 'completion_tokens': 2}})
+    assert reported_usage(groq) == {'prompt_tokens': 7, 'completion_tokens': 2}
+    ollama = SimpleNamespace(response_metadata={'prompt_eval_count': 9, 'eval_count': 4})
+    assert reported_usage(ollama) == {'prompt_tokens': 9, 'completion_tokens': 4}
+    assert reported_usage(SimpleNamespace(content='no usage')) is None
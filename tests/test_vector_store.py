@@ -0,0 +1,206 @@
+import json
+import shutil
+import threading
+
+import numpy as np
+import pytest
+
+from utils.metadata_filter import MetadataFilter
+from utils.read_write_lock import ReadWriteLock
+from utils.vector_store import VectorStore
+
+DIMENSION = 16
+
+
+def _docs(source, n, start=0):
+    return [{'source': source, 'content': f"def {source.split('.')[0]}_{i}(): return {i}\n",
+             'start_line': i + 1, 'end_line': i + 1} for i in range(start, start + n)]
+
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).random((n, DIMENSION), dtype='float32')
+
+
+@pytest.mark.parametrize('index_type', ['flat', 'hnsw'])
+def test_add_remove_save_load_round_trip(tmp_path, index_type):
+    store = VectorStore(dimension=DIMENSION, index_type=index_type)
+    vectors = _vectors(30)
+    ids = store.add_documents(_docs('a.py', 20) + _docs('b.py', 10), vectors)
+    store.remove_documents(ids[20:25])
+    path = str(tmp_path / 'vectors')
+    store.save(path)
+
+    loaded = VectorStore(dimension=DIMENSION)
+    loaded.load(path)
+
+    assert loaded.index_type == index_type
+    assert loaded.version == store.version
+    assert sorted(loaded.documents) == sorted(store.documents)
+    assert loaded.search(vectors[3], k=1)[0] == store.documents[ids[3]]
+    # Removed chunks stay out of results, whether deleted or tombstoned
+    removed = {doc['content'] for doc in _docs('b.py', 5)}
+    assert not removed & {doc['content'] for doc in loaded.search(vectors[22], k=10, max_chars=None)}
+    assert loaded.files.ids_by_file()['b.py'].tolist() == ids[25:]
+
+
+def test_mapped_store_can_be_changed_and_saved_again(tmp_path):
+    store = VectorStore(dimension=DIMENSION)
+    store.add_documents(_docs('a.py', 10), _vectors(10))
+    path = str(tmp_path / 'vectors')
+    store.save(path)
+    store.load(path)
+
+    new_ids = store.add_documents(_docs('b.py', 5), _vectors(5, seed=1))
+    store.remove_documents([0, 1])
+    store.save(path)
+    reloaded = VectorStore(dimension=DIMENSION)
+    reloaded.load(path, mmap=False)
+
+    assert len(reloaded.documents) == 13
+    assert reloaded.index.ntotal == 13
+    assert reloaded.add_documents(_docs('c.py', 1), _vectors(1, seed=2)) == [new_ids[-1] + 1]
+
+
+@pytest.mark.parametrize('version', [VectorStore.FORMAT_VERSION - 1, VectorStore.FORMAT_VERSION + 1])
+def test_load_rejects_other_formats(tmp_path, version):
+    store = VectorStore(dimension=DIMENSION)
+    store.add_documents(_docs('a.py', 2), _vectors(2))
+    path = tmp_path / 'vectors'
+    store.save(str(path))
+    meta = json.loads((path / 'meta.json').read_text())
+    (path / 'meta.json').write_text(json.dumps(dict(meta, version=version)))
+    if version < VectorStore.FORMAT_VERSION:
+        # Stores written before near-duplicate collapse have neither of these
+        shutil.rmtree(path / 'duplicates')
+        (path / 'aliases.npy').unlink()
+
+    with pytest.raises(ValueError, match='Unsupported vector store format'):
+        VectorStore(dimension=DIMENSION).load(str(path))
+
+
+def _store_with_alias():
+    """A representative in lib/a.py, its alias in app/b.py and an unrelated chunk in lib/c.py"""
+    store = VectorStore(dimension=DIMENSION)
+    vectors = _vectors(2)
+    representative_id, other_id = store.add_documents(
+        [{'source': 'lib/a.py', 'content': 'def parse_config(path): return load(path)\n'},
+         {'source': 'lib/c.py', 'content': 'def render_page(view): return view.html\n'}], vectors)
+    alias_id, = store.add_aliases(representative_id, [
+        {'source': 'app/b.py', 'content': 'def parse_config(path): return load(path)\n'}])
+    return store, vectors[0], alias_id
+
+
+@pytest.mark.parametrize('query_text', [None, 'parse_config'])
+def test_filtered_search_reports_alias_only_outside_the_filter(query_text):
+    store, query, _ = _store_with_alias()
+
+    both = store.search(query, k=1, query_text=query_text,
+                        filters=MetadataFilter.from_dict({'paths': ['lib/a.py', 'app/b.py']}))
+    assert both[0]['source'] == 'lib/a.py'
+    assert both[0]['aliases'][0]['source'] == 'app/b.py'
+
+    alias_only = store.search(query, k=1, query_text=query_text, filters=MetadataFilter.from_dict({'paths': ['app/*']}))
+    assert alias_only[0]['source'] == 'app/b.py'
+
+
+def test_removing_representative_promotes_alias():
+    store, query, alias_id = _store_with_alias()
+
+    store.remove_documents([0])
+
+    results = store.search(query, k=1, query_text='parse_config')
+    assert results[0]['source'] == 'app/b.py'
+    # The promoted alias now has the vector and the lexical entry
+    assert [doc_id for doc_id, _ in store.lexical.search('parse_config', 5)] == [alias_id]
+
+
+def test_searches_run_safely_alongside_writes(tmp_path):
+    store = VectorStore(dimension=DIMENSION, index_type='ivf_flat')
+    store.add_documents(_docs('base.py', 200), _vectors(200))
+    path = str(tmp_path / 'vectors')
+    errors = []
+    stop = threading.Event()
+
+    def search():
+        rng = np.random.default_rng(1)
+        while not stop.is_set():
+            try:
+                for doc in store.search(rng.random(DIMENSION, dtype='float32'), k=5, query_text='return',
+                                        mmr_lambda=0.5):
+                    assert doc['content'].startswith('def ')
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=search) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    try:
+        for round_no in range(15):
+            ids = store.add_documents(_docs(f"file{round_no}.py", 50), _vectors(50, seed=round_no + 2))
+            store.remove_documents(ids[:40])
+            if round_no % 5 == 4:
+                with store.lock.write():
+                    store.save(path)
+                    store.load(path)
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+
+    assert not errors
+    assert len(store.documents) == 200 + 15 * 10
+
+
+def test_read_write_lock_excludes_writers_from_readers():
+    lock = ReadWriteLock()
+    events = []
+    reading = threading.Event()
+    release = threading.Event()
+
+    def reader():
+        with lock.read():
+            reading.set()
+            release.wait()
+            events.append('read done')
+
+    def writer():
+        with lock.write():
+            events.append('write')
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    reading.wait()
+    writer_thread = threading.Thread(target=writer)
+    writer_thread.start()
+    writer_thread.join(0.1)
+    assert events == []
+
+    release.set()
+    thread.join()
+    writer_thread.join()
+    assert events == ['read done', 'write']
+
+
+def test_read_write_lock_is_reentrant_but_does_not_upgrade():
+    lock = ReadWriteLock()
+    with lock.write():
+        with lock.write(), lock.read():
+            pass
+    with lock.read():
+        with lock.read():
+            pass
+        with pytest.raises(RuntimeError):
+            with lock.write():
+                pass
+    # Fully released: another thread can write
+    done = threading.Event()
+
+    def write_once():
+        with lock.write():
+            done.set()
+
+    thread = threading.Thread(target=write_once)
+    thread.start()
+    thread.join(1)
+    assert done.is_set()
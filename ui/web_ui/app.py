@@ -1,11 +1,12 @@
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session, flash
 import os
 import sys
 import json
 import uuid
 import time
 import string
+import threading
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
 from pathlib import Path
@@ -16,10 +17,22 @@ parent_dir = str(current_dir.parent.parent.parent)
 if parent_dir not in sys.path:
     sys.path.append(parent_dir)
 
-from models.ai_models import AIModels
+from models.ai_models import AIModels, DEFAULT_CONTEXT_WINDOW
+from models.model_router import ModelRouter
+from models.token_counter import TokenCounters, reported_usage
 from models.embeddings import EmbeddingModel
 from utils.vector_store import VectorStore
+from utils.index_registry import IndexRegistry
 from utils.repo_handler import RepositoryHandler
+from utils.index_manifest import IndexManifest
+from utils.chunker import Chunker
+from utils.context_packer import ContextPacker
+from utils.metadata_filter import MetadataFilter
+from utils.symbol_index import SymbolIndex
+from utils.response_cache import ResponseCache
+from utils.conversation_memory import ConversationMemory
+from utils.ingestion import IngestionPipeline, sync_manifest
+from utils.ingestion_jobs import IngestionJobManager
 from components.unified_file_explorer import UnifiedFileExplorer
 from utils.parallel_processor import ParallelProcessor
 # Initialize parallel processor
@@ -36,9 +49,71 @@ app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # Session timeout in seconds (1
 
 # Initialize components
 ai_models = AIModels()
-embedding_model = EmbeddingModel()
-vector_store = VectorStore()
+# Failover and optional hedging across equivalent models, from rolling latency and error stats
+model_router = ModelRouter(
+    get_model=ai_models.get_model,
+    available=lambda model_key: model_key in ai_models.models,
+    equivalents=json.loads(os.getenv("MODEL_EQUIVALENTS", "{}")),
+    hedging=os.getenv("MODEL_HEDGING", "false").lower() == "true",
+    hedge_min_delay=float(os.getenv("MODEL_HEDGE_MIN_DELAY", 0.5)),
+    max_error_rate=float(os.getenv("MODEL_MAX_ERROR_RATE", 0.5)),
+    fits_context=lambda model_key, messages, max_tokens: _fits_context(model_key, messages, max_tokens)
+)
+embedding_model = EmbeddingModel(
+    processes=int(os.getenv("EMBEDDING_PROCESSES", 0)),
+    cache_path=os.getenv("EMBEDDING_CACHE_PATH", os.path.join(os.getcwd(), 'index_data', 'embedding_cache.sqlite')),
+    cache_size_mb=int(os.getenv("EMBEDDING_CACHE_SIZE_MB", 512))
+)
 repo_handler = RepositoryHandler()
+
+def create_vector_store():
+    """Create an empty vector store configured from the environment"""
+    return VectorStore(
+        dimension=embedding_model.dimension,
+        index_type=os.getenv("VECTOR_INDEX_TYPE", "flat"),
+        metric=os.getenv("VECTOR_METRIC", "l2"),
+        auto_promote_threshold=int(os.getenv("VECTOR_AUTO_PROMOTE", 100000)),
+        promote_to=os.getenv("VECTOR_PROMOTE_TO", "ivf_flat"),
+        hybrid=os.getenv("HYBRID_SEARCH", "true").lower() != "false"
+    )
+
+# One vector store per repository, evicted to disk under a memory budget
+index_registry = IndexRegistry(
+    repo_handler.index_base_dir,
+    store_factory=create_vector_store,
+    memory_budget_mb=int(os.getenv("INDEX_MEMORY_BUDGET_MB", 1024))
+)
+
+# Symbol definition/reference tables per repository index, loaded on first use
+symbol_indexes = {}
+symbol_indexes_lock = threading.Lock()
+
+# Prompt token counting per model family; retrieved chunks are packed into what remains of the window
+token_counters = TokenCounters()
+# Fewest tokens of repository context worth sending
+MIN_CONTEXT_TOKENS = 64
+# Default MMR trade-off between relevance and diversity of retrieved chunks
+DEFAULT_MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", 0.7))
+
+# Chat responses keyed by repository index version; semantic lookup is off when the threshold is 0
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", 1000)),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", 3600)),
+    similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", 0.95)) or None
+)
+
+# Chat history per session, kept server-side; the session cookie only holds a conversation id
+conversation_memory = ConversationMemory(
+    recent_turns=int(os.getenv("CONVERSATION_RECENT_TURNS", 4)),
+    summary_tokens=int(os.getenv("CONVERSATION_SUMMARY_TOKENS", 400)),
+    max_conversations=int(os.getenv("CONVERSATION_MAX_SESSIONS", 1000)),
+    ttl_seconds=float(os.getenv("CONVERSATION_TTL", 86400))
+)
+# Largest share of the prompt (what the reply leaves of the window) given to conversation history
+CONVERSATION_HISTORY_SHARE = float(os.getenv("CONVERSATION_HISTORY_SHARE", 0.25))
+
+# Background ingestion; caps how many repositories are ingested at once
+ingestion_jobs = IngestionJobManager(max_workers=int(os.getenv("INGESTION_WORKERS", 2)))
 file_explorer = UnifiedFileExplorer()
 
 # Mock users database (replace with a real database in production)
@@ -140,6 +215,8 @@ def repository_chat():
     if 'user_id' not in session:
         return redirect(url_for('login'))
         
+    # The page starts with an empty chat, so it starts a new conversation
+    session['conversation_id'] = uuid.uuid4().hex
     providers = ai_models.get_provider_names()
     model_names = ai_models.get_model_names()
     return render_template('repository_chat.html', 
@@ -176,15 +253,23 @@ def get_models():
 
 @app.route('/api/repository', methods=['POST'])
 def process_repository():
-    """API endpoint to process repository"""
+    """API endpoint to submit a repository for background ingestion
+    
+    Returns a job id immediately; follow progress with /api/jobs/<job_id>
+    (or its /events stream). Pass "wait": true to block until the job ends.
+    """
     data = request.json
     repo_path = data.get('repo_path', '')
     max_workers = int(data.get('max_workers', 4))
+    chunk_size = int(data.get('chunk_size', 500))
+    chunk_overlap = data.get('chunk_overlap')
     
     if not repo_path:
         return jsonify({'success': False, 'error': 'Repository path is required'})
     
     try:
+        chunker = Chunker(chunk_size=chunk_size, chunk_overlap=int(chunk_overlap) if chunk_overlap is not None else None)
+        
         # Show progress message
         app.logger.info(f"Processing repository: {repo_path}")
         
@@ -197,91 +282,120 @@ def process_repository():
                 repo_path = repo_parts[0]
                 app.logger.info(f"Modified GitHub URL to repository root: {repo_path}")
         
-        # Process repository and get file structure
-        try:
-            repo_dir, directory_structure, file_contents = repo_handler.process_repository(repo_path)
-        except Exception as repo_error:
-            app.logger.error(f"Repository processing error: {str(repo_error)}", exc_info=True)
-            return jsonify({
-                'success': False, 
-                'error': f"Failed to process repository: {str(repo_error)}",
-                'details': "Please check that the repository URL or path is correct and accessible."
-            })
-        
-        # Set repository in file explorer
-        file_explorer.set_repository(repo_dir, directory_structure)
-        
-        # Store repository information in session
-        session['repository'] = {
-            'path': repo_dir,
-            'structure': json.dumps(str(directory_structure)[:1000] + '...')  # Truncated for session storage
-        }
-        
-        # Process repository files and create embeddings using parallel processing
-        def process_file(file_tuple):
-            file_path, content = file_tuple
-            if not content:
-                return None
-                
-            try:
-                relative_path = os.path.relpath(file_path, repo_dir)
-                return {
-                    "content": content,
-                    "source": relative_path
-                }
-            except Exception as e:
-                app.logger.warning(f"Error processing file {file_path}: {str(e)}")
-                return None
-        
-        # Use parallel processing to process files
-        app.logger.info(f"Processing {len(file_contents)} files with {max_workers} workers")
-        documents = parallel_processor.process_items(
-            items=file_contents,
-            process_func=process_file,
-            max_workers=max_workers
+        job = ingestion_jobs.submit(
+            repo_handler.get_repository_key(repo_path),
+            repo_path,
+            _ingest_repository,
+            params={'chunker': chunker, 'max_workers': max_workers}
         )
+        session['repository_job'] = job.id
         
-        # Filter out None values (already handled in process_items)
-        documents = [doc for doc in documents if doc]
+        if data.get('wait'):
+            job.future.result()
+            return jsonify(_job_response(job))
         
-        # Generate embeddings and add to vector store
-        if documents:
-            app.logger.info(f"Generating embeddings for {len(documents)} documents")
-            
-            # Process in batches to avoid memory issues
-            batch_size = 20
-            processed_batches = 0
-            total_batches = (len(documents) + batch_size - 1) // batch_size
-            
-            for i in range(0, len(documents), batch_size):
-                batch = documents[i:i+batch_size]
-                batch_contents = [doc["content"] for doc in batch]
-                
-                try:
-                    embeddings = embedding_model.embed_documents(batch_contents)
-                    vector_store.add_documents(batch, embeddings)
-                    processed_batches += 1
-                    app.logger.info(f"Processed batch {processed_batches}/{total_batches}")
-                except Exception as e:
-                    app.logger.error(f"Error processing batch {i//batch_size + 1}: {str(e)}")
-                    # Continue with next batch instead of failing completely
-            
-        # Store a session identifier for the vector store
-        if 'vector_store_id' not in session:
-            session['vector_store_id'] = str(uuid.uuid4())
-            
-        return jsonify({
-            'success': True, 
-            'repo_dir': repo_dir,
-            'file_count': len(file_contents),
-            'document_count': len(documents),
-            'directory': directory_structure
-        })
+        return jsonify({'success': True, 'job_id': job.id, 'status': job.status})
         
     except Exception as e:
         app.logger.error(f"Error processing repository: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'error': f"Error processing repository: {str(e)}"})
 
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """API endpoint to list ingestion jobs"""
+    return jsonify({'success': True, 'jobs': ingestion_jobs.list_jobs()})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """API endpoint to poll an ingestion job
+    
+    Once the caller's own job has succeeded, its repository becomes the
+    session's active repository.
+    """
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify(_job_response(job))
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job(job_id):
+    """API endpoint to stream ingestion job progress as server-sent events"""
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    
+    def generate():
+        while True:
+            state = job.to_dict()
+            yield f"data: {json.dumps(state)}\n\n"
+            if job.finished:
+                return
+            time.sleep(0.5)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """API endpoint to cancel a queued or running ingestion job"""
+    if ingestion_jobs.get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if not ingestion_jobs.cancel(job_id):
+        return jsonify({'success': False, 'error': 'Job has already finished'})
+    return jsonify({'success': True, 'job_id': job_id})
+
+@app.route('/api/embedding_stats', methods=['GET'])
+def get_embedding_stats():
+    """API endpoint to get embedding throughput statistics"""
+    return jsonify({'success': True, 'stats': embedding_model.get_stats()})
+
+@app.route('/api/cache_stats', methods=['GET'])
+def get_cache_stats():
+    """API endpoint to get chat response cache statistics"""
+    return jsonify({'success': True, 'stats': response_cache.get_stats()})
+
+@app.route('/api/conversation', methods=['GET'])
+def get_conversation():
+    """API endpoint to get the session's conversation memory and memory usage across sessions"""
+    index_key = session.get('repository', {}).get('index_key')
+    conversation = conversation_memory.history((index_key, _conversation_id()), max_tokens=1000000)
+    return jsonify({'success': True, 'conversation': conversation, 'stats': conversation_memory.get_stats()})
+
+@app.route('/api/conversation/clear', methods=['POST'])
+def clear_conversation():
+    """API endpoint to forget the session's conversation and start a new one"""
+    index_key = session.get('repository', {}).get('index_key')
+    conversation_memory.clear((index_key, _conversation_id()))
+    session['conversation_id'] = uuid.uuid4().hex
+    return jsonify({'success': True, 'conversation_id': session['conversation_id']})
+
+@app.route('/api/model_stats', methods=['GET'])
+def get_model_stats():
+    """API endpoint to get LLM client pool reuse, connection reuse, per-model routing stats and token counters"""
+    return jsonify({'success': True, 'stats': dict(ai_models.get_stats(), routing=model_router.get_stats(),
+                                                   token_counters=token_counters.get_stats())})
+
+@app.route('/api/indexes', methods=['GET'])
+def get_index_stats():
+    """API endpoint to get resident repository indexes and memory usage"""
+    return jsonify({'success': True, 'stats': index_registry.get_stats()})
+
+@app.route('/api/symbols', methods=['GET'])
+def lookup_symbol():
+    """API endpoint to find where a symbol is defined and referenced"""
+    name = request.args.get('name', '').strip()
+    if not name:
+        return jsonify({'success': False, 'error': 'Symbol name is required'})
+    
+    index_key = request.args.get('index_key') or session.get('repository', {}).get('index_key')
+    if not index_key or not index_registry.exists(index_key):
+        return jsonify({'success': False, 'error': 'No repository loaded'})
+    
+    start_time = time.time()
+    result = _get_symbol_index(index_key).lookup(name, kind=request.args.get('kind') or None,
+                                                 limit=int(request.args.get('limit', 100)))
+    result['lookup_ms'] = round((time.time() - start_time) * 1000, 3)
+    return jsonify(dict(result, success=True))
+
 @app.route('/api/directory_structure', methods=['GET'])
 def get_directory_structure():
     """API endpoint to get directory structure"""
@@ -412,122 +526,35 @@ def get_file_content():
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """API endpoint for chat"""
-    data = request.json
-    query = data.get('query', '').strip()
-    model_key = data.get('model', 'groq/llama-3.1-8b-instant')
-    max_tokens = int(data.get('max_tokens', 1000))
-    temperature = float(data.get('temperature', 0.7))
-    num_context_docs = int(data.get('num_context_docs', 5))
-    
-    if not query:
-        return jsonify({'success': False, 'error': 'Query is required'})
-    
-    # Check if repository is loaded
-    if not vector_store.has_documents():
-        return jsonify({
-            'success': False, 
-            'error': 'No repository data available. Please load a repository first.'
-        })
-    
+    start_time = time.time()
     try:
-        # Start timing for performance monitoring
-        start_time = time.time()
-        
-        # Determine appropriate agent based on query
-        agent = _determine_best_agent(query)
-        system_prompt = AI_AGENTS[agent]["system_prompt"]
-        
-        app.logger.info(f"Processing query with {agent} agent: {query[:50]}...")
-        
-        # Get relevant documents from vector store with error handling
-        try:
-            query_embedding = embedding_model.embed_query(query)
-            relevant_docs = vector_store.search(query_embedding, k=num_context_docs)
-        except Exception as embed_error:
-            app.logger.error(f"Error generating embeddings: {str(embed_error)}", exc_info=True)
-            return jsonify({
-                'success': False,
-                'error': f"Error finding relevant code: {str(embed_error)}"
-            })
-        
-        if not relevant_docs:
-            app.logger.warning("No relevant documents found in vector store")
-            return jsonify({
-                'success': True,
-                'response': "I couldn't find any relevant information in the repository to answer your question. Could you please rephrase or ask about a different topic?",
-                'agent': AI_AGENTS[agent]["name"],
-                'sources': []
-            })
-        
-        # Format context from documents with better organization and file type handling
-        context_parts = []
-        source_files = []
-        
-        for i, doc in enumerate(relevant_docs):
-            # Clean file path for presentation
-            source = doc['source'].replace('\\', '/')
-            source_files.append(source)
-            
-            # Get file extension to format context appropriately
-            _, file_ext = os.path.splitext(source)
-            file_ext = file_ext.lower()
-            
-            # Format content based on file type
-            content = doc['content']
-            
-            # Add document to context with better formatting
-            context_parts.append(f"FILE {i+1}: {source}\n\n```{file_ext[1:] if file_ext else ''}\n{content}\n```\n")
-        
-        context = "\n".join(context_parts)
-        
-        # Format the prompt with context and improved instructions
-        prompt = f"""
-I have a question about a code repository. Here is my question:
-
-{query}
-
-I'll provide context from relevant files in the repository:
-
-{context}
-
-Based on ONLY the information provided in these files:
-1. Answer the question directly and concisely
-2. If the answer can't be determined from the provided files, clearly state that
-3. Reference specific code and files when explaining your reasoning
-4. If showing code examples, ensure they are accurate and relevant
-5. Use markdown formatting in your response to improve readability
-"""
+        early, prepared = _prepare_chat(request.json, start_time, session.get('repository', {}).get('index_key'),
+                                        _conversation_id())
+        if early is not None:
+            return jsonify(early)
         
         # Get the model and generate response with error handling
         try:
-            app.logger.info(f"Using model: {model_key}")
-            model = ai_models.get_model(model_key)
-            
-            # Create messages
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ]
-            
-            # Get response from model with additional parameters
-            response = model.invoke(
-                messages,
-                max_tokens=max_tokens,
-                temperature=temperature
-            )
+            app.logger.info(f"Using model: {prepared['model_key']}")
+            # The requested model or a configured equivalent, with this request's settings bound
+            response, routing = model_router.invoke(prepared['model_key'], prepared['messages'],
+                                                    max_tokens=prepared['max_tokens'],
+                                                    temperature=prepared['temperature'])
             response_text = response.content
             
         except ValueError as model_error:
             app.logger.error(f"Model error: {str(model_error)}", exc_info=True)
             return jsonify({
                 'success': False,
-                'error': f"Error with AI model: {str(model_error)}"
+                'error': f"Error with AI model: {str(model_error)}",
+                'routing': getattr(model_error, 'routing', None)
             })
         except Exception as model_error:
             app.logger.error(f"Unexpected model error: {str(model_error)}", exc_info=True)
             return jsonify({
                 'success': False,
-                'error': f"An error occurred while processing your request: {str(model_error)}"
+                'error': f"An error occurred while processing your request: {str(model_error)}",
+                'routing': getattr(model_error, 'routing', None)
             })
         
         # Calculate processing time
@@ -541,13 +568,10 @@ Based on ONLY the information provided in these files:
                 'error': "The AI model returned an empty response. Please try again or adjust your query."
             })
         
-        return jsonify({
-            'success': True,
-            'response': response_text,
-            'agent': AI_AGENTS[agent]["name"],
-            'sources': source_files,
-            'processing_time': f"{processing_time:.2f}s"
-        })
+        result = _chat_result(prepared, response_text)
+        return jsonify(dict(result, cache={'hit': False}, processing_time=f"{processing_time:.2f}s", routing=routing,
+                            usage=_usage(prepared, response_text, reported_usage(response)),
+                            conversation=prepared['conversation']))
         
     except ValueError as e:
         app.logger.warning(f"Value error in chat: {str(e)}")
@@ -556,10 +580,466 @@ Based on ONLY the information provided in these files:
         app.logger.error(f"Error in chat: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'error': f"An error occurred: {str(e)}"})
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """API endpoint for chat that streams the answer as server-sent events
+    
+    Events, in order: ``sources`` (retrieved files, agent, context and prompt
+    size), any number of ``token`` (answer text as the model produces it) and
+    ``done`` (timing stats, including time to first token, and token usage). Failures send a
+    single ``error`` event instead.
+    """
+    start_time = time.time()
+    try:
+        early, prepared = _prepare_chat(request.json, start_time, session.get('repository', {}).get('index_key'),
+                                        _conversation_id())
+    except Exception as e:
+        app.logger.error(f"Error in chat: {str(e)}", exc_info=True)
+        early, prepared = {'success': False, 'error': f"An error occurred: {str(e)}"}, None
+    
+    def generate():
+        if early is not None:
+            yield from _early_events(early, start_time)
+            return
+        
+        yield _sse('sources', _sources_event(prepared))
+        
+        generation_start = time.time()
+        first_token_time = None
+        parts = []
+        routing = {}
+        reported = None
+        try:
+            for chunk in model_router.stream(prepared['model_key'], prepared['messages'], routing,
+                                             max_tokens=prepared['max_tokens'], temperature=prepared['temperature']):
+                # Providers that report usage while streaming do so on the last chunk
+                reported = reported_usage(chunk) or reported
+                text = _chunk_text(chunk)
+                if not text:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.time()
+                parts.append(text)
+                yield _sse('token', {'text': text})
+        except Exception as model_error:
+            app.logger.error(f"Model error while streaming: {str(model_error)}", exc_info=True)
+            yield _sse('error', {'error': f"Error with AI model: {str(model_error)}", 'routing': routing})
+            return
+        
+        response_text = ''.join(parts)
+        if not response_text.strip():
+            yield _sse('error', {'error': "The AI model returned an empty response. Please try again or adjust your query."})
+            return
+        
+        timing = _stream_timing(prepared, start_time, generation_start, first_token_time, len(parts))
+        _chat_result(prepared, response_text)
+        yield _sse('done', {'cache': {'hit': False}, 'timing': timing, 'routing': routing,
+                            'usage': _usage(prepared, response_text, reported)})
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # ==================
 # Helper Functions
 # ==================
 
+def _ingest_repository(job):
+    """Clone or locate a repository and ingest it into its index (runs in a job worker)"""
+    repo_path = job.repo_path
+    chunker = job.params['chunker']
+    max_workers = job.params['max_workers']
+    
+    # Each repository has its own index, checked out so it isn't evicted mid-ingestion
+    with index_registry.checkout(job.key, write=True) as vector_store:
+        # Load the index manifest so only added, changed or removed files are re-indexed.
+        # If the settings changed or the store and manifest disagree, both are reset for a full re-index.
+        manifest = IndexManifest.load(repo_handler.get_manifest_path(repo_path))
+        if not sync_manifest(manifest, vector_store, {'chunk_size': chunker.chunk_size,
+                                                      'chunk_overlap': chunker.chunk_overlap,
+                                                      'embedding_model': embedding_model.model_id}):
+            app.logger.info(f"Full re-index of {repo_path}: index settings changed or index out of sync")
+        symbol_index = _get_symbol_index(job.key)
+        
+        # Clone, extract or locate the repository and get file structure
+        job.phase = 'preparing'
+        try:
+            repo_dir, directory_structure = repo_handler.prepare_repository(repo_path)
+        except Exception as repo_error:
+            app.logger.error(f"Repository processing error: {str(repo_error)}", exc_info=True)
+            raise ValueError(f"Failed to process repository: {str(repo_error)}. "
+                             "Please check that the repository URL or path is correct and accessible.")
+        
+        # Set repository in file explorer
+        file_explorer.set_repository(repo_dir, directory_structure)
+        
+        # Stream files through read -> chunk -> embed -> index with bounded buffers
+        job.phase = 'indexing'
+        app.logger.info(f"Ingesting {repo_dir} with {max_workers} reader workers")
+        pipeline = IngestionPipeline(
+            repo_handler=repo_handler,
+            embedding_model=embedding_model,
+            vector_store=vector_store,
+            chunker=chunker,
+            read_workers=max_workers,
+            symbol_index=symbol_index,
+            deduplicate=os.getenv("DEDUPLICATE", "true").lower() != "false"
+        )
+        job.attach(pipeline)
+        try:
+            index_summary = pipeline.run(repo_dir, manifest=manifest)
+        finally:
+            # Persist alongside the manifest so both describe the same state, even when cancelled
+            job.phase = 'saving'
+            index_registry.save(job.key)
+            symbol_index.save()
+        app.logger.info(f"Index update: {index_summary}")
+        
+        # Cached answers are keyed by index version, so this only frees their memory early
+        if index_summary['chunks_embedded'] or index_summary['vectors_removed']:
+            response_cache.invalidate(job.key)
+    
+    return {
+        'repo_dir': repo_dir,
+        'index_key': job.key,
+        'file_count': index_summary['files_read'],
+        'document_count': len(manifest.vector_ids()),
+        'embedded_chunks': index_summary['chunks_embedded'],
+        'skipped_files': index_summary['skipped'],
+        'reembedded_files': index_summary['reembedded'],
+        'removed_files': index_summary['removed'],
+        'symbol_count': len(symbol_index),
+        'deduplication': {
+            'duplicate_chunks': index_summary['duplicate_chunks'],
+            'duplicate_files': index_summary['duplicate_files'],
+            'duplicate_bytes': index_summary['duplicate_bytes'],
+            'vector_bytes_saved': index_summary['vector_bytes_saved']
+        },
+        'embedding_stats': embedding_model.get_stats(),
+        'directory': directory_structure
+    }
+
+def _job_response(job):
+    """Build the API response for a job, activating its repository for the owning session"""
+    response = job.to_dict()
+    response['success'] = job.status != 'failed'
+    if job.status == 'succeeded' and job.result:
+        response.update(job.result)
+        if session.get('repository_job') == job.id:
+            session['repository'] = {
+                'path': job.result['repo_dir'],
+                'index_key': job.result['index_key'],
+                'structure': json.dumps(str(job.result['directory'])[:1000] + '...')  # Truncated for session storage
+            }
+    return response
+
+def _get_symbol_index(index_key):
+    """Return a repository's symbol index, loading it from disk on first use"""
+    with symbol_indexes_lock:
+        if index_key not in symbol_indexes:
+            symbol_indexes[index_key] = SymbolIndex.load(
+                os.path.join(repo_handler.index_base_dir, index_key, 'symbols.json'))
+        return symbol_indexes[index_key]
+
+def _conversation_id():
+    """The session's conversation id, starting a conversation if it has none"""
+    if 'conversation_id' not in session:
+        session['conversation_id'] = uuid.uuid4().hex
+    return session['conversation_id']
+
+def _prepare_chat(data, start_time, index_key, conversation_id=None):
+    """Validate a chat request and retrieve its repository context
+    
+    Blocking (embedding, FAISS and cache lookups), so the async server runs
+    it in an executor. ``index_key`` is the session's repository index and
+    ``conversation_id`` its conversation, whose recent turns and summary
+    are sent along with the question.
+    Returns ``(early, None)`` when the request is answered without calling a
+    model (errors, cache hits, nothing relevant found), otherwise
+    ``(None, prepared)`` with the model messages and everything needed to
+    build and cache the final response.
+    """
+    query = data.get('query', '').strip()
+    model_key = data.get('model', 'groq/llama-3.1-8b-instant')
+    max_tokens = int(data.get('max_tokens', 1000))
+    temperature = float(data.get('temperature', 0.7))
+    num_context_docs = int(data.get('num_context_docs', 5))
+    use_cache = bool(data.get('use_cache', True))
+    # Relevance/diversity trade-off for re-ranking (1.0 turns re-ranking off)
+    mmr_lambda = float(data.get('mmr_lambda', DEFAULT_MMR_LAMBDA))
+    
+    if not query:
+        return {'success': False, 'error': 'Query is required'}, None
+    
+    # Check if repository is loaded
+    if not index_key or not index_registry.exists(index_key):
+        return {
+            'success': False, 
+            'error': 'No repository data available. Please load a repository first.'
+        }, None
+    
+    # Optional restriction to files by path, language, extension, size or modification time
+    filters = MetadataFilter.from_dict(data.get('filters'))
+    
+    # A follow-up about the previous answer's files starts from the context that answer used
+    conversation_key = (index_key, conversation_id) if conversation_id else None
+    follow_up = conversation_memory.follow_up(conversation_key, query) if conversation_key else None
+    
+    # Answers are cached per index version, so any re-ingest that changes the index invalidates them
+    with index_registry.checkout(index_key) as vector_store:
+        cache_scope = (index_key, vector_store.version)
+    cache_params = {'model': model_key, 'max_tokens': max_tokens, 'temperature': temperature,
+                    'num_context_docs': num_context_docs, 'filters': filters.key() if filters else None,
+                    'mmr_lambda': mmr_lambda}
+    if follow_up:
+        # The answer depends on the turns before it, so it is only reusable within this conversation
+        cache_params['conversation'] = [conversation_id, follow_up['turn']]
+    if use_cache:
+        cached = response_cache.get(cache_scope, query, cache_params)
+        if cached:
+            return _cached_response(cached, start_time, conversation_key, query), None
+    
+    # Determine appropriate agent based on query
+    agent = _determine_best_agent(query)
+    system_prompt = AI_AGENTS[agent]["system_prompt"]
+    
+    app.logger.info(f"Processing query with {agent} agent: {query[:50]}...")
+    
+    # Token budget for context: the model's window minus the reply and the rest of the prompt,
+    # less headroom for the counting error (small with the model's own tokenizer)
+    counter = token_counters.for_model(model_key)
+    context_packer = ContextPacker(count_tokens=counter.count, min_snippet_tokens=MIN_CONTEXT_TOKENS)
+    context_window = ai_models.get_model_info(model_key).get('tokens', DEFAULT_CONTEXT_WINDOW)
+    prompt_limit = int((context_window - max_tokens) * (1 - counter.safety_margin))
+    history = conversation_memory.history(conversation_key, int(prompt_limit * CONVERSATION_HISTORY_SHARE),
+                                          counter.count)
+    prompt_overhead = counter.count_messages(_chat_messages(system_prompt, query, '', history))
+    context_budget = prompt_limit - prompt_overhead
+    if context_budget < MIN_CONTEXT_TOKENS:
+        return {
+            'success': False,
+            'error': f"The question and instructions take {prompt_overhead} tokens, so max_tokens={max_tokens} "
+                     f"leaves no room for repository context in this model's {context_window}-token window. "
+                     f"Please shorten the question or lower max_tokens."
+        }, None
+    
+    # Get ranked candidates from the vector store with error handling
+    try:
+        # Follow-ups like "where is it tested?" say little on their own; search with the question they follow
+        search_text = f"{follow_up['query']} {query}" if follow_up else query
+        query_embedding = embedding_model.embed_query(search_text)
+        if use_cache:
+            cached = response_cache.get_similar(cache_scope, cache_params, query_embedding)
+            if cached:
+                return _cached_response(cached, start_time, conversation_key, query), None
+        
+        # Exact symbol definitions named in the question go ahead of the fuzzy hits,
+        # followed by the chunks a followed-up answer was based on
+        symbol_hits = _get_symbol_index(index_key).find_in_text(query)
+        with index_registry.checkout(index_key) as vector_store:
+            symbol_docs = vector_store.documents_at(
+                [(d['path'], d['line']) for hit in symbol_hits for d in hit['definitions']], filters)
+            reused_docs = vector_store.documents_at(follow_up['locations'], filters) if follow_up else []
+            relevant_docs = symbol_docs + reused_docs + vector_store.search(
+                query_embedding, k=max(num_context_docs * 4, 20), max_chars=None, query_text=search_text,
+                filters=filters, mmr_lambda=mmr_lambda)
+    except Exception as embed_error:
+        app.logger.error(f"Error generating embeddings: {str(embed_error)}", exc_info=True)
+        return {
+            'success': False,
+            'error': f"Error finding relevant code: {str(embed_error)}"
+        }, None
+    
+    # Fill the budget with whole chunks or trimmed snippets, without overlapping line ranges,
+    # then measure the assembled prompt and shrink the context until it fits before sending
+    context_pieces = context_packer.pack(relevant_docs, context_budget, query)
+    context = context_packer.render(context_pieces)
+    messages = _chat_messages(system_prompt, query, context, history)
+    prompt_tokens = counter.count_messages(messages)
+    budget = context_budget
+    while context_pieces and prompt_tokens > prompt_limit:
+        budget -= prompt_tokens - prompt_limit
+        context_pieces = context_packer.pack(relevant_docs, budget, query) if budget >= MIN_CONTEXT_TOKENS else []
+        context = context_packer.render(context_pieces)
+        messages = _chat_messages(system_prompt, query, context, history)
+        prompt_tokens = counter.count_messages(messages)
+    
+    if not context_pieces:
+        app.logger.warning("No relevant documents found in vector store")
+        return {
+            'success': True,
+            'response': "I couldn't find any relevant information in the repository to answer your question. Could you please rephrase or ask about a different topic?",
+            'agent': AI_AGENTS[agent]["name"],
+            'sources': [],
+            'usage': _no_usage('none')
+        }, None
+    
+    source_files = []
+    for piece in context_pieces:
+        # Clean file path for presentation
+        source = piece['source'].replace('\\', '/')
+        if source not in source_files:
+            source_files.append(source)
+    
+    return None, {
+        'query': query,
+        'model_key': model_key,
+        'max_tokens': max_tokens,
+        'temperature': temperature,
+        'use_cache': use_cache,
+        'cache_scope': cache_scope,
+        'cache_params': cache_params,
+        'query_embedding': query_embedding,
+        'agent': AI_AGENTS[agent]["name"],
+        'sources': source_files,
+        'symbols': [hit['symbol'] for hit in symbol_hits],
+        'context_tokens': counter.count(context),
+        'context_budget': context_budget,
+        'prompt_tokens': prompt_tokens,
+        'token_counter': counter,
+        'messages': messages,
+        'conversation_key': conversation_key,
+        # Where the context came from, for follow-ups to start from
+        'locations': [(piece['source'], line) for piece in context_pieces
+                      for line in (piece['start_line'], piece['end_line'])],
+        'conversation': {
+            'id': conversation_id,
+            'turn': history['turn_count'] + 1,
+            'history_turns': len(history['turns']),
+            'summarized_turns': history['summarized'],
+            'follow_up': bool(follow_up),
+            'reused_sources': follow_up['sources'] if follow_up else []
+        },
+        'retrieval_time': time.time() - start_time
+    }
+
+def _fits_context(model_key, messages, max_tokens):
+    """Check that a prompt packed for another model, plus the reply, fits this model's window"""
+    counter = token_counters.for_model(model_key)
+    context_window = ai_models.get_model_info(model_key).get('tokens', DEFAULT_CONTEXT_WINDOW)
+    return counter.count_messages(messages) <= int((context_window - (max_tokens or 0)) * (1 - counter.safety_margin))
+
+def _chat_result(prepared, response_text):
+    """Build the cacheable chat result for a model answer, caching it if requested and remembering the turn"""
+    result = {
+        'success': True,
+        'response': response_text,
+        'agent': prepared['agent'],
+        'sources': prepared['sources'],
+        'symbols': prepared['symbols'],
+        'context_tokens': prepared['context_tokens'],
+        'context_budget': prepared['context_budget']
+    }
+    if prepared['use_cache']:
+        # The context's locations are kept so a cache hit can still be followed up on
+        response_cache.put(prepared['cache_scope'], prepared['query'], prepared['cache_params'],
+                           dict(result, locations=prepared['locations']), embedding=prepared['query_embedding'])
+    if prepared['conversation_key']:
+        conversation_memory.add_turn(prepared['conversation_key'], prepared['query'], response_text,
+                                     prepared['sources'], prepared['locations'])
+    return result
+
+def _cached_response(cached, start_time, conversation_key=None, query=None):
+    """Build the API response for a cache hit, remembering it as a turn of the conversation"""
+    cached_result, cache_info = cached
+    result = {key: value for key, value in cached_result.items() if key != 'locations'}
+    app.logger.info(f"Chat cache hit ({cache_info['type']})")
+    if conversation_key:
+        conversation_memory.add_turn(conversation_key, query, result['response'], result.get('sources', []),
+                                     cached_result.get('locations', []))
+    return dict(result, cache=cache_info, processing_time=f"{time.time() - start_time:.2f}s", usage=_no_usage('cache'))
+
+def _usage(prepared, response_text, reported=None):
+    """Prompt/completion token counts of an answer: as reported by the provider, otherwise counted
+    
+    ``estimated_prompt_tokens`` is the pre-flight count, kept next to the
+    provider's figure so the estimate's error can be tracked.
+    """
+    counter = prepared['token_counter']
+    usage = reported or {'prompt_tokens': prepared['prompt_tokens'],
+                         'completion_tokens': counter.count(response_text)}
+    return dict(usage, total_tokens=usage['prompt_tokens'] + usage['completion_tokens'],
+                estimated_prompt_tokens=prepared['prompt_tokens'],
+                counted_by='provider' if reported else counter.method)
+
+def _no_usage(counted_by):
+    """Token usage of an answer that did not call a model (cache hits, nothing retrieved)"""
+    return {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'counted_by': counted_by}
+
+def _sources_event(result):
+    """The part of a chat result that is known before the answer, for the first streamed event"""
+    return {key: result[key] for key in ('agent', 'sources', 'symbols', 'context_tokens', 'context_budget',
+                                         'prompt_tokens', 'conversation') if key in result}
+
+def _early_events(early, start_time):
+    """Server-sent events for a chat answered without streaming from a model"""
+    # Errors, cache hits and empty retrievals arrive complete
+    if not early.get('success'):
+        yield _sse('error', {'error': early['error']})
+        return
+    elapsed_ms = round((time.time() - start_time) * 1000, 1)
+    yield _sse('sources', _sources_event(early))
+    yield _sse('token', {'text': early['response']})
+    yield _sse('done', {'cache': early.get('cache', {'hit': False}), 'usage': early.get('usage'),
+                        'timing': {'time_to_first_token_ms': elapsed_ms, 'total_ms': elapsed_ms}})
+
+def _stream_timing(prepared, start_time, generation_start, first_token_time, chunks):
+    """Timing stats for the final event of a streamed answer"""
+    end_time = time.time()
+    timing = {
+        'retrieval_ms': round(prepared['retrieval_time'] * 1000, 1),
+        'time_to_first_token_ms': round((first_token_time - start_time) * 1000, 1),
+        'model_first_token_ms': round((first_token_time - generation_start) * 1000, 1),
+        'generation_ms': round((end_time - first_token_time) * 1000, 1),
+        'total_ms': round((end_time - start_time) * 1000, 1),
+        'chunks': chunks
+    }
+    app.logger.info(f"Streamed query: first token after {timing['time_to_first_token_ms']}ms, "
+                    f"done after {timing['total_ms']}ms")
+    return timing
+
+def _chunk_text(chunk):
+    """Text of a streamed message chunk; some providers stream lists of content blocks"""
+    content = getattr(chunk, 'content', chunk)
+    if isinstance(content, list):
+        return ''.join(block.get('text', '') if isinstance(block, dict) else str(block) for block in content)
+    return content or ''
+
+def _sse(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _chat_messages(system_prompt, query, context, history=None):
+    """Chat messages sent to the model: instructions, the conversation so far, then the question and its context"""
+    history = history or {}
+    if history.get('summary'):
+        system_prompt += f"\n\nSummary of the earlier conversation:\n{history['summary']}"
+    messages = [{"role": "system", "content": system_prompt}]
+    # Earlier questions without their repository context; the answers carry what mattered from it
+    for turn in history.get('turns', []):
+        messages.append({"role": "user", "content": turn['query']})
+        messages.append({"role": "assistant", "content": turn['answer']})
+    messages.append({"role": "user", "content": _build_prompt(query, context)})
+    return messages
+
+def _build_prompt(query, context):
+    """Format the user prompt with the question, repository context and instructions"""
+    return f"""
+I have a question about a code repository. Here is my question:
+
+{query}
+
+I'll provide context from relevant files in the repository:
+
+{context}
+
+Based on ONLY the information provided in these files:
+1. Answer the question directly and concisely
+2. If the answer can't be determined from the provided files, clearly state that
+3. Reference specific code and files when explaining your reasoning
+4. If showing code examples, ensure they are accurate and relevant
+5. Use markdown formatting in your response to improve readability
+"""
+
 def _determine_best_agent(query):
     """Determine the best agent based on the query content"""
     query = query.lower()
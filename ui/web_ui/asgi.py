@@ -0,0 +1,228 @@
+"""Asyncio-native serving mode for the web UI.
+
+Chat and symbol lookups are served by async handlers: blocking work
+(embedding, FAISS search, caches) runs in a thread pool and LLM calls use
+``ainvoke``/``astream``, so one process can hold hundreds of in-flight model
+calls. Every other route, template and static file is served by the Flask
+app mounted underneath, sharing its session cookie and in-process state.
+
+Run with:
+    uvicorn ui.web_ui.asgi:app --port 8080
+or:
+    python main.py --ui web --asgi
+"""
+import os
+import sys
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+current_dir = Path(__file__).parent
+parent_dir = str(current_dir.parent.parent)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from models.token_counter import reported_usage
+from ui.web_ui.app import (app as flask_app, model_router, index_registry, _prepare_chat, _chat_result, _usage,
+                           _early_events, _stream_timing, _sources_event, _chunk_text, _sse, _get_symbol_index)
+
+# Embedding, FAISS and cache work; sized for CPU-bound tasks, not for in-flight LLM calls
+retrieval_executor = ThreadPoolExecutor(max_workers=int(os.getenv("ASGI_RETRIEVAL_WORKERS", min(32, (os.cpu_count() or 1) + 4))),
+                                        thread_name_prefix='retrieval')
+# Upper bound on concurrent LLM calls; further requests wait for a slot
+MAX_INFLIGHT_LLM_CALLS = int(os.getenv("ASGI_MAX_INFLIGHT_LLM_CALLS", 256))
+_llm_slots = None
+_inflight = 0
+
+
+def _slots():
+    """Semaphore for LLM calls, created on the serving event loop"""
+    global _llm_slots
+    if _llm_slots is None:
+        _llm_slots = asyncio.Semaphore(MAX_INFLIGHT_LLM_CALLS)
+    return _llm_slots
+
+
+def _session(request):
+    """The Flask session of a request, decoded from its signed cookie"""
+    cookie = request.cookies.get(flask_app.config.get('SESSION_COOKIE_NAME', 'session'))
+    if not cookie:
+        return {}
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    if serializer is None:
+        return {}
+    try:
+        return serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return {}
+
+
+async def _run_blocking(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(retrieval_executor, func, *args)
+
+
+async def _prepare(request, start_time):
+    data = await request.json()
+    # Conversations are started by the Flask pages, which can set the session cookie
+    session = _session(request)
+    return await _run_blocking(_prepare_chat, data, start_time, session.get('repository', {}).get('index_key'),
+                               session.get('conversation_id'))
+
+
+async def chat(request):
+    """API endpoint for chat"""
+    global _inflight
+    start_time = time.time()
+    try:
+        early, prepared = await _prepare(request, start_time)
+        if early is not None:
+            return JSONResponse(early)
+
+        try:
+            async with _slots():
+                _inflight += 1
+                try:
+                    response, routing = await model_router.ainvoke(prepared['model_key'], prepared['messages'],
+                                                                   max_tokens=prepared['max_tokens'],
+                                                                   temperature=prepared['temperature'])
+                finally:
+                    _inflight -= 1
+            response_text = response.content
+        except ValueError as model_error:
+            flask_app.logger.error(f"Model error: {str(model_error)}", exc_info=True)
+            return JSONResponse({'success': False, 'error': f"Error with AI model: {str(model_error)}",
+                                 'routing': getattr(model_error, 'routing', None)})
+        except Exception as model_error:
+            flask_app.logger.error(f"Unexpected model error: {str(model_error)}", exc_info=True)
+            return JSONResponse({'success': False,
+                                 'error': f"An error occurred while processing your request: {str(model_error)}",
+                                 'routing': getattr(model_error, 'routing', None)})
+
+        processing_time = time.time() - start_time
+        if not response_text or response_text.strip() == "":
+            return JSONResponse({
+                'success': False,
+                'error': "The AI model returned an empty response. Please try again or adjust your query."
+            })
+
+        result = await _run_blocking(_chat_result, prepared, response_text)
+        return JSONResponse(dict(result, cache={'hit': False}, processing_time=f"{processing_time:.2f}s",
+                                 routing=routing, usage=_usage(prepared, response_text, reported_usage(response)),
+                                 conversation=prepared['conversation']))
+
+    except ValueError as e:
+        flask_app.logger.warning(f"Value error in chat: {str(e)}")
+        return JSONResponse({'success': False, 'error': f"Value error: {str(e)}"})
+    except Exception as e:
+        flask_app.logger.error(f"Error in chat: {str(e)}", exc_info=True)
+        return JSONResponse({'success': False, 'error': f"An error occurred: {str(e)}"})
+
+
+async def chat_stream(request):
+    """API endpoint for chat that streams the answer as server-sent events (same events as the Flask route)"""
+    start_time = time.time()
+    try:
+        early, prepared = await _prepare(request, start_time)
+    except Exception as e:
+        flask_app.logger.error(f"Error in chat: {str(e)}", exc_info=True)
+        early, prepared = {'success': False, 'error': f"An error occurred: {str(e)}"}, None
+
+    async def generate():
+        global _inflight
+        if early is not None:
+            for event in _early_events(early, start_time):
+                yield event
+            return
+
+        yield _sse('sources', _sources_event(prepared))
+
+        generation_start = time.time()
+        first_token_time = None
+        parts = []
+        routing = {}
+        reported = None
+        try:
+            async with _slots():
+                _inflight += 1
+                try:
+                    async for chunk in model_router.astream(prepared['model_key'], prepared['messages'], routing,
+                                                            max_tokens=prepared['max_tokens'],
+                                                            temperature=prepared['temperature']):
+                        reported = reported_usage(chunk) or reported
+                        text = _chunk_text(chunk)
+                        if not text:
+                            continue
+                        if first_token_time is None:
+                            first_token_time = time.time()
+                        parts.append(text)
+                        yield _sse('token', {'text': text})
+                finally:
+                    _inflight -= 1
+        except Exception as model_error:
+            flask_app.logger.error(f"Model error while streaming: {str(model_error)}", exc_info=True)
+            yield _sse('error', {'error': f"Error with AI model: {str(model_error)}", 'routing': routing})
+            return
+
+        response_text = ''.join(parts)
+        if not response_text.strip():
+            yield _sse('error', {'error': "The AI model returned an empty response. Please try again or adjust your query."})
+            return
+
+        timing = _stream_timing(prepared, start_time, generation_start, first_token_time, len(parts))
+        await _run_blocking(_chat_result, prepared, response_text)
+        yield _sse('done', {'cache': {'hit': False}, 'timing': timing, 'routing': routing,
+                            'usage': _usage(prepared, response_text, reported)})
+
+    return StreamingResponse(generate(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def lookup_symbol(request):
+    """API endpoint to find where a symbol is defined and referenced"""
+    name = request.query_params.get('name', '').strip()
+    if not name:
+        return JSONResponse({'success': False, 'error': 'Symbol name is required'})
+
+    index_key = request.query_params.get('index_key') or _session(request).get('repository', {}).get('index_key')
+    if not index_key or not index_registry.exists(index_key):
+        return JSONResponse({'success': False, 'error': 'No repository loaded'})
+
+    def lookup():
+        start_time = time.time()
+        result = _get_symbol_index(index_key).lookup(name, kind=request.query_params.get('kind') or None,
+                                                     limit=int(request.query_params.get('limit', 100)))
+        result['lookup_ms'] = round((time.time() - start_time) * 1000, 3)
+        return result
+
+    result = await _run_blocking(lookup)
+    return JSONResponse(dict(result, success=True))
+
+
+async def serving_stats(request):
+    """API endpoint to get in-flight LLM calls and retrieval executor load"""
+    return JSONResponse({'success': True, 'stats': {
+        'inflight_llm_calls': _inflight,
+        'max_inflight_llm_calls': MAX_INFLIGHT_LLM_CALLS,
+        'retrieval_workers': retrieval_executor._max_workers,
+        'retrieval_queue': retrieval_executor._work_queue.qsize(),
+    }})
+
+
+app = Starlette(routes=[
+    Route('/api/chat', chat, methods=['POST']),
+    Route('/api/chat/stream', chat_stream, methods=['POST']),
+    Route('/api/symbols', lookup_symbol, methods=['GET']),
+    Route('/api/serving_stats', serving_stats, methods=['GET']),
+    # Everything else (pages, ingestion, file APIs, static files) is the Flask app
+    Mount('/', app=WSGIMiddleware(flask_app)),
+])
@@ -135,38 +135,98 @@ document.addEventListener('DOMContentLoaded', function() {
         const selectedModel = modelSelector.value;
         const maxTokens = maxTokensSlider.value;
         
-        // Send message to server
-        fetch('/chat', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/x-www-form-urlencoded',
+        // Stream the answer from the server: sources first, then tokens as they are generated
+        let messageDiv = null;
+        let answer = '';
+        
+        streamChat({
+            query: message,
+            model: selectedModel,
+            max_tokens: parseInt(maxTokens) || 1000
+        }, {
+            sources: function(data) {
+                // Remove thinking message
+                removeThinkingMessage();
+                if (data.sources && data.sources.length > 0) {
+                    addSystemMessage(`Sources: ${data.sources.join(', ')}`);
+                }
+                messageDiv = addAssistantMessage('');
             },
-            body: `message=${encodeURIComponent(message)}&model=${encodeURIComponent(selectedModel)}&max_tokens=${encodeURIComponent(maxTokens)}`
-        })
-        .then(response => response.json())
-        .then(data => {
-            // Remove thinking message
-            removeThinkingMessage();
-            
-            if (data.success) {
-                // Add AI response to chat
-                addAssistantMessage(data.response);
-            } else {
-                // Show error message
-                addSystemMessage(`Error: ${data.message}`);
+            token: function(data) {
+                answer += data.text;
+                updateAssistantMessage(messageDiv, answer);
+            },
+            done: function(data) {
+                const timing = data.timing || {};
+                addSystemMessage(`First token after ${Math.round(timing.time_to_first_token_ms)} ms, ` +
+                                 `answer complete after ${(timing.total_ms / 1000).toFixed(1)} s`);
+                if (data.usage && data.usage.total_tokens) {
+                    addSystemMessage(`Tokens: ${data.usage.prompt_tokens} prompt, ` +
+                                     `${data.usage.completion_tokens} completion`);
+                }
+            },
+            error: function(data) {
+                removeThinkingMessage();
+                addSystemMessage(`Error: ${data.error}`);
             }
-            
-            // Re-enable send button
-            sendMessageBtn.disabled = false;
         })
         .catch(error => {
             console.error('Error:', error);
             removeThinkingMessage();
             addSystemMessage('An error occurred while processing your message.');
+        })
+        .finally(() => {
+            // Re-enable send button
             sendMessageBtn.disabled = false;
         });
     }
     
+    // POST a chat request and dispatch its server-sent events to handlers by event name
+    function streamChat(payload, handlers) {
+        return fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(payload)
+        })
+        .then(response => {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            
+            function read() {
+                return reader.read().then(({ done, value }) => {
+                    if (done) {
+                        return;
+                    }
+                    buffer += decoder.decode(value, { stream: true });
+                    
+                    let boundary;
+                    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                        const raw = buffer.slice(0, boundary);
+                        buffer = buffer.slice(boundary + 2);
+                        
+                        let event = 'message';
+                        let data = '';
+                        raw.split('\n').forEach(line => {
+                            if (line.startsWith('event: ')) {
+                                event = line.slice(7);
+                            } else if (line.startsWith('data: ')) {
+                                data += line.slice(6);
+                            }
+                        });
+                        if (handlers[event]) {
+                            handlers[event](JSON.parse(data));
+                        }
+                    }
+                    return read();
+                });
+            }
+            return read();
+        });
+    }
+    
     // Add a user message to the chat
     function addUserMessage(content) {
         const messageDiv = document.createElement('div');
@@ -201,6 +261,13 @@ document.addEventListener('DOMContentLoaded', function() {
         
         chatMessages.appendChild(messageDiv);
         scrollToBottom();
+        return messageDiv;
+    }
+    
+    // Replace the text of an assistant message while it is being streamed
+    function updateAssistantMessage(messageDiv, content) {
+        messageDiv.querySelector('.message-content p').innerHTML = formatMessageContent(content);
+        scrollToBottom();
     }
     
     // Add a system message to the chat
@@ -0,0 +1,185 @@
+import os
+import re
+import ast
+from typing import List, Dict, Optional
+
+
+class Chunker:
+    """Syntax-aware splitter that turns file contents into overlapping chunks.
+
+    Python is split on ``ast`` function/class boundaries, brace languages on
+    top-level blocks, indentation-based files on dedents and prose on
+    headings. Boundaries are then packed greedily into chunks of at most
+    ``chunk_size`` characters, with ``chunk_overlap`` characters of trailing
+    context repeated at the start of the next chunk. Every chunk carries
+    1-based, inclusive ``start_line``/``end_line`` metadata.
+    """
+
+    PYTHON_EXTENSIONS = {'.py', '.pyw', '.pyi'}
+    PROSE_EXTENSIONS = {'.md', '.markdown', '.rst', '.txt', '.adoc'}
+    BRACE_EXTENSIONS = {
+        '.js', '.jsx', '.ts', '.tsx', '.mjs', '.cjs', '.java', '.c', '.h', '.cpp', '.hpp',
+        '.cc', '.cs', '.go', '.rs', '.php', '.swift', '.kt', '.kts', '.scala', '.dart',
+        '.css', '.scss', '.less', '.json',
+    }
+
+    HEADING_PATTERN = re.compile(r'^(#{1,6}\s|={3,}\s*$|-{3,}\s*$|~{3,}\s*$)')
+
+    def __init__(self, chunk_size: int = 500, chunk_overlap: Optional[int] = None):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_size // 10 if chunk_overlap is None else max(0, min(chunk_overlap, chunk_size // 2))
+
+    def chunk(self, content: str, source: str) -> List[Dict]:
+        """Split a file's content into chunk documents"""
+        lines = content.splitlines(keepends=True)
+        if not lines:
+            return []
+
+        boundaries = self._find_boundaries(lines, content, source)
+        chunks = []
+        for start, end in self._pack(lines, boundaries):
+            text = ''.join(lines[start:end])
+            if not text.strip():
+                continue
+            chunks.append({
+                "content": text,
+                "source": source,
+                "start_line": start + 1,
+                "end_line": end,
+                "chunk_index": len(chunks),
+            })
+        return chunks
+
+    # ------------------------------------------------------------------
+    # Boundary detection
+    # ------------------------------------------------------------------
+
+    def _find_boundaries(self, lines: List[str], content: str, source: str) -> List[int]:
+        """Return sorted 0-based line indexes where a new unit may begin"""
+        extension = os.path.splitext(source)[1].lower()
+        if extension in self.PYTHON_EXTENSIONS:
+            boundaries = self._python_boundaries(content)
+            if boundaries is None:
+                boundaries = self._indent_boundaries(lines)
+        elif extension in self.PROSE_EXTENSIONS:
+            boundaries = self._prose_boundaries(lines)
+        elif extension in self.BRACE_EXTENSIONS or content.count('{') >= 2:
+            boundaries = self._brace_boundaries(lines)
+        else:
+            boundaries = self._indent_boundaries(lines)
+
+        return sorted({b for b in boundaries if 0 < b < len(lines)} | {0})
+
+    def _python_boundaries(self, content: str) -> Optional[List[int]]:
+        """Function and class boundaries from the Python AST (None on syntax errors)"""
+        try:
+            tree = ast.parse(content)
+        except (SyntaxError, ValueError):
+            return None
+
+        boundaries = []
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                first_line = min([node.lineno] + [d.lineno for d in node.decorator_list])
+                boundaries.append(first_line - 1)
+                if getattr(node, 'end_lineno', None):
+                    boundaries.append(node.end_lineno)
+        return boundaries
+
+    def _brace_boundaries(self, lines: List[str]) -> List[int]:
+        """Boundaries at statements that start at brace depth 0, or depth 1 after a blank line"""
+        boundaries = []
+        depth = 0
+        previous_blank = True
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if stripped and not stripped.startswith(('}', ')', ']')):
+                if depth == 0 or (depth == 1 and previous_blank):
+                    boundaries.append(i)
+            depth = max(0, depth + line.count('{') - line.count('}'))
+            previous_blank = not stripped
+        return boundaries
+
+    def _indent_boundaries(self, lines: List[str]) -> List[int]:
+        """Boundaries at unindented lines, or any line that follows a blank line"""
+        boundaries = []
+        previous_blank = True
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if stripped and (previous_blank or not line[0].isspace()):
+                boundaries.append(i)
+            previous_blank = not stripped
+        return boundaries
+
+    def _prose_boundaries(self, lines: List[str]) -> List[int]:
+        """Boundaries at headings (Markdown and underlined reST) and paragraph starts"""
+        boundaries = []
+        previous_blank = True
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if self.HEADING_PATTERN.match(line):
+                # An underline belongs to the heading text on the line above it
+                boundaries.append(i - 1 if line[0] in '=-~' and i > 0 and lines[i - 1].strip() else i)
+            elif stripped and previous_blank:
+                boundaries.append(i)
+            previous_blank = not stripped
+        return boundaries
+
+    # ------------------------------------------------------------------
+    # Packing
+    # ------------------------------------------------------------------
+
+    def _pack(self, lines: List[str], boundaries: List[int]):
+        """Greedily pack boundary segments into (start, end) line ranges with overlap"""
+        segments = []
+        for i, start in enumerate(boundaries):
+            end = boundaries[i + 1] if i + 1 < len(boundaries) else len(lines)
+            segments.extend(self._split_segment(lines, start, end))
+
+        ranges = []
+        current_start, current_end, current_size = None, None, 0
+        for start, end, size in segments:
+            if current_start is not None and current_size + size > self.chunk_size:
+                ranges.append((current_start, current_end))
+                current_start = None
+
+            if current_start is None:
+                current_start = self._overlap_start(lines, ranges[-1] if ranges else None, start)
+                current_size = sum(len(line) for line in lines[current_start:start])
+            current_end = end
+            current_size += size
+
+        if current_start is not None:
+            ranges.append((current_start, current_end))
+        return ranges
+
+    def _split_segment(self, lines: List[str], start: int, end: int):
+        """Split a segment that exceeds chunk_size into line windows"""
+        # Leave room for the overlap that may be prepended to each piece
+        limit = max(1, self.chunk_size - self.chunk_overlap)
+        pieces = []
+        piece_start, piece_size = start, 0
+        for i in range(start, end):
+            line_size = len(lines[i])
+            if piece_size and piece_size + line_size > limit:
+                pieces.append((piece_start, i, piece_size))
+                piece_start, piece_size = i, 0
+            piece_size += line_size
+        if piece_size or piece_start < end:
+            pieces.append((piece_start, end, piece_size))
+        return pieces
+
+    def _overlap_start(self, lines: List[str], previous, start: int) -> int:
+        """Move a chunk start back over trailing lines of the previous chunk"""
+        if not previous or not self.chunk_overlap:
+            return start
+
+        overlap_start, size = start, 0
+        while overlap_start > previous[0] + 1:
+            size += len(lines[overlap_start - 1])
+            if size > self.chunk_overlap:
+                break
+            overlap_start -= 1
+        return overlap_start
@@ -0,0 +1,154 @@
+import os
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.lexical_index import tokenize
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for code and English)"""
+    return math.ceil(len(text) / 4)
+
+
+class ContextPacker:
+    """Packs ranked chunks into a prompt token budget.
+
+    Candidates are taken in rank order. A chunk is included whole if it
+    fits; otherwise it is trimmed to the lines around its best match for
+    the query. Line ranges already covered by a higher-ranked chunk of the
+    same file are cut out, and adjacent pieces of a file are merged so each
+    file appears once per contiguous range.
+    """
+
+    def __init__(self, count_tokens: Optional[Callable[[str], int]] = None, min_snippet_tokens: int = 64):
+        self.count_tokens = count_tokens or estimate_tokens
+        self.min_snippet_tokens = min_snippet_tokens
+
+    def pack(self, candidates: List[Dict], budget_tokens: int, query: str = '') -> List[Dict]:
+        """Select pieces of the candidates whose rendered size fits in ``budget_tokens``"""
+        query_terms = set(tokenize(query))
+        covered: Dict[str, List[Tuple[int, int]]] = {}
+        pieces: List[Dict] = []
+        remaining = budget_tokens
+
+        for doc in candidates:
+            if remaining < self.min_snippet_tokens:
+                break
+
+            for piece in self._uncovered_pieces(doc, covered.get(doc['source'], [])):
+                cost = self._cost(piece)
+                if cost > remaining:
+                    piece = self._trim(piece, query_terms, remaining)
+                    if piece is None:
+                        continue
+                    cost = self._cost(piece)
+
+                pieces.append(piece)
+                covered.setdefault(piece['source'], []).append((piece['start_line'], piece['end_line']))
+                remaining -= cost
+
+        return self._merge(pieces)
+
+    def render(self, pieces: List[Dict]) -> str:
+        """Format packed pieces as prompt context"""
+        return "\n".join(self._render_piece(i, piece) for i, piece in enumerate(pieces))
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _render_piece(self, i: int, piece: Dict) -> str:
+        source = piece['source'].replace('\\', '/')
+        _, file_ext = os.path.splitext(source)
+        line_range = f" (lines {piece['start_line']}-{piece['end_line']})"
+        return f"FILE {i+1}: {source}{line_range}\n\n```{file_ext[1:].lower()}\n{piece['content']}\n```\n"
+
+    def _cost(self, piece: Dict) -> int:
+        # The FILE number only changes a digit or two, so any index gives the same cost
+        return self.count_tokens(self._render_piece(0, piece) + "\n")
+
+    def _uncovered_pieces(self, doc: Dict, covered: List[Tuple[int, int]]) -> List[Dict]:
+        """Split a chunk into the line ranges not already selected for its file"""
+        # Chunks end in a newline; splitlines() keeps that from adding a phantom line past end_line
+        lines = doc['content'].splitlines()
+        start_line = doc.get('start_line', 1)
+        if doc.get('end_line') is not None:
+            lines = lines[:max(0, doc['end_line'] - start_line + 1)]
+        keep = [True] * len(lines)
+        for covered_start, covered_end in covered:
+            for line_no in range(max(covered_start, start_line), min(covered_end, start_line + len(lines) - 1) + 1):
+                keep[line_no - start_line] = False
+
+        pieces = []
+        i = 0
+        while i < len(lines):
+            if not keep[i]:
+                i += 1
+                continue
+            j = i
+            while j < len(lines) and keep[j]:
+                j += 1
+            segment = lines[i:j]
+            if any(line.strip() for line in segment):
+                pieces.append({
+                    'source': doc['source'],
+                    'content': '\n'.join(segment),
+                    'start_line': start_line + i,
+                    'end_line': start_line + j - 1,
+                    'trimmed': doc.get('trimmed', False),
+                })
+            i = j
+        return pieces
+
+    def _trim(self, piece: Dict, query_terms: set, budget: int) -> Optional[Dict]:
+        """Cut a piece down to the lines around its best query match that fit in the budget"""
+        available = budget - self._cost(dict(piece, content=''))
+        if available <= 0:
+            return None
+
+        lines = piece['content'].split('\n')
+        line_costs = [self.count_tokens(line + '\n') for line in lines]
+        scores = [len(query_terms.intersection(tokenize(line))) for line in lines]
+        best = max(range(len(lines)), key=lambda i: (scores[i], -i))
+
+        # Grow a window around the best line, preferring the side with more matches
+        lo = hi = best
+        used = line_costs[best]
+        if used > available:
+            return None
+        while True:
+            can_up = lo > 0 and used + line_costs[lo - 1] <= available
+            can_down = hi < len(lines) - 1 and used + line_costs[hi + 1] <= available
+            if not can_up and not can_down:
+                break
+            if can_up and (not can_down or scores[lo - 1] >= scores[hi + 1]):
+                lo -= 1
+                used += line_costs[lo]
+            else:
+                hi += 1
+                used += line_costs[hi]
+
+        trimmed = dict(piece, content='\n'.join(lines[lo:hi + 1]), trimmed=True,
+                       start_line=piece['start_line'] + lo, end_line=piece['start_line'] + hi)
+        # Line-by-line estimates can undercount the joined text slightly
+        while self._cost(trimmed) > budget and hi > lo:
+            hi -= 1
+            trimmed.update(content='\n'.join(lines[lo:hi + 1]), end_line=piece['start_line'] + hi)
+        return trimmed if self._cost(trimmed) <= budget else None
+
+    def _merge(self, pieces: List[Dict]) -> List[Dict]:
+        """Order pieces by file (in order of first appearance) and line, joining adjacent ones"""
+        order = {}
+        for piece in pieces:
+            order.setdefault(piece['source'], len(order))
+
+        merged: List[Dict] = []
+        for piece in sorted(pieces, key=lambda p: (order[p['source']], p['start_line'])):
+            last = merged[-1] if merged else None
+            if last and last['source'] == piece['source'] and piece['start_line'] == last['end_line'] + 1:
+                last['content'] += '\n' + piece['content']
+                last['end_line'] = piece['end_line']
+                last['trimmed'] = last['trimmed'] or piece['trimmed']
+            else:
+                merged.append(dict(piece))
+        return merged
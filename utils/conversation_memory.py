@@ -0,0 +1,168 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from models.token_counter import approximate_tokens
+
+# Words that point back at the previous answer ("where is it called?", "what about those files?")
+_REFERENCE_PATTERN = re.compile(r"\b(it|its|this|that|these|those|they|them|there|same|above|previous|earlier)\b"
+                                r"|^\s*(and|but|so|what about|how about)\b", re.IGNORECASE)
+_CODE_BLOCK_PATTERN = re.compile(r"```.*?(```|$)", re.DOTALL)
+_MARKDOWN_PATTERN = re.compile(r"[#*`>|]+")
+
+
+def _shorten(text: str, limit: int = 200) -> str:
+    return text if len(text) <= limit else text[:limit].rsplit(' ', 1)[0] + '...'
+
+
+class ConversationMemory:
+    """Server-side chat history per conversation, bounded in turns, tokens and conversations.
+
+    The last ``recent_turns`` turns are kept verbatim. Older turns are
+    compacted into a rolling summary, one line per turn (the question, the
+    first sentence of the answer and the files it used); past
+    ``summary_tokens`` the oldest lines drop out. Each turn also keeps the
+    (source, line) locations of the context it was answered from, so a
+    follow-up about the same files can reuse them. Conversations idle for
+    ``ttl_seconds`` expire, and the least recently used are evicted past
+    ``max_conversations``.
+    """
+
+    def __init__(self, recent_turns: int = 4, summary_tokens: int = 400, max_conversations: int = 1000,
+                 ttl_seconds: float = 86400, count_tokens: Optional[Callable[[str], int]] = None,
+                 follow_up_max_words: int = 16):
+        self.recent_turns = max(1, recent_turns)
+        self.summary_tokens = summary_tokens
+        self.max_conversations = max_conversations
+        self.ttl_seconds = ttl_seconds
+        self.count_tokens = count_tokens or approximate_tokens
+        self.follow_up_max_words = follow_up_max_words
+        self.evictions = 0
+        self.summarized_turns = 0
+        self.follow_ups = 0
+
+        self._conversations: 'OrderedDict[Hashable, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_turn(self, key: Hashable, query: str, answer: str, sources: List[str],
+                 locations: List[Tuple[str, int]]):
+        """Record an answered question, compacting the oldest verbatim turn into the summary"""
+        with self._lock:
+            conversation = self._live(key)
+            if conversation is None:
+                conversation = {'turns': [], 'summary': [], 'turn_count': 0, 'summarized': 0, 'updated': time.time()}
+                self._conversations[key] = conversation
+            conversation['turns'].append({'query': query, 'answer': answer, 'sources': list(sources),
+                                          'locations': [list(location) for location in locations]})
+            conversation['turn_count'] += 1
+            conversation['updated'] = time.time()
+
+            while len(conversation['turns']) > self.recent_turns:
+                conversation['summary'].append(self._summarize(conversation['turns'].pop(0)))
+                conversation['summarized'] += 1
+                self.summarized_turns += 1
+            while len(conversation['summary']) > 1 and \
+                    self.count_tokens('\n'.join(conversation['summary'])) > self.summary_tokens:
+                conversation['summary'].pop(0)
+
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+                self.evictions += 1
+
+    def history(self, key: Hashable, max_tokens: int,
+                count_tokens: Optional[Callable[[str], int]] = None) -> Dict:
+        """The summary and the most recent verbatim turns that fit in ``max_tokens`` together"""
+        count_tokens = count_tokens or self.count_tokens
+        with self._lock:
+            conversation = self._live(key)
+            if conversation is None:
+                return {'summary': '', 'turns': [], 'turn_count': 0, 'summarized': 0}
+            summary = '\n'.join(conversation['summary'])
+            turns = list(conversation['turns'])
+            turn_count, summarized = conversation['turn_count'], conversation['summarized']
+
+        used = count_tokens(summary)
+        if used > max_tokens:
+            summary, used = '', 0
+        included = []
+        for turn in reversed(turns):
+            cost = count_tokens(turn['query']) + count_tokens(turn['answer'])
+            if used + cost > max_tokens:
+                break
+            included.insert(0, turn)
+            used += cost
+        return {'summary': summary, 'turns': included, 'turn_count': turn_count, 'summarized': summarized}
+
+    def follow_up(self, key: Hashable, query: str) -> Optional[Dict]:
+        """The previous turn's question, files and locations if ``query`` clearly continues it
+
+        A question counts as a follow-up when it names files the previous
+        answer used (only those are reused), or when it is short and refers
+        back to the previous answer ("it", "those", "what about ...").
+        """
+        with self._lock:
+            conversation = self._live(key)
+            if conversation is None or not conversation['turns']:
+                return None
+            previous, turn = conversation['turns'][-1], conversation['turn_count']
+
+        lowered = query.lower()
+        named = [source for source in previous['sources']
+                 if source.lower() in lowered or os.path.basename(source).lower() in lowered]
+        if named:
+            sources = named
+        elif len(query.split()) <= self.follow_up_max_words and _REFERENCE_PATTERN.search(query):
+            sources = previous['sources']
+        else:
+            return None
+
+        with self._lock:
+            self.follow_ups += 1
+        return {
+            'turn': turn,
+            'query': previous['query'],
+            'sources': sources,
+            'locations': [tuple(location) for location in previous['locations'] if location[0] in sources]
+        }
+
+    def clear(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._conversations.pop(key, None) is not None
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'conversations': len(self._conversations),
+                'summarized_turns': self.summarized_turns,
+                'follow_ups': self.follow_ups,
+                'evictions': self.evictions,
+            }
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _live(self, key: Hashable) -> Optional[Dict]:
+        """Conversation for a key if present and not expired, refreshing its LRU position"""
+        conversation = self._conversations.get(key)
+        if conversation is None:
+            return None
+        if time.time() - conversation['updated'] > self.ttl_seconds:
+            del self._conversations[key]
+            return None
+        self._conversations.move_to_end(key)
+        return conversation
+
+    @staticmethod
+    def _summarize(turn: Dict) -> str:
+        """One summary line for a turn: question, the answer's first sentence and its files"""
+        answer = _MARKDOWN_PATTERN.sub('', _CODE_BLOCK_PATTERN.sub(' ', turn['answer']))
+        answer = re.sub(r'\s+', ' ', answer).strip()
+        match = re.match(r'(.{20,}?[.!?])(\s|$)', answer)
+        line = f"- Q: {_shorten(turn['query'].strip())} A: {_shorten(match.group(1) if match else answer)}"
+        if turn['sources']:
+            line += f" (files: {', '.join(turn['sources'][:5])})"
+        return line
@@ -0,0 +1,184 @@
+import os
+import json
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, Iterator
+
+import numpy as np
+
+
+class DocumentTable(MutableMapping):
+    """Vector ID → document mapping backed by memory-mapped columns.
+
+    On disk a table is a directory of flat columns: sorted int64 IDs, int64
+    line/chunk columns, and text columns stored as one UTF-8 blob plus an
+    offsets array. Opening a table maps the files without reading them, and
+    documents are decoded only when accessed. Documents added or removed
+    after opening are kept in memory until the table is written again.
+    """
+
+    TEXT_FIELDS = ('content', 'source')
+    INT_FIELDS = ('start_line', 'end_line', 'chunk_index', 'file_size', 'file_mtime')
+    # Any other document keys are stored as a JSON object per document
+    EXTRA_FIELD = 'extra'
+    # Stored in integer columns for a missing value
+    MISSING = -1
+
+    def __init__(self):
+        self._ids = np.zeros(0, dtype='int64')
+        self._ints: Dict[str, np.ndarray] = {}
+        self._offsets: Dict[str, np.ndarray] = {}
+        self._blobs: Dict[str, np.ndarray] = {}
+        # Overlay on top of the mapped columns
+        self._added: Dict[int, Dict] = {}
+        self._deleted = set()
+
+    @classmethod
+    def open(cls, path: str) -> 'DocumentTable':
+        """Memory-map a table written by write()"""
+        table = cls()
+        table._ids = np.load(os.path.join(path, 'ids.npy'), mmap_mode='r', allow_pickle=False)
+        for field in cls.INT_FIELDS:
+            table._ints[field] = np.load(os.path.join(path, f'{field}.npy'), mmap_mode='r', allow_pickle=False)
+        for field in cls.TEXT_FIELDS + (cls.EXTRA_FIELD,):
+            table._offsets[field] = np.load(os.path.join(path, f'{field}.offsets.npy'), mmap_mode='r',
+                                            allow_pickle=False)
+            table._blobs[field] = cls._map_blob(os.path.join(path, f'{field}.bin'))
+        return table
+
+    def write(self, path: str):
+        """Write every document as columns into the directory ``path``"""
+        os.makedirs(path, exist_ok=True)
+        ids = np.array(sorted(self), dtype='int64')
+        np.save(os.path.join(path, 'ids.npy'), ids)
+
+        for field in self.INT_FIELDS:
+            column = np.full(len(ids), self.MISSING, dtype='int64')
+            for pos, doc_id in enumerate(ids.tolist()):
+                column[pos] = self._int_value(doc_id, field)
+            np.save(os.path.join(path, f'{field}.npy'), column)
+
+        for field in self.TEXT_FIELDS + (self.EXTRA_FIELD,):
+            offsets = np.zeros(len(ids) + 1, dtype='int64')
+            with open(os.path.join(path, f'{field}.bin'), 'wb') as f:
+                for pos, doc_id in enumerate(ids.tolist()):
+                    data = self._encode(doc_id, field)
+                    f.write(data)
+                    offsets[pos + 1] = offsets[pos] + len(data)
+            np.save(os.path.join(path, f'{field}.offsets.npy'), offsets)
+
+    def contains_many(self, ids: Iterable[int]) -> np.ndarray:
+        """Boolean mask of which of the given IDs are present"""
+        ids = np.asarray(list(ids) if not isinstance(ids, np.ndarray) else ids, dtype='int64')
+        present = np.isin(ids, self._ids)
+        if self._deleted:
+            present &= ~np.isin(ids, np.fromiter(self._deleted, dtype='int64'))
+        if self._added:
+            present |= np.isin(ids, np.fromiter(self._added, dtype='int64'))
+        return present
+
+    def memory_usage(self) -> int:
+        """Approximate heap bytes held by documents not backed by mapped files"""
+        overlay = sum(len(doc.get('content', '')) + len(doc.get('source', '')) + 200
+                      for doc in self._added.values())
+        return overlay + 40 * len(self._deleted)
+
+    # ------------------------------------------------------------------
+    # Mapping interface
+    # ------------------------------------------------------------------
+
+    def __getitem__(self, doc_id: int) -> Dict:
+        doc_id = int(doc_id)
+        if doc_id in self._added:
+            return self._added[doc_id]
+        pos = self._position(doc_id)
+        if pos is None:
+            raise KeyError(doc_id)
+        return self._decode(pos)
+
+    def __setitem__(self, doc_id: int, doc: Dict):
+        doc_id = int(doc_id)
+        if self._position(doc_id) is not None:
+            # The overlay copy replaces the mapped one
+            self._deleted.add(doc_id)
+        self._added[doc_id] = doc
+
+    def __delitem__(self, doc_id: int):
+        doc_id = int(doc_id)
+        if doc_id in self._added:
+            del self._added[doc_id]
+        elif self._position(doc_id) is not None:
+            self._deleted.add(doc_id)
+        else:
+            raise KeyError(doc_id)
+
+    def __contains__(self, doc_id) -> bool:
+        doc_id = int(doc_id)
+        return doc_id in self._added or self._position(doc_id) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        for doc_id in self._ids.tolist():
+            if doc_id not in self._deleted:
+                yield doc_id
+        yield from list(self._added)
+
+    def __len__(self) -> int:
+        return len(self._ids) - len(self._deleted) + len(self._added)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _position(self, doc_id: int):
+        """Row of a live mapped document, or None"""
+        if doc_id in self._deleted or not len(self._ids):
+            return None
+        pos = int(np.searchsorted(self._ids, doc_id))
+        if pos < len(self._ids) and self._ids[pos] == doc_id:
+            return pos
+        return None
+
+    def _text(self, field: str, pos: int) -> str:
+        offsets = self._offsets[field]
+        return self._blobs[field][offsets[pos]:offsets[pos + 1]].tobytes().decode('utf-8', errors='surrogatepass')
+
+    def _decode(self, pos: int) -> Dict:
+        """Rebuild a document dict from its row"""
+        doc = {field: self._text(field, pos) for field in self.TEXT_FIELDS}
+        for field in self.INT_FIELDS:
+            value = int(self._ints[field][pos])
+            if value != self.MISSING:
+                doc[field] = value
+        extra = self._text(self.EXTRA_FIELD, pos)
+        if extra:
+            doc.update(json.loads(extra))
+        return doc
+
+    def _int_value(self, doc_id: int, field: str) -> int:
+        """Value of one integer column for a document"""
+        pos = None if doc_id in self._added else self._position(doc_id)
+        if pos is not None:
+            return int(self._ints[field][pos])
+        value = self._added[doc_id].get(field)
+        return self.MISSING if value is None else int(value)
+
+    def _encode(self, doc_id: int, field: str) -> bytes:
+        """Bytes of one text column for a document"""
+        pos = None if doc_id in self._added else self._position(doc_id)
+        if pos is not None:
+            # Copy mapped bytes straight through without decoding
+            offsets = self._offsets[field]
+            return self._blobs[field][offsets[pos]:offsets[pos + 1]].tobytes()
+
+        doc = self._added[doc_id]
+        if field == self.EXTRA_FIELD:
+            extra = {key: value for key, value in doc.items()
+                     if key not in self.TEXT_FIELDS and key not in self.INT_FIELDS}
+            return json.dumps(extra).encode('utf-8') if extra else b''
+        return str(doc.get(field, '')).encode('utf-8', errors='surrogatepass')
+
+    @staticmethod
+    def _map_blob(path: str) -> np.ndarray:
+        """Memory-map a byte blob (numpy can't map empty files)"""
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(path, dtype=np.uint8, mode='r')
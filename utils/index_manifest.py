@@ -0,0 +1,176 @@
+import os
+import json
+import logging
+import hashlib
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class IndexManifest:
+    """Persisted per-repository record of indexed files.
+
+    Each entry maps a repository-relative path to the file's size, mtime,
+    content hash and the vector IDs it was indexed under, so a re-process
+    only has to read, embed and index files that were added, changed or
+    deleted since the last run.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.files: Dict[str, Dict] = {}
+        self.settings: Dict = {}
+        self.begin_scan()
+
+    @classmethod
+    def load(cls, path: str) -> 'IndexManifest':
+        """Load a manifest from disk, or return an empty one if missing or unreadable"""
+        manifest = cls(path)
+        if not os.path.exists(path):
+            return manifest
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == cls.VERSION:
+                manifest.files = data.get('files', {})
+                manifest.settings = data.get('settings', {})
+        except Exception as e:
+            logger.warning(f"Error loading index manifest {path}: {str(e)}")
+        return manifest
+
+    def save(self):
+        """Write the manifest to disk atomically"""
+        if not self.path:
+            return
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'settings': self.settings, 'files': self.files}, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def hash_content(content: str) -> str:
+        """Return a stable content hash for a file's text"""
+        return hashlib.sha256(content.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Scan bookkeeping
+    # ------------------------------------------------------------------
+
+    def begin_scan(self):
+        """Reset per-scan state before walking the repository"""
+        self._seen = set()
+        self._pending: Dict[str, Dict] = {}
+        # A set, since a file matched by stat may still be read (e.g. for symbols) and checked again
+        self._skipped = set()
+
+    @property
+    def skipped(self) -> int:
+        """Files found unchanged in the current scan"""
+        return len(self._skipped)
+
+    def is_unchanged(self, rel_path: str, size: int, mtime: int) -> bool:
+        """Check a file by stat alone; marks it seen and skipped on a match"""
+        entry = self.files.get(rel_path)
+        if entry and entry['size'] == size and entry['mtime'] == mtime:
+            self._seen.add(rel_path)
+            self._skipped.add(rel_path)
+            return True
+        return False
+
+    def check_content(self, rel_path: str, size: int, mtime: int, content_hash: str) -> bool:
+        """Check a file by content hash after reading it.
+
+        Returns True if the content is unchanged (the stored stat is refreshed),
+        otherwise stages the file as pending re-embedding and returns False.
+        """
+        self._seen.add(rel_path)
+        entry = self.files.get(rel_path)
+        if entry and entry['hash'] == content_hash:
+            entry['size'] = size
+            entry['mtime'] = mtime
+            self._skipped.add(rel_path)
+            return True
+
+        self._skipped.discard(rel_path)
+        self._pending[rel_path] = {'size': size, 'mtime': mtime, 'hash': content_hash}
+        return False
+
+    def changed_paths(self) -> List[str]:
+        """Paths added or modified since the last scan"""
+        return list(self._pending)
+
+    def removed_paths(self) -> List[str]:
+        """Previously indexed paths that were not seen in the current scan"""
+        return [path for path in self.files if path not in self._seen]
+
+    def stale_vector_ids(self) -> List[int]:
+        """Vector IDs belonging to changed or removed files"""
+        stale = []
+        for path in self.changed_paths() + self.removed_paths():
+            entry = self.files.get(path)
+            if entry:
+                stale.extend(entry.get('vector_ids', []))
+        return stale
+
+    def commit(self, rel_path: str, vector_ids: List[int]) -> List[int]:
+        """Record the vector IDs a pending file was indexed under.
+
+        Returns the vector IDs previously recorded for the file, which the
+        caller should remove from the store.
+        """
+        entry = self._pending.pop(rel_path, None)
+        if entry is None:
+            return []
+        previous = self.files.get(rel_path, {}).get('vector_ids', [])
+        entry['vector_ids'] = [int(i) for i in vector_ids]
+        self.files[rel_path] = entry
+        return previous
+
+    def finish_scan(self) -> Dict[str, int]:
+        """Drop removed and uncommitted entries and return the scan summary"""
+        removed = self.removed_paths()
+        for path in removed:
+            del self.files[path]
+
+        # Files that were staged but never committed (e.g. embedding failed)
+        # are forgotten so the next scan picks them up again.
+        failed = list(self._pending)
+        for path in failed:
+            self.files.pop(path, None)
+
+        summary = {
+            'skipped': self.skipped,
+            'reembedded': len(self._seen) - self.skipped - len(failed),
+            'removed': len(removed),
+        }
+        self.begin_scan()
+        return summary
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def vector_ids(self) -> List[int]:
+        """All vector IDs recorded in the manifest"""
+        return [i for entry in self.files.values() for i in entry.get('vector_ids', [])]
+
+    def clear(self):
+        """Forget every entry, forcing a full re-index"""
+        self.files = {}
+        self.begin_scan()
+
+    def ensure_settings(self, settings: Dict) -> bool:
+        """Clear the manifest if it was built with different indexing settings.
+
+        Returns True if the existing entries are still valid.
+        """
+        if self.settings == settings:
+            return True
+        self.clear()
+        self.settings = dict(settings)
+        return False
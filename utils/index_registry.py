@@ -0,0 +1,179 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+from utils.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+class IndexRegistry:
+    """Per-repository vector stores kept resident under an LRU memory budget.
+
+    Each repository key gets its own VectorStore, persisted under
+    ``base_dir/<key>/vectors``. Stores are loaded (memory-mapped) on first
+    use. When the resident stores' heap usage exceeds ``memory_budget_mb``,
+    the least recently used ones that are not checked out are saved if they
+    were modified and dropped; they are reloaded from disk on demand.
+    """
+
+    def __init__(self, base_dir: str, store_factory: Callable[[], VectorStore], memory_budget_mb: int = 1024):
+        self.base_dir = base_dir
+        self.store_factory = store_factory
+        self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self.loads = 0
+        self.evictions = 0
+
+        self._stores: 'OrderedDict[str, VectorStore]' = OrderedDict()
+        self._in_use: Dict[str, int] = {}
+        self._dirty = set()
+        self._lock = threading.RLock()
+
+    def store_path(self, key: str) -> str:
+        """Directory a repository's vector store is saved to"""
+        return os.path.join(self.base_dir, key, 'vectors')
+
+    def exists(self, key: str) -> bool:
+        """Check whether a store is resident or saved for a key"""
+        with self._lock:
+            return key in self._stores or os.path.exists(os.path.join(self.store_path(key), 'meta.json'))
+
+    @contextmanager
+    def checkout(self, key: str, write: bool = False):
+        """Use a repository's store, loading it if needed; it can't be evicted while checked out.
+
+        Checking out for ``write`` marks the store for saving. It doesn't lock
+        out readers: the store's own lock serializes each change against
+        concurrent searches.
+        """
+        with self._lock:
+            store = self._get(key)
+            self._pin(key)
+        try:
+            yield store
+        finally:
+            with self._lock:
+                self._unpin(key)
+                if write:
+                    self._dirty.add(key)
+            self._enforce_budget()
+
+    def save(self, key: str):
+        """Persist a resident store and reopen it memory-mapped"""
+        with self._lock:
+            store = self._stores.get(key)
+            if store is None:
+                return
+            self._pin(key)
+        try:
+            self._save(key, store)
+        finally:
+            with self._lock:
+                self._unpin(key)
+
+    def evict(self, key: str) -> bool:
+        """Save (if modified) and drop a resident store that isn't checked out"""
+        with self._lock:
+            store = self._stores.get(key)
+            if store is None or key in self._in_use:
+                return False
+            dirty = key in self._dirty
+            if dirty:
+                self._pin(key)
+        if dirty:
+            try:
+                self._save(key, store)
+            finally:
+                with self._lock:
+                    self._unpin(key)
+
+        with self._lock:
+            # Checked out or changed again while it was being saved
+            if self._stores.get(key) is not store or key in self._in_use or key in self._dirty:
+                return False
+            del self._stores[key]
+            self.evictions += 1
+            return True
+
+    def get_stats(self) -> Dict:
+        """Resident stores, their memory usage and load/eviction counters"""
+        with self._lock:
+            stores = list(self._stores.items())
+            in_use, dirty = set(self._in_use), set(self._dirty)
+            loads, evictions = self.loads, self.evictions
+        resident = [{'key': key, 'memory_bytes': store.memory_usage(), 'documents': len(store.documents),
+                     'in_use': key in in_use, 'dirty': key in dirty}
+                    for key, store in stores]
+        return {
+            'resident': resident,
+            'memory_bytes': sum(entry['memory_bytes'] for entry in resident),
+            'memory_budget_bytes': self.memory_budget_bytes,
+            'loads': loads,
+            'evictions': evictions,
+        }
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _get(self, key: str) -> VectorStore:
+        """Return the resident store for a key, loading or creating it"""
+        store = self._stores.get(key)
+        if store is None:
+            store = self.store_factory()
+            path = self.store_path(key)
+            if os.path.exists(os.path.join(path, 'meta.json')):
+                try:
+                    loaded = self.store_factory()
+                    loaded.load(path)
+                    if loaded.dimension == store.dimension:
+                        store = loaded
+                    else:
+                        logger.warning(f"Index {key} has dimension {loaded.dimension}, expected {store.dimension}; starting empty")
+                except Exception as e:
+                    logger.error(f"Error loading index {key}: {str(e)}")
+            self._stores[key] = store
+            self.loads += 1
+        self._stores.move_to_end(key)
+        return store
+
+    def _pin(self, key: str):
+        """Keep a store resident; call with the registry lock held"""
+        self._in_use[key] = self._in_use.get(key, 0) + 1
+
+    def _unpin(self, key: str):
+        self._in_use[key] -= 1
+        if not self._in_use[key]:
+            del self._in_use[key]
+
+    def _save(self, key: str, store: VectorStore):
+        """Save a pinned store and reopen it, holding only the store's lock so other repositories stay usable"""
+        path = self.store_path(key)
+        with self._lock:
+            # A write checkout that ends during the save marks it dirty again
+            self._dirty.discard(key)
+        try:
+            with store.lock.write():
+                store.save(path)
+                # Reopening maps the saved files, handing the store's memory back to the page cache
+                store.load(path)
+        except Exception:
+            with self._lock:
+                self._dirty.add(key)
+            raise
+
+    def _enforce_budget(self):
+        """Evict least recently used stores until resident memory is within budget"""
+        with self._lock:
+            stores = list(self._stores.items())
+        # Measured outside the registry lock: a store being saved holds its own lock for a while
+        usage = {key: store.memory_usage() for key, store in stores}
+        total = sum(usage.values())
+        for key in usage:
+            if total <= self.memory_budget_bytes:
+                break
+            if self.evict(key):
+                total -= usage[key]
@@ -0,0 +1,448 @@
+import os
+import time
+import queue
+import itertools
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from utils.near_duplicates import DuplicateIndex, MIN_SHINGLES_FOR_NEAR_MATCH, shingle_count, simhash
+
+logger = logging.getLogger(__name__)
+
+# Sentinel passed between stages to signal that a producer has finished
+_DONE = object()
+
+
+class IngestionCancelled(Exception):
+    """Raised by IngestionPipeline.run when the run was cancelled"""
+
+
+def sync_manifest(manifest, vector_store, settings: Dict) -> bool:
+    """Make a manifest and its vector store describe the same vectors before a run.
+
+    If the indexing settings changed, or the store holds vectors the manifest
+    doesn't list (or lacks ones it does, e.g. after a run failed between
+    changing the store and saving the manifest), both are emptied so the
+    run re-indexes everything once. Returns True if the run can be incremental.
+    """
+    if manifest.ensure_settings(settings) and vector_store.holds_exactly(manifest.vector_ids()):
+        return True
+    manifest.clear()
+    vector_store.clear()
+    return False
+
+
+class IngestionPipeline:
+    """Streaming walk → read → chunk → embed → index pipeline.
+
+    Each stage runs in its own thread(s) and hands work to the next through a
+    bounded queue, so reading, embedding and FAISS insertion overlap and peak
+    memory is capped by the queue sizes rather than by the repository size.
+    Indexing happens on the calling thread, which is the only one that
+    touches the vector store. With a SymbolIndex, readers also record each
+    file's symbol definitions and references.
+
+    With ``deduplicate``, chunks whose SimHash is within a few bits of an
+    already indexed or queued chunk are not embedded; they are stored as
+    aliases of that representative instead.
+    """
+
+    def __init__(self, repo_handler, embedding_model, vector_store, chunker,
+                 read_workers: int = 4, batch_size: Optional[int] = None, queue_size: int = 64,
+                 symbol_index=None, deduplicate: bool = True):
+        self.repo_handler = repo_handler
+        self.embedding_model = embedding_model
+        self.vector_store = vector_store
+        self.chunker = chunker
+        self.symbol_index = symbol_index
+        self.deduplicate = deduplicate
+        self.read_workers = max(1, read_workers)
+        # None defers to the embedding model's adaptively tuned batch size
+        self.batch_size = batch_size
+        self.queue_size = max(1, queue_size)
+        self.stats: Dict = {}
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._stop = threading.Event()
+        self._start_time = time.time()
+
+    def run(self, repo_dir: str, manifest=None) -> Dict:
+        """Ingest a prepared repository directory and return ingestion stats.
+
+        When an IndexManifest is given, unchanged files are skipped, vectors of
+        changed and removed files are replaced, and the manifest is saved.
+        If cancel() is called or a stage fails, files indexed so far are kept
+        and recorded in the manifest, so it still matches the vector store,
+        and IngestionCancelled (or the error) is raised.
+        """
+        with self._lock:
+            self.stats = {
+                'files_scanned': 0,
+                'files_skipped': 0,
+                'files_read': 0,
+                'files_done': 0,
+                'files_indexed': 0,
+                'chunks_embedded': 0,
+                'vectors_removed': 0,
+                'batches': 0,
+                'duplicate_chunks': 0,
+                'duplicate_files': 0,
+                'duplicate_bytes': 0,
+                'scan_complete': False,
+            }
+        self._start_time = time.time()
+
+        self._repo_dir = repo_dir
+        self._manifest = manifest
+        self._stop = threading.Event()
+        if self._cancelled.is_set():
+            self._stop.set()
+        self._errors: List[Exception] = []
+        self._seen_paths = set()
+
+        self._path_queue = queue.Queue(maxsize=self.queue_size)
+        self._chunk_queue = queue.Queue(maxsize=self.queue_size)
+        # Embedded batches are the largest items in flight, so keep only a few
+        self._batch_queue = queue.Queue(maxsize=4)
+
+        if manifest is not None:
+            manifest.begin_scan()
+        if self.deduplicate:
+            # The embedder matches against the store as it was before this run; only _index touches the live store
+            self._stored_duplicates = self.vector_store.duplicates.copy()
+            self._stored_file_ids = self.vector_store.files.ids_by_file()
+
+        threads = [threading.Thread(target=self._guard, args=(self._walk,), daemon=True)]
+        threads += [threading.Thread(target=self._guard, args=(self._read,), daemon=True)
+                    for _ in range(self.read_workers)]
+        threads.append(threading.Thread(target=self._guard, args=(self._embed,), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            self._index()
+        except Exception as e:
+            self._errors.append(e)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        if self._cancelled.is_set() or self._errors:
+            if manifest is not None:
+                # Keep what was committed; unseen files keep their old entries
+                manifest.begin_scan()
+                manifest.save()
+            if self._errors:
+                raise self._errors[0]
+            raise IngestionCancelled("Ingestion was cancelled")
+
+        if manifest is not None:
+            # Vectors of removed files and of files that failed to re-index
+            self.stats['vectors_removed'] += self.vector_store.remove_documents(manifest.stale_vector_ids())
+            self.stats.update(manifest.finish_scan())
+            manifest.save()
+        if self.symbol_index is not None:
+            # Symbols of files that are gone from the repository
+            self.symbol_index.retain(self._seen_paths)
+
+        # Embedding vectors not stored thanks to deduplication (float32)
+        self.stats['vector_bytes_saved'] = self.stats['duplicate_chunks'] * self.vector_store.dimension * 4
+        self.stats['elapsed'] = time.time() - self._start_time
+        return self.stats
+
+    def cancel(self):
+        """Stop the run as soon as in-flight work drains"""
+        self._cancelled.set()
+        self._stop.set()
+
+    def progress(self) -> Dict:
+        """Snapshot of the running stats with an estimate of the time remaining"""
+        with self._lock:
+            progress = dict(self.stats)
+        elapsed = time.time() - self._start_time
+        pending = progress.get('files_scanned', 0) - progress.get('files_skipped', 0) - progress.get('files_done', 0)
+        rate = progress.get('files_done', 0) / elapsed if elapsed > 0 else 0.0
+        progress['elapsed'] = round(elapsed, 2)
+        # Until the walk finishes the total is a lower bound, so the ETA is too
+        if pending <= 0:
+            progress['eta_seconds'] = 0.0
+        elif rate:
+            progress['eta_seconds'] = round(pending / rate, 1)
+        else:
+            progress['eta_seconds'] = None
+        return progress
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+
+    def _walk(self):
+        """Walk the repository and queue files that need reading"""
+        for file_path in self.repo_handler.iter_repository_files(self._repo_dir):
+            if self._stop.is_set():
+                break
+
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            rel_path = os.path.relpath(file_path, self._repo_dir)
+            self._seen_paths.add(rel_path)
+            self._count('files_scanned')
+
+            if self._manifest is not None:
+                with self._lock:
+                    unchanged = self._manifest.is_unchanged(rel_path, stat.st_size, stat.st_mtime_ns)
+                # Files indexed before symbols were tracked are read once more for them
+                if unchanged and (self.symbol_index is None or self.symbol_index.has_file(rel_path)):
+                    self._count('files_skipped')
+                    continue
+
+            self._put(self._path_queue, (file_path, rel_path, stat))
+
+        if not self._stop.is_set():
+            with self._lock:
+                self.stats['scan_complete'] = True
+        for _ in range(self.read_workers):
+            self._put(self._path_queue, _DONE)
+
+    def _read(self):
+        """Read, hash-check and chunk files"""
+        while True:
+            item = self._get(self._path_queue)
+            if item is _DONE:
+                self._put(self._chunk_queue, _DONE)
+                return
+
+            file_path, rel_path, stat = item
+            content = self.repo_handler._process_file(file_path)
+            if self.symbol_index is not None:
+                self.symbol_index.update_file(rel_path, content or '')
+            if not content:
+                self._count('files_done')
+                continue
+            self._count('files_read')
+
+            if self._manifest is not None:
+                content_hash = self._manifest.hash_content(content)
+                with self._lock:
+                    unchanged = self._manifest.check_content(rel_path, stat.st_size, stat.st_mtime_ns, content_hash)
+                if unchanged:
+                    self._count('files_skipped')
+                    continue
+
+            try:
+                chunks = self.chunker.chunk(content, rel_path)
+            except Exception as e:
+                logger.warning(f"Error chunking {file_path}: {str(e)}")
+                self._count('files_done')
+                continue
+            # File metadata for filtered search
+            for chunk in chunks:
+                chunk['file_size'] = stat.st_size
+                chunk['file_mtime'] = int(stat.st_mtime)
+            self._put(self._chunk_queue, (rel_path, chunks))
+
+    def _embed(self):
+        """Set near-duplicate chunks aside, group the rest into batches and embed them"""
+        pending_docs = []
+        pending_aliases = []
+        # Representatives queued in this run but not indexed yet, keyed by a token
+        queued = DuplicateIndex()
+        queued_sources = {}
+        tokens = itertools.count()
+        emitted_tokens = set()
+        remaining = {}
+        completed = []
+        readers_done = 0
+
+        while readers_done < self.read_workers:
+            item = self._get(self._chunk_queue)
+            if item is _DONE:
+                readers_done += 1
+                continue
+
+            rel_path, chunks = item
+            if chunks:
+                remaining[rel_path] = len(chunks)
+                aliased = 0
+                for chunk in chunks:
+                    signature = simhash(chunk['content']) if self.deduplicate else None
+                    target = self._find_duplicate(signature, chunk, queued, queued_sources) if self.deduplicate else None
+                    if target is not None:
+                        pending_aliases.append((chunk, target))
+                        aliased += 1
+                        continue
+                    token = next(tokens)
+                    if self.deduplicate:
+                        queued.add(token, signature)
+                        queued_sources[token] = rel_path
+                    pending_docs.append((chunk, signature, token))
+                if aliased == len(chunks):
+                    self._count('duplicate_files')
+            else:
+                completed.append(rel_path)
+
+            batch_size = self._batch_size()
+            while len(pending_docs) >= batch_size:
+                batch, pending_docs = pending_docs[:batch_size], pending_docs[batch_size:]
+                completed = self._emit_batch(batch, remaining, completed, pending_aliases, emitted_tokens)
+                batch_size = self._batch_size()
+
+        while pending_docs or pending_aliases or completed:
+            batch_size = self._batch_size()
+            batch, pending_docs = pending_docs[:batch_size], pending_docs[batch_size:]
+            completed = self._emit_batch(batch, remaining, completed, pending_aliases, emitted_tokens)
+
+        self._put(self._batch_queue, _DONE)
+
+    def _find_duplicate(self, signature: int, chunk: Dict, queued: DuplicateIndex, queued_sources: Dict[int, str]):
+        """('stored', vector ID) or ('queued', token) of a chunk's representative, or None.
+
+        Exact duplicates match anywhere; near duplicates only in other files,
+        so an edited chunk is re-embedded rather than aliased to its old text.
+        """
+        near = shingle_count(chunk['content']) >= MIN_SHINGLES_FOR_NEAR_MATCH
+        same_file_ids = self._stored_file_ids.get(chunk['source'], ())
+        for exact_only in (True, False) if near else (True,):
+            stored = self._stored_duplicates.find(signature, exact_only=exact_only)
+            if stored is not None and (exact_only or stored not in same_file_ids):
+                return 'stored', stored
+            token = queued.find(signature, exact_only=exact_only)
+            if token is not None and (exact_only or queued_sources[token] != chunk['source']):
+                return 'queued', token
+        return None
+
+    def _emit_batch(self, batch: List[tuple], remaining: Dict[str, int], completed: List[str],
+                    pending_aliases: List[tuple], emitted_tokens: set) -> List[str]:
+        """Embed a batch and queue it for indexing with the aliases and files it completes"""
+        emitted_tokens.update(token for _, _, token in batch)
+        # Aliases can go once their representative is indexed in this or an earlier batch
+        aliases = []
+        waiting = []
+        for alias in pending_aliases:
+            kind, ref = alias[1]
+            (aliases if kind == 'stored' or ref in emitted_tokens else waiting).append(alias)
+        pending_aliases[:] = waiting
+
+        for doc in [chunk for chunk, _, _ in batch] + [chunk for chunk, _ in aliases]:
+            remaining[doc['source']] -= 1
+            if remaining[doc['source']] == 0:
+                del remaining[doc['source']]
+                completed.append(doc['source'])
+
+        embeddings = None
+        if batch:
+            try:
+                embeddings = self.embedding_model.embed_documents([doc['content'] for doc, _, _ in batch])
+            except Exception as e:
+                logger.error(f"Error embedding batch: {str(e)}")
+
+        self._put(self._batch_queue, (batch, embeddings, aliases, completed))
+        return []
+
+    def _index(self):
+        """Add embedded batches to the vector store and commit finished files"""
+        file_vector_ids = {}
+        failed = set()
+        # Queue tokens of this run's representatives → their vector IDs
+        token_ids = {}
+
+        try:
+            self._index_batches(file_vector_ids, failed, token_ids)
+        finally:
+            # Only non-empty when stopped early: drop vectors of files that never completed
+            for vector_ids in file_vector_ids.values():
+                self.vector_store.remove_documents(vector_ids)
+
+    def _index_batches(self, file_vector_ids: Dict[str, List[int]], failed: set, token_ids: Dict[int, int]):
+        """Index batches until the embedder is done; vectors of unfinished files stay in ``file_vector_ids``"""
+        while True:
+            item = self._get(self._batch_queue)
+            if item is _DONE:
+                return
+
+            batch, embeddings, aliases, completed = item
+            if batch:
+                docs = [doc for doc, _, _ in batch]
+                if embeddings is None:
+                    failed.update(doc['source'] for doc in docs)
+                else:
+                    signatures = [signature for _, signature, _ in batch] if self.deduplicate else None
+                    vector_ids = self.vector_store.add_documents(docs, embeddings, signatures=signatures)
+                    for (doc, _, token), vector_id in zip(batch, vector_ids):
+                        file_vector_ids.setdefault(doc['source'], []).append(vector_id)
+                        token_ids[token] = vector_id
+                    self._count('chunks_embedded', len(batch))
+                    self._count('batches')
+
+            for doc, (kind, ref) in aliases:
+                representative_id = ref if kind == 'stored' else token_ids.get(ref)
+                try:
+                    if representative_id is None:
+                        raise ValueError("Representative was not indexed")
+                    alias_ids = self.vector_store.add_aliases(representative_id, [doc])
+                except ValueError:
+                    # The representative failed or was removed meanwhile; retry the file next run
+                    failed.add(doc['source'])
+                    continue
+                file_vector_ids.setdefault(doc['source'], []).extend(alias_ids)
+                self._count('duplicate_chunks')
+                self._count('duplicate_bytes', len(doc['content'].encode('utf-8')))
+
+            for rel_path in completed:
+                vector_ids = file_vector_ids.pop(rel_path, [])
+                self._count('files_done')
+                if rel_path in failed:
+                    # Partially indexed files are dropped and retried on the next run
+                    self.vector_store.remove_documents(vector_ids)
+                    continue
+
+                self._count('files_indexed')
+                if self._manifest is not None:
+                    with self._lock:
+                        previous = self._manifest.commit(rel_path, vector_ids)
+                    self._count('vectors_removed', self.vector_store.remove_documents(previous))
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _batch_size(self) -> int:
+        """Number of chunks to hand to the embedding model at once"""
+        if self.batch_size:
+            return max(1, self.batch_size)
+        return max(1, getattr(self.embedding_model, 'preferred_batch_size', 20))
+
+    def _guard(self, stage):
+        """Run a stage thread, recording any error and stopping the pipeline"""
+        try:
+            stage()
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+
+    def _put(self, q: queue.Queue, item):
+        """Put an item on a bounded queue, giving up if the pipeline is stopping"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue):
+        """Get an item from a queue, returning _DONE if the pipeline is stopping"""
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _count(self, key: str, amount: int = 1):
+        """Increment a stats counter"""
+        with self._lock:
+            self.stats[key] += amount
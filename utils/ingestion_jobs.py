@@ -0,0 +1,155 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from utils.ingestion import IngestionCancelled
+
+
+class IngestionJob:
+    """State and progress of one background repository ingestion"""
+
+    def __init__(self, key: str, repo_path: str, params: Optional[Dict] = None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.repo_path = repo_path
+        self.params = params or {}
+        self.status = 'queued'
+        self.phase = 'queued'
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.future = None
+        self._pipeline = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in IngestionJobManager.FINISHED_STATUSES
+
+    def attach(self, pipeline):
+        """Track a pipeline's progress and forward cancellation to it"""
+        self._pipeline = pipeline
+        if self.cancelled:
+            pipeline.cancel()
+
+    def cancel(self):
+        self._cancel.set()
+        if self._pipeline is not None:
+            self._pipeline.cancel()
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable view of the job"""
+        return {
+            'job_id': self.id,
+            'repo_path': self.repo_path,
+            'status': self.status,
+            'phase': self.phase,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'progress': self._pipeline.progress() if self._pipeline is not None else {},
+            'error': self.error,
+        }
+
+
+class IngestionJobManager:
+    """Runs repository ingestions in a bounded background worker pool.
+
+    Jobs are submitted with a ``work(job)`` callable that returns the job
+    result. At most ``max_workers`` jobs run at once; the rest queue. Only
+    one job per repository key is active at a time, and the most recent
+    ``max_finished`` finished jobs are kept for inspection.
+    """
+
+    FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+    def __init__(self, max_workers: int = 2, max_finished: int = 100):
+        self.max_workers = max(1, max_workers)
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ingestion')
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, repo_path: str, work: Callable[[IngestionJob], Dict],
+               params: Optional[Dict] = None) -> IngestionJob:
+        """Queue an ingestion, or return the active job already ingesting this repository"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and not job.finished:
+                    return job
+
+            job = IngestionJob(key, repo_path, params)
+            self._jobs[job.id] = job
+            job.future = self._executor.submit(self._run, job, work)
+            self._prune()
+            return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict]:
+        """All tracked jobs, newest first"""
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+        return [job.to_dict() for job in jobs]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it already finished"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+
+        job.cancel()
+        if job.future is not None and job.future.cancel():
+            # Never started
+            self._finish(job, 'cancelled')
+        return True
+
+    def shutdown(self):
+        """Cancel every job and stop the worker pool"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if not job.finished:
+                self.cancel(job.id)
+        self._executor.shutdown(wait=True)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _run(self, job: IngestionJob, work: Callable[[IngestionJob], Dict]):
+        if job.cancelled:
+            self._finish(job, 'cancelled')
+            return
+
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = work(job)
+            self._finish(job, 'cancelled' if job.cancelled else 'succeeded')
+        except IngestionCancelled:
+            self._finish(job, 'cancelled')
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, 'failed')
+
+    def _finish(self, job: IngestionJob, status: str):
+        job.status = status
+        job.phase = status
+        job.finished_at = time.time()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished"""
+        finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.created_at)
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job.id]
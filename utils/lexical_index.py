@@ -0,0 +1,261 @@
+import os
+import re
+import json
+import math
+import hashlib
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Identifier-like runs, then the camelCase / snake_case / digit parts inside them
+_WORD_PATTERN = re.compile(r'[A-Za-z0-9_]+')
+_PART_PATTERN = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Code-aware tokens: each identifier whole plus its camelCase/snake_case parts.
+
+    ``getUserName`` yields ``getusername``, ``get``, ``user``, ``name``;
+    ``GROQ_API_KEY`` yields ``groq_api_key``, ``groq``, ``api``, ``key``.
+    """
+    tokens = []
+    for word in _WORD_PATTERN.findall(text):
+        parts = [part.lower() for part in _PART_PATTERN.findall(word)]
+        whole = word.strip('_').lower()
+        if whole and (len(parts) != 1 or parts[0] != whole):
+            tokens.append(whole)
+        tokens.extend(part for part in parts if len(part) > 1)
+    return tokens
+
+
+@lru_cache(maxsize=1 << 16)
+def term_hash(term: str) -> int:
+    """Stable 63-bit hash used as a term's key in the index"""
+    return int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'little') >> 1
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[int]], k: int = 60) -> List[int]:
+    """Fuse ranked ID lists: each ID scores sum(1 / (k + rank)) over the lists it appears in"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class LexicalIndex:
+    """BM25 inverted index over document IDs.
+
+    Postings are kept in compressed-sparse-row arrays keyed by sorted term
+    hashes, so the index is a handful of flat NumPy arrays that can be
+    memory-mapped. Documents added or removed since the arrays were built
+    live in a small in-memory overlay that is merged in by write().
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        # Compacted postings: term_hashes[t] owns rows offsets[t]:offsets[t+1]
+        self._term_hashes = np.zeros(0, dtype='int64')
+        self._offsets = np.zeros(1, dtype='int64')
+        self._posting_rows = np.zeros(0, dtype='int32')
+        self._posting_tf = np.zeros(0, dtype='uint16')
+        # Per-document columns indexed by posting row
+        self._doc_ids = np.zeros(0, dtype='int64')
+        self._doc_lengths = np.zeros(0, dtype='int32')
+        self._total_length = 0
+
+        # Overlay
+        self._added: Dict[int, Tuple[int, Dict[int, int]]] = {}
+        self._added_postings: Dict[int, Dict[int, int]] = {}
+        self._added_length = 0
+        self._deleted = set()
+        self._deleted_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_ids) - len(self._deleted) + len(self._added)
+
+    def add(self, doc_id: int, text: str):
+        """Index a document's text under its ID"""
+        counts = Counter(tokenize(text))
+        frequencies = {term_hash(term): count for term, count in counts.items()}
+        length = sum(counts.values())
+        self._added[int(doc_id)] = (length, frequencies)
+        self._added_length += length
+        for key, count in frequencies.items():
+            self._added_postings.setdefault(key, {})[int(doc_id)] = count
+
+    def remove(self, doc_ids: Iterable[int]):
+        """Remove documents from the index"""
+        for doc_id in doc_ids:
+            doc_id = int(doc_id)
+            entry = self._added.pop(doc_id, None)
+            if entry is not None:
+                length, frequencies = entry
+                self._added_length -= length
+                for key in frequencies:
+                    postings = self._added_postings[key]
+                    del postings[doc_id]
+                    if not postings:
+                        del self._added_postings[key]
+                continue
+
+            row = self._row(doc_id)
+            if row is not None and doc_id not in self._deleted:
+                self._deleted.add(doc_id)
+                self._deleted_length += int(self._doc_lengths[row])
+
+    def search(self, query: str, k: int = 10, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Top-k (doc_id, BM25 score) pairs for a query, optionally among ``allowed`` IDs only"""
+        n_docs = len(self)
+        if not n_docs:
+            return []
+        avg_length = max((self._total_length - self._deleted_length + self._added_length) / n_docs, 1.0)
+        deleted = np.fromiter(self._deleted, dtype='int64') if self._deleted else None
+
+        all_ids = []
+        all_scores = []
+        for key in {term_hash(term) for term in tokenize(query)}:
+            ids, tf, lengths = self._postings(key, deleted)
+            if not len(ids):
+                continue
+            idf = math.log(1 + (n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            if allowed is not None:
+                # Filter after computing IDF so scores match an unfiltered search
+                keep = np.isin(ids, allowed)
+                ids, tf, lengths = ids[keep], tf[keep], lengths[keep]
+                if not len(ids):
+                    continue
+            norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+            all_ids.append(ids)
+            all_scores.append(idf * tf * (self.k1 + 1) / (tf + norm))
+
+        if not all_ids:
+            return []
+        ids, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        if len(ids) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(ids))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def memory_usage(self) -> int:
+        """Approximate heap bytes of the overlay (compacted arrays are usually mapped)"""
+        postings = sum(len(p) for p in self._added_postings.values())
+        return postings * 120 + len(self._added) * 100 + len(self._deleted) * 40
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def write(self, path: str):
+        """Write the compacted index (overlay merged, deletions dropped) to the directory ``path``"""
+        os.makedirs(path, exist_ok=True)
+
+        live = np.ones(len(self._doc_ids), dtype=bool)
+        if self._deleted:
+            live = ~np.isin(self._doc_ids, np.fromiter(self._deleted, dtype='int64'))
+        added_ids = np.array(sorted(self._added), dtype='int64')
+        doc_ids = np.concatenate([self._doc_ids[live], added_ids])
+        doc_lengths = np.concatenate([self._doc_lengths[live],
+                                      np.array([self._added[i][0] for i in added_ids.tolist()], dtype='int32')])
+        order = np.argsort(doc_ids, kind='stable')
+        doc_ids, doc_lengths = doc_ids[order], doc_lengths[order]
+
+        # Existing postings, re-pointed at rows of the new document columns
+        term_of_posting = np.repeat(self._term_hashes, np.diff(self._offsets))
+        posting_ids = self._doc_ids[self._posting_rows] if len(self._posting_rows) else np.zeros(0, dtype='int64')
+        keep = live[self._posting_rows] if len(self._posting_rows) else np.zeros(0, dtype=bool)
+        terms = [term_of_posting[keep]]
+        ids = [posting_ids[keep]]
+        tfs = [self._posting_tf[keep].astype('int64')]
+
+        for key, postings in self._added_postings.items():
+            terms.append(np.full(len(postings), key, dtype='int64'))
+            ids.append(np.fromiter(postings.keys(), dtype='int64', count=len(postings)))
+            tfs.append(np.fromiter(postings.values(), dtype='int64', count=len(postings)))
+
+        terms = np.concatenate(terms)
+        ids = np.concatenate(ids)
+        tfs = np.minimum(np.concatenate(tfs), np.iinfo('uint16').max).astype('uint16')
+        order = np.lexsort((ids, terms))
+        terms, ids, tfs = terms[order], ids[order], tfs[order]
+
+        term_hashes, counts = np.unique(terms, return_counts=True)
+        offsets = np.zeros(len(term_hashes) + 1, dtype='int64')
+        np.cumsum(counts, out=offsets[1:])
+        rows = np.searchsorted(doc_ids, ids).astype('int32')
+
+        np.save(os.path.join(path, 'term_hashes.npy'), term_hashes.astype('int64'))
+        np.save(os.path.join(path, 'offsets.npy'), offsets)
+        np.save(os.path.join(path, 'posting_rows.npy'), rows)
+        np.save(os.path.join(path, 'posting_tf.npy'), tfs)
+        np.save(os.path.join(path, 'doc_ids.npy'), doc_ids)
+        np.save(os.path.join(path, 'doc_lengths.npy'), doc_lengths)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'k1': self.k1, 'b': self.b, 'total_length': int(doc_lengths.sum())}, f)
+
+    @classmethod
+    def open(cls, path: str) -> 'LexicalIndex':
+        """Memory-map an index written by write()"""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        index = cls(k1=meta['k1'], b=meta['b'])
+        index._total_length = meta['total_length']
+
+        def load(name):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r', allow_pickle=False)
+
+        index._term_hashes = load('term_hashes')
+        index._offsets = load('offsets')
+        index._posting_rows = load('posting_rows')
+        index._posting_tf = load('posting_tf')
+        index._doc_ids = load('doc_ids')
+        index._doc_lengths = load('doc_lengths')
+        return index
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _row(self, doc_id: int):
+        """Row of a compacted document, or None"""
+        row = int(np.searchsorted(self._doc_ids, doc_id))
+        if row < len(self._doc_ids) and self._doc_ids[row] == doc_id:
+            return row
+        return None
+
+    def _postings(self, key: int, deleted) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Live (doc_ids, term frequencies, doc lengths) for a term hash"""
+        ids = []
+        tfs = []
+        lengths = []
+
+        pos = int(np.searchsorted(self._term_hashes, key))
+        if pos < len(self._term_hashes) and self._term_hashes[pos] == key:
+            rows = self._posting_rows[self._offsets[pos]:self._offsets[pos + 1]]
+            posting_ids = self._doc_ids[rows]
+            tf = self._posting_tf[self._offsets[pos]:self._offsets[pos + 1]].astype('float64')
+            posting_lengths = self._doc_lengths[rows].astype('float64')
+            if deleted is not None:
+                keep = ~np.isin(posting_ids, deleted)
+                posting_ids, tf, posting_lengths = posting_ids[keep], tf[keep], posting_lengths[keep]
+            ids.append(posting_ids)
+            tfs.append(tf)
+            lengths.append(posting_lengths)
+
+        added = self._added_postings.get(key)
+        if added:
+            ids.append(np.fromiter(added.keys(), dtype='int64', count=len(added)))
+            tfs.append(np.fromiter(added.values(), dtype='float64', count=len(added)))
+            lengths.append(np.array([self._added[i][0] for i in added], dtype='float64'))
+
+        if not ids:
+            empty = np.zeros(0)
+            return empty.astype('int64'), empty, empty
+        return np.concatenate(ids), np.concatenate(tfs), np.concatenate(lengths)
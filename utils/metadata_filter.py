@@ -0,0 +1,245 @@
+import os
+import json
+import fnmatch
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# File extension → language name used by language filters
+LANGUAGES = {
+    '.py': 'python', '.pyw': 'python', '.pyi': 'python',
+    '.js': 'javascript', '.jsx': 'javascript', '.mjs': 'javascript', '.cjs': 'javascript',
+    '.ts': 'typescript', '.tsx': 'typescript',
+    '.java': 'java', '.kt': 'kotlin', '.kts': 'kotlin', '.scala': 'scala', '.groovy': 'groovy',
+    '.c': 'c', '.h': 'c', '.cc': 'cpp', '.cpp': 'cpp', '.cxx': 'cpp', '.hpp': 'cpp', '.hh': 'cpp',
+    '.cs': 'csharp', '.go': 'go', '.rs': 'rust', '.swift': 'swift', '.m': 'objective-c',
+    '.php': 'php', '.rb': 'ruby', '.pl': 'perl', '.lua': 'lua', '.r': 'r', '.dart': 'dart',
+    '.sh': 'shell', '.bash': 'shell', '.zsh': 'shell', '.ps1': 'powershell',
+    '.html': 'html', '.htm': 'html', '.css': 'css', '.scss': 'css', '.less': 'css',
+    '.vue': 'vue', '.svelte': 'svelte',
+    '.sql': 'sql', '.json': 'json', '.yaml': 'yaml', '.yml': 'yaml', '.toml': 'toml', '.xml': 'xml',
+    '.ini': 'ini', '.cfg': 'ini',
+    '.md': 'markdown', '.markdown': 'markdown', '.rst': 'rst', '.txt': 'text',
+}
+
+# Keys accepted by MetadataFilter.from_dict
+FILTER_KEYS = {'paths', 'exclude_paths', 'languages', 'extensions', 'min_size', 'max_size',
+               'modified_after', 'modified_before'}
+
+
+def language_for(path: str) -> str:
+    """Language name for a file path, or '' if unknown"""
+    name = os.path.basename(path).lower()
+    if name == 'dockerfile':
+        return 'dockerfile'
+    if name == 'makefile':
+        return 'make'
+    return LANGUAGES.get(os.path.splitext(name)[1], '')
+
+
+class MetadataFilter:
+    """File-level search filter: path globs, languages, extensions, size and modification time.
+
+    Every given criterion must match. ``paths`` and ``exclude_paths`` are
+    glob patterns relative to the repository root; a pattern ending in
+    ``/`` matches everything under that directory.
+    """
+
+    def __init__(self, paths: Optional[List[str]] = None, exclude_paths: Optional[List[str]] = None,
+                 languages: Optional[List[str]] = None, extensions: Optional[List[str]] = None,
+                 min_size: Optional[int] = None, max_size: Optional[int] = None,
+                 modified_after: Optional[float] = None, modified_before: Optional[float] = None):
+        self.paths = [self._glob(p) for p in paths or []]
+        self.exclude_paths = [self._glob(p) for p in exclude_paths or []]
+        self.languages = {language.lower() for language in languages or []}
+        self.extensions = {e.lower() if e.startswith('.') else f'.{e.lower()}' for e in extensions or []}
+        self.min_size = min_size
+        self.max_size = max_size
+        self.modified_after = modified_after
+        self.modified_before = modified_before
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> Optional['MetadataFilter']:
+        """Build a filter from API parameters; returns None when there is nothing to filter on.
+
+        Raises ValueError for unknown keys or values of the wrong type.
+        """
+        if not data:
+            return None
+        if not isinstance(data, dict):
+            raise ValueError("Filters must be an object")
+        unknown = set(data) - FILTER_KEYS
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+        def as_list(name):
+            value = data.get(name)
+            if value is None:
+                return None
+            values = [value] if isinstance(value, str) else value
+            if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+                raise ValueError(f"Filter {name} must be a string or a list of strings")
+            return values
+
+        def as_int(name):
+            value = data.get(name)
+            if value is None:
+                return None
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Filter {name} must be a number of bytes")
+
+        def as_timestamp(name):
+            try:
+                return cls._timestamp(data.get(name))
+            except (TypeError, ValueError):
+                raise ValueError(f"Filter {name} must be a Unix timestamp or an ISO 8601 date")
+
+        metadata_filter = cls(
+            paths=as_list('paths'),
+            exclude_paths=as_list('exclude_paths'),
+            languages=as_list('languages'),
+            extensions=as_list('extensions'),
+            min_size=as_int('min_size'),
+            max_size=as_int('max_size'),
+            modified_after=as_timestamp('modified_after'),
+            modified_before=as_timestamp('modified_before'),
+        )
+        return None if metadata_filter.is_empty() else metadata_filter
+
+    def is_empty(self) -> bool:
+        return not (self.paths or self.exclude_paths or self.languages or self.extensions
+                    or self.min_size is not None or self.max_size is not None
+                    or self.modified_after is not None or self.modified_before is not None)
+
+    def key(self) -> str:
+        """Canonical form, for caching"""
+        return json.dumps([sorted(self.paths), sorted(self.exclude_paths), sorted(self.languages),
+                           sorted(self.extensions), self.min_size, self.max_size,
+                           self.modified_after, self.modified_before])
+
+    def matches(self, path: str, size: int, mtime: int) -> bool:
+        """Check one file's metadata against the filter"""
+        path = path.replace('\\', '/')
+        if self.paths and not any(fnmatch.fnmatchcase(path, pattern) for pattern in self.paths):
+            return False
+        if any(fnmatch.fnmatchcase(path, pattern) for pattern in self.exclude_paths):
+            return False
+        if self.extensions and os.path.splitext(path)[1].lower() not in self.extensions:
+            return False
+        if self.languages and language_for(path) not in self.languages:
+            return False
+        if self.min_size is not None and size < self.min_size:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        if self.modified_after is not None and mtime < self.modified_after:
+            return False
+        if self.modified_before is not None and mtime > self.modified_before:
+            return False
+        return True
+
+    @staticmethod
+    def _glob(pattern: str) -> str:
+        pattern = pattern.replace('\\', '/')
+        if pattern.startswith('./'):
+            pattern = pattern[2:]
+        return pattern + '*' if pattern.endswith('/') else pattern
+
+    @staticmethod
+    def _timestamp(value) -> Optional[float]:
+        """Unix timestamp from a number or an ISO 8601 string"""
+        if value is None or value == '':
+            return None
+        if isinstance(value, (int, float)):
+            return float(value)
+        return datetime.fromisoformat(str(value)).timestamp()
+
+
+class FileCatalog:
+    """Per-file metadata and the vector IDs of each file's chunks.
+
+    Filters are evaluated once per file rather than per chunk, and the
+    vector IDs of matching files are handed to FAISS as an ID selector.
+    """
+
+    def __init__(self):
+        # path → {'size', 'mtime', 'ids': np.ndarray}
+        self.files: Dict[str, Dict] = {}
+        self._revision = 0
+        self._cached_key = None
+        self._cached_ids: Optional[np.ndarray] = None
+
+    def add(self, doc_ids: Iterable[int], documents: Iterable[Dict]):
+        """Record the chunks of a batch under their files"""
+        grouped: Dict[str, List[int]] = {}
+        for doc_id, doc in zip(doc_ids, documents):
+            grouped.setdefault(doc['source'], []).append(int(doc_id))
+            entry = self.files.setdefault(doc['source'], {'size': -1, 'mtime': -1,
+                                                           'ids': np.zeros(0, dtype='int64')})
+            entry['size'] = int(doc.get('file_size', entry['size']))
+            entry['mtime'] = int(doc.get('file_mtime', entry['mtime']))
+        for source, ids in grouped.items():
+            entry = self.files[source]
+            entry['ids'] = np.concatenate([entry['ids'], np.asarray(ids, dtype='int64')])
+        self._revision += 1
+
+    def remove(self, doc_ids: Iterable[int], sources: Iterable[str]):
+        """Forget chunks, given their IDs and the files they belong to"""
+        grouped: Dict[str, List[int]] = {}
+        for doc_id, source in zip(doc_ids, sources):
+            grouped.setdefault(source, []).append(int(doc_id))
+        for source, ids in grouped.items():
+            entry = self.files.get(source)
+            if entry is None:
+                continue
+            entry['ids'] = entry['ids'][~np.isin(entry['ids'], ids)]
+            if not len(entry['ids']):
+                del self.files[source]
+        self._revision += 1
+
+    def matching_ids(self, metadata_filter: MetadataFilter) -> np.ndarray:
+        """Vector IDs of every chunk whose file matches the filter"""
+        key = (metadata_filter.key(), self._revision)
+        if key != self._cached_key:
+            matched = [entry['ids'] for path, entry in self.files.items()
+                       if metadata_filter.matches(path, entry['size'], entry['mtime'])]
+            self._cached_ids = np.concatenate(matched) if matched else np.zeros(0, dtype='int64')
+            self._cached_key = key
+        return self._cached_ids
+
+    def ids_by_file(self) -> Dict[str, np.ndarray]:
+        """Path → chunk IDs. ID arrays are replaced rather than modified, so the result is a snapshot"""
+        return {path: entry['ids'] for path, entry in self.files.items()}
+
+    def memory_usage(self) -> int:
+        """Approximate heap bytes (mapped chunk IDs are not counted)"""
+        return sum(200 + (0 if isinstance(entry['ids'], np.memmap) else entry['ids'].nbytes)
+                   for entry in self.files.values())
+
+    def write(self, path: str):
+        """Write file metadata (JSON) and concatenated chunk IDs (.npy) into the directory ``path``"""
+        os.makedirs(path, exist_ok=True)
+        paths = sorted(self.files)
+        entries = [{'path': p, 'size': self.files[p]['size'], 'mtime': self.files[p]['mtime'],
+                    'count': len(self.files[p]['ids'])} for p in paths]
+        ids = [self.files[p]['ids'] for p in paths]
+        np.save(os.path.join(path, 'ids.npy'), np.concatenate(ids) if ids else np.zeros(0, dtype='int64'))
+        with open(os.path.join(path, 'files.json'), 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+
+    @classmethod
+    def open(cls, path: str) -> 'FileCatalog':
+        """Load a catalog written by write(); chunk IDs are memory-mapped"""
+        catalog = cls()
+        with open(os.path.join(path, 'files.json'), encoding='utf-8') as f:
+            entries = json.load(f)
+        ids = np.load(os.path.join(path, 'ids.npy'), mmap_mode='r', allow_pickle=False)
+        offset = 0
+        for entry in entries:
+            catalog.files[entry['path']] = {'size': entry['size'], 'mtime': entry['mtime'],
+                                            'ids': ids[offset:offset + entry['count']]}
+            offset += entry['count']
+        return catalog
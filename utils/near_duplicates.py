@@ -0,0 +1,135 @@
+import os
+import re
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+# Texts with fewer shingles than this only match exact duplicates; their
+# signatures are too coarse to tell "nearly the same" from "different"
+MIN_SHINGLES_FOR_NEAR_MATCH = 32
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """64-bit SimHash of a text's token shingles; similar texts differ in few bits"""
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    if len(tokens) < shingle_size:
+        shingles = [' '.join(tokens)]
+    else:
+        shingles = [' '.join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)]
+
+    digests = b''.join(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest() for s in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(len(shingles), 64)
+    # Majority vote per bit position over all shingle hashes
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority).tobytes(), 'big')
+
+
+def shingle_count(text: str, shingle_size: int = 3) -> int:
+    return max(1, len(_TOKEN_PATTERN.findall(text)) - shingle_size + 1)
+
+
+class DuplicateIndex:
+    """SimHash signatures of stored chunks, searchable by Hamming distance.
+
+    Signatures are split into four 16-bit bands; two signatures within
+    Hamming distance 3 share at least one band exactly, so a lookup only
+    compares against chunks in the query's four band buckets. Buckets are
+    built on first lookup, so opening a persisted index is cheap.
+    """
+
+    BANDS = 4
+    BAND_BITS = 16
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = min(max_distance, self.BANDS - 1)
+        self._signatures: Dict[int, int] = {}
+        self._buckets: Optional[List[Dict[int, set]]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def add(self, doc_id: int, signature: int):
+        with self._lock:
+            self._signatures[int(doc_id)] = signature
+            if self._buckets is not None:
+                for band, bucket in zip(self._bands(signature), self._buckets):
+                    bucket.setdefault(band, set()).add(int(doc_id))
+
+    def remove(self, doc_ids: Iterable[int]):
+        with self._lock:
+            for doc_id in doc_ids:
+                signature = self._signatures.pop(int(doc_id), None)
+                if signature is None or self._buckets is None:
+                    continue
+                for band, bucket in zip(self._bands(signature), self._buckets):
+                    members = bucket.get(band)
+                    if members is not None:
+                        members.discard(int(doc_id))
+                        if not members:
+                            del bucket[band]
+
+    def signature(self, doc_id: int) -> Optional[int]:
+        return self._signatures.get(int(doc_id))
+
+    def find(self, signature: int, exact_only: bool = False) -> Optional[int]:
+        """ID of the closest stored chunk within max_distance bits, or None"""
+        with self._lock:
+            if self._buckets is None:
+                self._build_buckets()
+            candidates = set()
+            for band, bucket in zip(self._bands(signature), self._buckets):
+                candidates.update(bucket.get(band, ()))
+
+            best = None
+            best_distance = 0 if exact_only else self.max_distance
+            for doc_id in sorted(candidates):
+                distance = bin(self._signatures[doc_id] ^ signature).count('1')
+                if distance <= best_distance and (best is None or distance < best[1]):
+                    best = (doc_id, distance)
+            return best[0] if best else None
+
+    def copy(self) -> 'DuplicateIndex':
+        """Independent copy of the signatures (buckets are rebuilt on its first lookup)"""
+        index = DuplicateIndex(self.max_distance)
+        with self._lock:
+            index._signatures = dict(self._signatures)
+        return index
+
+    def memory_usage(self) -> int:
+        return len(self._signatures) * (100 if self._buckets is None else 500)
+
+    def write(self, path: str):
+        """Write IDs and signatures as .npy files into the directory ``path``"""
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            ids = np.fromiter(self._signatures.keys(), dtype='int64', count=len(self._signatures))
+            signatures = np.fromiter(self._signatures.values(), dtype='uint64', count=len(self._signatures))
+        np.save(os.path.join(path, 'ids.npy'), ids)
+        np.save(os.path.join(path, 'signatures.npy'), signatures)
+
+    @classmethod
+    def open(cls, path: str, max_distance: int = 3) -> 'DuplicateIndex':
+        index = cls(max_distance)
+        ids = np.load(os.path.join(path, 'ids.npy'), allow_pickle=False)
+        signatures = np.load(os.path.join(path, 'signatures.npy'), allow_pickle=False)
+        index._signatures = dict(zip(ids.tolist(), signatures.tolist()))
+        return index
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _bands(self, signature: int) -> List[int]:
+        mask = (1 << self.BAND_BITS) - 1
+        return [(signature >> (i * self.BAND_BITS)) & mask for i in range(self.BANDS)]
+
+    def _build_buckets(self):
+        self._buckets = [{} for _ in range(self.BANDS)]
+        for doc_id, signature in self._signatures.items():
+            for band, bucket in zip(self._bands(signature), self._buckets):
+                bucket.setdefault(band, set()).add(doc_id)
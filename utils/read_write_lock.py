@@ -0,0 +1,76 @@
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """Lock shared by any number of readers or held by one writer.
+
+    Waiting writers go ahead of new readers, so a steady stream of searches
+    can't starve ingestion. Both sides are reentrant per thread, and a
+    writer may also read; a reader can't upgrade to writing (that would
+    deadlock against another reader doing the same) and gets RuntimeError.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._waiting_writers = 0
+        # Per-thread nesting depths: {'read': n, 'write': n}
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self):
+        depth = self._depth()
+        if depth['read'] == 0 and depth['write'] == 0:
+            with self._condition:
+                while self._writer is not None or self._waiting_writers:
+                    self._condition.wait()
+                self._readers += 1
+        depth['read'] += 1
+        try:
+            yield
+        finally:
+            depth['read'] -= 1
+            if depth['read'] == 0 and depth['write'] == 0:
+                with self._condition:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        depth = self._depth()
+        if depth['write'] == 0:
+            if depth['read']:
+                raise RuntimeError("Cannot acquire a write lock while holding a read lock")
+            with self._condition:
+                self._waiting_writers += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._condition.wait()
+                finally:
+                    self._waiting_writers -= 1
+                self._writer = threading.get_ident()
+        depth['write'] += 1
+        try:
+            yield
+        finally:
+            depth['write'] -= 1
+            if depth['write'] == 0:
+                with self._condition:
+                    self._writer = None
+                    if depth['read']:
+                        # Still reading inside the released write: keep a reader's share
+                        self._readers += 1
+                    self._condition.notify_all()
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _depth(self):
+        depth = getattr(self._local, 'depth', None)
+        if depth is None:
+            depth = self._local.depth = {'read': 0, 'write': 0}
+        return depth
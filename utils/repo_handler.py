@@ -4,6 +4,7 @@ import zipfile
 import requests
 import tempfile
 import subprocess
+import hashlib
 import concurrent.futures
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
@@ -14,18 +15,64 @@ class RepositoryHandler:
     def __init__(self, max_workers=4):
         self.max_workers = max_workers
         self.extraction_base_dir = os.path.join(os.getcwd(), 'cloned_repo')
+        self.index_base_dir = os.path.join(os.getcwd(), 'index_data')
         os.makedirs(self.extraction_base_dir, exist_ok=True)
     
+    def get_repository_key(self, repo_path_or_url):
+        """Get a stable identifier for a repository path or URL"""
+        if self._is_remote_url(repo_path_or_url):
+            normalized = repo_path_or_url.rstrip('/')
+            if normalized.endswith('.git'):
+                normalized = normalized[:-4]
+        else:
+            normalized = os.path.abspath(repo_path_or_url)
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+    
+    def get_index_dir(self, repo_path_or_url):
+        """Get the directory holding a repository's persisted index data"""
+        return os.path.join(self.index_base_dir, self.get_repository_key(repo_path_or_url))
+    
+    def get_manifest_path(self, repo_path_or_url):
+        """Get the path of the persisted index manifest for a repository"""
+        return os.path.join(self.get_index_dir(repo_path_or_url), 'manifest.json')
+    
     def process_repository(self, repo_path_or_url):
-        """Process a repository and return a list of file paths"""
+        """Process a repository and return a list of file paths
+        
+        This collects every file's content in memory; use IngestionPipeline
+        to stream large repositories (and re-index them incrementally) instead.
+        """
+        final_path, directory_structure = self.prepare_repository(repo_path_or_url)
+        
+        # Process files in parallel
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            file_futures = {}
+            
+            # Get all files in the repository
+            for file_path in self.iter_repository_files(final_path):
+                future = executor.submit(self._process_file, file_path)
+                file_futures[future] = file_path
+            
+            # Collect results
+            results = []
+            for future in concurrent.futures.as_completed(file_futures):
+                file_path = file_futures[future]
+                try:
+                    result = future.result()
+                    if result:
+                        results.append((file_path, result))
+                except Exception as e:
+                    print(f"Error processing {file_path}: {str(e)}")
+        
+        return final_path, directory_structure, results
+    
+    def prepare_repository(self, repo_path_or_url):
+        """Clone, extract or locate a repository and return its path and directory structure"""
         final_path = ""
         directory_structure = {}
         
-        # Clear previous repository contents
-        self._clear_extraction_dir()
-        
         # Determine the repository type and process it
-        if repo_path_or_url.startswith(('http://', 'https://')) and ('github.com' in repo_path_or_url or 'bitbucket.org' in repo_path_or_url or 'gitlab.com' in repo_path_or_url):
+        if self._is_remote_url(repo_path_or_url):
             try:
                 final_path, directory_structure = self.get_remote_repository(repo_path_or_url)
                 if not final_path:
@@ -35,6 +82,8 @@ class RepositoryHandler:
         elif os.path.isfile(repo_path_or_url) and repo_path_or_url.endswith('.zip'):
             # Process ZIP file
             try:
+                # Clear previous extracted contents
+                self._clear_extraction_dir()
                 final_path = self.process_zip_file(repo_path_or_url)
                 directory_structure = self._get_directory_structure_parallel(final_path)
             except Exception as e:
@@ -74,37 +123,25 @@ class RepositoryHandler:
                 
             directory_structure = self._get_directory_structure_parallel(final_path)
         
-        # Process files in parallel
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            file_futures = {}
+        return final_path, directory_structure
+    
+    def iter_repository_files(self, path):
+        """Lazily yield the paths of all indexable files in a repository"""
+        for root, _, files in os.walk(path):
+            # Skip certain directories
+            if any(excluded in root for excluded in ['.git', 'node_modules', '__pycache__', '.streamlit']):
+                continue
             
-            # Get all files in the repository
-            for root, _, files in os.walk(final_path):
-                # Skip certain directories
-                if any(excluded in root for excluded in ['.git', 'node_modules', '__pycache__', '.streamlit']):
+            for file in files:
+                # Skip certain files
+                if file.startswith('.') or file.endswith(('.pyc', '.class', '.o')):
                     continue
                 
-                for file in files:
-                    # Skip certain files
-                    if file.startswith('.') or file.endswith(('.pyc', '.class', '.o')):
-                        continue
-                    
-                    file_path = os.path.join(root, file)
-                    future = executor.submit(self._process_file, file_path)
-                    file_futures[future] = file_path
-            
-            # Collect results
-            results = []
-            for future in concurrent.futures.as_completed(file_futures):
-                file_path = file_futures[future]
-                try:
-                    result = future.result()
-                    if result:
-                        results.append((file_path, result))
-                except Exception as e:
-                    print(f"Error processing {file_path}: {str(e)}")
-        
-        return final_path, directory_structure, results
+                yield os.path.join(root, file)
+    
+    def _is_remote_url(self, repo_path_or_url):
+        """Check if the given path is a supported remote repository URL"""
+        return repo_path_or_url.startswith(('http://', 'https://')) and ('github.com' in repo_path_or_url or 'bitbucket.org' in repo_path_or_url or 'gitlab.com' in repo_path_or_url)
     
     def _clear_extraction_dir(self):
         """Clear previous repository contents"""
@@ -119,11 +156,30 @@ class RepositoryHandler:
             print(f"Error clearing extraction directory: {str(e)}")
     
     def _clone_repo(self, repo_url):
-        """Clone a Git repository and return the path"""
+        """Clone a Git repository and return the path
+        
+        If the repository was cloned before, it is updated in place so that
+        unchanged files keep their mtimes and can be skipped on re-indexing.
+        """
         # Create a destination directory in the extraction base dir
         repo_name = os.path.basename(repo_url.rstrip('/').rstrip('.git'))
         dest_dir = os.path.join(self.extraction_base_dir, repo_name)
         
+        if os.path.isdir(os.path.join(dest_dir, '.git')):
+            try:
+                subprocess.run(["git", "-C", dest_dir, "fetch", "--depth=1", "origin"],
+                              check=True, capture_output=True)
+                subprocess.run(["git", "-C", dest_dir, "reset", "--hard", "FETCH_HEAD"],
+                              check=True, capture_output=True)
+                subprocess.run(["git", "-C", dest_dir, "clean", "-fdx"],
+                              check=True, capture_output=True)
+                return dest_dir
+            except subprocess.CalledProcessError as e:
+                print(f"Failed to update existing clone, re-cloning: {e.stderr.decode('utf-8')}")
+        
+        # Clear previous repository contents
+        self._clear_extraction_dir()
+        
         try:
             # Clone the repository
             subprocess.run(["git", "clone", "--depth=1", repo_url, dest_dir], 
@@ -213,6 +269,9 @@ class RepositoryHandler:
         else:
             raise Exception("Invalid URL: Only GitHub, GitLab, and Bitbucket links are supported.")
 
+        # Clear previous repository contents before extracting the archive
+        self._clear_extraction_dir()
+        
         # Prepare zip path
         zip_path = os.path.join(self.extraction_base_dir, f'{repo_name}.zip')
         
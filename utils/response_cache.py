@@ -0,0 +1,144 @@
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, without trailing punctuation"""
+    return re.sub(r'\s+', ' ', query).strip().lower().rstrip('?!. ')
+
+
+class ResponseCache:
+    """Two-level TTL/LRU cache for chat responses.
+
+    Entries are scoped to an index version, so re-ingesting a repository
+    that changes its content makes old entries unreachable. Lookups first
+    try an exact match on (scope, normalized query, parameters); with a
+    ``similarity_threshold``, they then fall back to the most similar
+    cached query embedding in the same scope and parameters.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600,
+                 similarity_threshold: Optional[float] = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: 'OrderedDict[str, Dict]' = OrderedDict()
+        # (scope, parameters) group → entry key → unit query embedding
+        self._embeddings: Dict[str, Dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, scope: Tuple, query: str, params: Dict) -> Optional[Tuple[Dict, Dict]]:
+        """Exact lookup; returns (value, hit info) or None"""
+        key = self._key(scope, normalize_query(query), params)
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                return None
+            self.exact_hits += 1
+            return entry['value'], {'hit': True, 'type': 'exact', 'age_seconds': round(time.time() - entry['created'], 1)}
+
+    def get_similar(self, scope: Tuple, params: Dict, embedding: np.ndarray) -> Optional[Tuple[Dict, Dict]]:
+        """Near-duplicate lookup by query embedding; counts a miss if nothing is close enough"""
+        with self._lock:
+            group = self._embeddings.get(self._group(scope, params)) if self.similarity_threshold else None
+            if group:
+                keys = list(group)
+                similarities = np.stack([group[k] for k in keys]) @ self._unit(embedding)
+                for i in np.argsort(-similarities):
+                    if similarities[i] < self.similarity_threshold:
+                        break
+                    entry = self._live_entry(keys[i])
+                    if entry is not None:
+                        self.semantic_hits += 1
+                        return entry['value'], {'hit': True, 'type': 'semantic',
+                                                'similarity': round(float(similarities[i]), 4),
+                                                'matched_query': entry['query'],
+                                                'age_seconds': round(time.time() - entry['created'], 1)}
+            self.misses += 1
+            return None
+
+    def put(self, scope: Tuple, query: str, params: Dict, value: Dict, embedding: Optional[np.ndarray] = None):
+        """Cache a response, evicting the least recently used entries past max_entries"""
+        normalized = normalize_query(query)
+        key = self._key(scope, normalized, params)
+        group = self._group(scope, params)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {'value': value, 'query': normalized, 'scope': scope, 'group': group,
+                                  'created': time.time()}
+            if embedding is not None:
+                self._embeddings.setdefault(group, {})[key] = self._unit(embedding)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, index_key: str) -> int:
+        """Drop every entry for a repository index; returns how many were removed"""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry['scope'][0] == index_key]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'exact_hits': self.exact_hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+            }
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _key(scope: Tuple, normalized_query: str, params: Dict) -> str:
+        payload = json.dumps([list(scope), normalized_query, params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _group(scope: Tuple, params: Dict) -> str:
+        return json.dumps([list(scope), params], sort_keys=True, default=str)
+
+    @staticmethod
+    def _unit(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype='float32').ravel()
+        return vector / (np.linalg.norm(vector) + 1e-8)
+
+    def _live_entry(self, key: str) -> Optional[Dict]:
+        """Entry for a key if present and not expired, refreshing its LRU position"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry['created'] > self.ttl_seconds:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        group = self._embeddings.get(entry['group'])
+        if group is not None:
+            group.pop(key, None)
+            if not group:
+                del self._embeddings[entry['group']]
@@ -0,0 +1,341 @@
+import os
+import re
+import ast
+import json
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.metadata_filter import language_for
+
+logger = logging.getLogger(__name__)
+
+# Words that look like calls in C-like languages but are not symbols
+_KEYWORDS = {
+    'if', 'for', 'while', 'switch', 'catch', 'return', 'function', 'sizeof', 'typeof', 'new', 'delete',
+    'else', 'elif', 'do', 'try', 'with', 'await', 'yield', 'super', 'this', 'self', 'print', 'assert',
+    'throw', 'case', 'def', 'class', 'import', 'from', 'func', 'fn', 'match', 'lambda', 'not', 'and', 'or',
+}
+
+# Words that mark the next or previous word in a question as a symbol name
+_CODE_WORDS = {'function', 'method', 'class', 'def', 'func', 'fn', 'constant', 'variable', 'module', 'struct'}
+
+# Definition patterns per language: (regex with the name in group 1, kind)
+_C_LIKE_METHOD = (r'^\s*(?:(?:public|private|protected|internal|static|final|abstract|override|virtual|'
+                  r'async|sealed|synchronized|inline|extern|const|unsafe|open|suspend)\s+)*'
+                  r'[\w<>\[\],.?*&:]+\s+\**(\w+)\s*\([^;]*$', 'function')
+_TYPES = (r'\b(?:class|interface|enum|record|struct|trait|object|union)\s+(\w+)', 'class')
+
+_DEFINITION_PATTERNS = {
+    'javascript': [
+        (r'\bfunction\s*\*?\s*(\w+)\s*\(', 'function'),
+        (r'\bclass\s+(\w+)', 'class'),
+        (r'\b(?:const|let|var)\s+(\w+)\s*=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*=>|\w+\s*=>)', 'function'),
+        (r'^\s*(?:static\s+)?(?:async\s+)?(?:get\s+|set\s+)?(\w+)\s*\([^)]*\)\s*\{', 'method'),
+    ],
+    'typescript': [
+        (r'\bfunction\s*\*?\s*(\w+)\s*[<(]', 'function'),
+        (r'\b(?:class|interface|enum)\s+(\w+)', 'class'),
+        (r'\btype\s+(\w+)\s*(?:<[^>]*>)?\s*=', 'type'),
+        (r'\b(?:const|let|var)\s+(\w+)\s*(?::[^=]+)?=\s*(?:async\s+)?(?:function\b|\([^)]*\)[^=]*=>|\w+\s*=>)',
+         'function'),
+        (r'^\s*(?:(?:public|private|protected|static|readonly|async|abstract)\s+)*(\w+)\s*(?:<[^>]*>)?\([^)]*\)'
+         r'\s*(?::[^{]+)?\{', 'method'),
+    ],
+    'java': [_TYPES, _C_LIKE_METHOD],
+    'kotlin': [_TYPES, (r'\bfun\s+(?:<[^>]*>\s*)?(?:\w+\.)?(\w+)\s*\(', 'function')],
+    'scala': [_TYPES, (r'\bdef\s+(\w+)', 'function')],
+    'csharp': [_TYPES, _C_LIKE_METHOD],
+    'c': [(r'\b(?:struct|enum|union)\s+(\w+)\s*\{', 'class'), (r'^#define\s+(\w+)', 'macro'),
+          (r'^[A-Za-z_][\w\s\*]*?\b(\w+)\s*\([^;]*$', 'function')],
+    'cpp': [(r'\b(?:class|struct|enum(?:\s+class)?|union|namespace)\s+(\w+)\s*[:{]', 'class'),
+            (r'^#define\s+(\w+)', 'macro'),
+            (r'^[A-Za-z_][\w\s\*&:<>,]*?\b(?:\w+::)?(\w+)\s*\([^;]*$', 'function')],
+    'go': [(r'^func\s+(?:\([^)]*\)\s*)?(\w+)', 'function'), (r'^type\s+(\w+)', 'class'),
+           (r'^\s+(\w+)\s+(?:struct|interface)\s*\{', 'class')],
+    'rust': [(r'\bfn\s+(\w+)', 'function'), (r'\b(?:struct|enum|trait|union|type|mod)\s+(\w+)', 'class'),
+             (r'\bmacro_rules!\s*(\w+)', 'macro')],
+    'swift': [(r'\bfunc\s+(\w+)', 'function'), (r'\b(?:class|struct|enum|protocol|extension)\s+(\w+)', 'class')],
+    'ruby': [(r'^\s*def\s+(?:self\.)?(\w+[?!]?)', 'function'), (r'^\s*(?:class|module)\s+(\w+)', 'class')],
+    'php': [(r'\bfunction\s+(\w+)\s*\(', 'function'), (r'\b(?:class|interface|trait|enum)\s+(\w+)', 'class')],
+    'lua': [(r'\bfunction\s+(?:[\w.]+[.:])?(\w+)\s*\(', 'function')],
+    'shell': [(r'^\s*(?:function\s+)?(\w+)\s*\(\)\s*\{', 'function'), (r'^\s*function\s+(\w+)', 'function')],
+    'dart': [_TYPES, _C_LIKE_METHOD],
+}
+# Markup whose inline scripts are worth indexing
+for _language in ('html', 'vue', 'svelte'):
+    _DEFINITION_PATTERNS[_language] = _DEFINITION_PATTERNS['javascript']
+_DEFINITION_PATTERNS = {language: [(re.compile(pattern), kind) for pattern, kind in patterns]
+                        for language, patterns in _DEFINITION_PATTERNS.items()}
+
+# Reference patterns for regex-parsed languages: calls, instantiation and inheritance
+_REFERENCE_PATTERN = re.compile(r'\b([A-Za-z_]\w*)\s*(?:\(|<[^<>()]*>\s*\()|'
+                                r'\b(?:new|extends|implements|instanceof)\s+([A-Za-z_]\w*)')
+_IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*')
+
+
+def extract_symbols(rel_path: str, content: str) -> Tuple[List[Dict], Dict[str, List[int]]]:
+    """Definitions and references of symbols in a file.
+
+    Python is parsed with ``ast``; other languages use line-based regex
+    patterns. Returns (definitions, references) where each definition has
+    ``name``, ``kind``, ``line``, ``end_line`` and ``parent`` (enclosing class
+    or None), and references map a name to the lines it is used on.
+    """
+    language = language_for(rel_path)
+    if language == 'python':
+        try:
+            return _extract_python(content)
+        except (SyntaxError, ValueError, RecursionError):
+            pass
+    if language == 'python' or language in _DEFINITION_PATTERNS:
+        return _extract_regex(content, language)
+    return [], {}
+
+
+def _extract_python(content: str) -> Tuple[List[Dict], Dict[str, List[int]]]:
+    tree = ast.parse(content)
+    definitions = []
+    references: Dict[str, set] = {}
+
+    def visit(node, parent: Optional[str], in_function: bool):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.ClassDef):
+                definitions.append(_definition(child.name, 'class', child, parent))
+                visit(child, child.name, in_function)
+                continue
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                definitions.append(_definition(child.name, 'method' if parent and not in_function else 'function',
+                                               child, parent))
+                visit(child, parent, True)
+                continue
+            if not in_function and isinstance(child, (ast.Assign, ast.AnnAssign)):
+                # Module and class level constants/attributes
+                targets = child.targets if isinstance(child, ast.Assign) else [child.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        definitions.append(_definition(target.id, 'variable', child, parent))
+            if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load):
+                references.setdefault(child.id, set()).add(child.lineno)
+            elif isinstance(child, ast.Attribute) and isinstance(child.ctx, ast.Load):
+                references.setdefault(child.attr, set()).add(child.lineno)
+            elif isinstance(child, ast.ImportFrom):
+                for alias in child.names:
+                    references.setdefault(alias.name, set()).add(child.lineno)
+            visit(child, parent, in_function)
+
+    visit(tree, None, False)
+    return definitions, {name: sorted(lines) for name, lines in references.items()}
+
+
+def _definition(name: str, kind: str, node, parent: Optional[str]) -> Dict:
+    return {'name': name, 'kind': kind, 'line': node.lineno,
+            'end_line': getattr(node, 'end_lineno', None) or node.lineno, 'parent': parent}
+
+
+def _extract_regex(content: str, language: str) -> Tuple[List[Dict], Dict[str, List[int]]]:
+    patterns = _DEFINITION_PATTERNS.get(language, [])
+    definitions = []
+    references: Dict[str, set] = {}
+
+    for line_no, line in enumerate(content.split('\n'), start=1):
+        defined = set()
+        for pattern, kind in patterns:
+            match = pattern.search(line)
+            if match and match.group(1) not in _KEYWORDS and match.group(1) not in defined:
+                defined.add(match.group(1))
+                definitions.append({'name': match.group(1), 'kind': kind, 'line': line_no,
+                                    'end_line': line_no, 'parent': None})
+        for match in _REFERENCE_PATTERN.finditer(line):
+            name = match.group(1) or match.group(2)
+            if name not in _KEYWORDS and name not in defined:
+                references.setdefault(name, set()).add(line_no)
+
+    return definitions, {name: sorted(lines) for name, lines in references.items()}
+
+
+class SymbolIndex:
+    """Persisted per-repository table of symbol definitions and references.
+
+    Entries are stored per file so incremental ingestion can replace a
+    changed file's symbols; name → file maps are kept in memory for
+    lookups. Safe to update from several reader threads.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        # rel_path → {'definitions': [...], 'references': {name: [lines]}}
+        self.files: Dict[str, Dict] = {}
+        self._defined_in: Dict[str, set] = {}
+        self._referenced_in: Dict[str, set] = {}
+        # Lowercased name → names, for case-insensitive lookups; rebuilt after changes
+        self._lowercase: Optional[Dict[str, List[str]]] = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path: str) -> 'SymbolIndex':
+        """Load a symbol index from disk, or return an empty one if missing or unreadable"""
+        index = cls(path)
+        if not os.path.exists(path):
+            return index
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == cls.VERSION:
+                for rel_path, entry in data.get('files', {}).items():
+                    index._set_file(rel_path, entry)
+        except Exception as e:
+            logger.warning(f"Error loading symbol index {path}: {str(e)}")
+        return index
+
+    def save(self):
+        """Write the index to disk atomically"""
+        if not self.path:
+            return
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.VERSION, 'files': self.files}, f)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self._defined_in)
+
+    def has_file(self, rel_path: str) -> bool:
+        return rel_path in self.files
+
+    def update_file(self, rel_path: str, content: str):
+        """Replace a file's symbols with those extracted from its content"""
+        definitions, references = extract_symbols(rel_path, content) if content else ([], {})
+        with self._lock:
+            self._remove_file(rel_path)
+            self._set_file(rel_path, {'definitions': definitions, 'references': references})
+
+    def remove_file(self, rel_path: str):
+        with self._lock:
+            self._remove_file(rel_path)
+
+    def retain(self, rel_paths: Iterable[str]) -> int:
+        """Drop every file not in ``rel_paths``; returns how many were dropped"""
+        keep = set(rel_paths)
+        with self._lock:
+            removed = [rel_path for rel_path in self.files if rel_path not in keep]
+            for rel_path in removed:
+                self._remove_file(rel_path)
+        return len(removed)
+
+    def lookup(self, symbol: str, kind: Optional[str] = None, limit: int = 100, ignore_case: bool = True) -> Dict:
+        """Definitions and references of a symbol.
+
+        ``symbol`` is a name or ``Parent.name``; if nothing matches exactly
+        and ``ignore_case`` is set, the lookup is retried case-insensitively.
+        """
+        parent, _, name = symbol.rpartition('.')
+        with self._lock:
+            if name in self._defined_in or name in self._referenced_in:
+                names = [name]
+            elif ignore_case:
+                names = self._lowercase_names().get(name.lower(), [])
+            else:
+                names = []
+
+            definitions = []
+            references = []
+            for candidate in names:
+                for rel_path in sorted(self._defined_in.get(candidate, ())):
+                    for definition in self.files[rel_path]['definitions']:
+                        if definition['name'] != candidate or (kind and definition['kind'] != kind):
+                            continue
+                        if parent and definition['parent'] != parent:
+                            continue
+                        definitions.append(dict(definition, path=rel_path))
+                for rel_path in sorted(self._referenced_in.get(candidate, ())):
+                    for line in self.files[rel_path]['references'][candidate]:
+                        references.append({'name': candidate, 'path': rel_path, 'line': line})
+
+        return {
+            'symbol': symbol,
+            'definitions': definitions[:limit],
+            'references': references[:limit],
+            'total_definitions': len(definitions),
+            'total_references': len(references),
+        }
+
+    def find_in_text(self, text: str, max_symbols: int = 3) -> List[Dict]:
+        """Definitions of symbols mentioned in free text, e.g. a chat question.
+
+        Only exact-case matches count. Tokens that look like identifiers
+        (``snake_case``, ``camelCase``, ``Capitalized``, dotted) match any
+        definition; plain lowercase words only match a function or class when
+        written as code (in backticks, followed by ``(``, or next to a word
+        like "function" or "method"), so prose like "get" doesn't match.
+        """
+        found = []
+        seen = set()
+        for match in _IDENTIFIER_PATTERN.finditer(text):
+            if len(found) >= max_symbols:
+                break
+            token = match.group(0)
+            name = token.rpartition('.')[2]
+            if token in seen or len(name) < 3 or name.lower() in _KEYWORDS:
+                continue
+            seen.add(token)
+
+            identifier_like = '.' in token or '_' in name or name != name.lower()
+            if not identifier_like and not self._written_as_code(text, match.start(), match.end()):
+                continue
+            definitions = [d for d in self.lookup(token, limit=5, ignore_case=False)['definitions']
+                           if identifier_like or d['kind'] in ('class', 'function', 'method')]
+            if definitions:
+                found.append({'symbol': token, 'definitions': definitions})
+        return found
+
+    @staticmethod
+    def _written_as_code(text: str, start: int, end: int) -> bool:
+        if text[start - 1:start] == '`' or text[end:end + 1] in ('(', '`'):
+            return True
+        before = text[:start].split()[-1:]
+        after = text[end:].split()[:1]
+        return any(word.lower().strip('.,?') in _CODE_WORDS for word in before + after)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _lowercase_names(self) -> Dict[str, List[str]]:
+        if self._lowercase is None:
+            self._lowercase = {}
+            for name in set(self._defined_in) | set(self._referenced_in):
+                self._lowercase.setdefault(name.lower(), []).append(name)
+        return self._lowercase
+
+    def _set_file(self, rel_path: str, entry: Dict):
+        self._lowercase = None
+        self.files[rel_path] = entry
+        for definition in entry['definitions']:
+            self._defined_in.setdefault(definition['name'], set()).add(rel_path)
+        for name in entry['references']:
+            self._referenced_in.setdefault(name, set()).add(rel_path)
+
+    def _remove_file(self, rel_path: str):
+        entry = self.files.pop(rel_path, None)
+        if entry is None:
+            return
+        self._lowercase = None
+        for definition in entry['definitions']:
+            self._discard(self._defined_in, definition['name'], rel_path)
+        for name in entry['references']:
+            self._discard(self._referenced_in, name, rel_path)
+
+    @staticmethod
+    def _discard(mapping: Dict[str, set], name: str, rel_path: str):
+        paths = mapping.get(name)
+        if paths is not None:
+            paths.discard(rel_path)
+            if not paths:
+                del mapping[name]
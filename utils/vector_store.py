@@ -1,36 +1,376 @@
+import os
+import time
+import uuid
+import json
+import math
+import shutil
+import logging
+import functools
+import threading
 import faiss
 import numpy as np
-from typing import List, Dict
-import pickle
+from typing import List, Dict, Iterable, Optional, Tuple
+
+from utils.document_table import DocumentTable
+from utils.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from utils.metadata_filter import FileCatalog, MetadataFilter
+from utils.near_duplicates import DuplicateIndex
+from utils.read_write_lock import ReadWriteLock
+
+logger = logging.getLogger(__name__)
+
+
+def _reads(method):
+    """Run a VectorStore method under the store's shared lock"""
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock.read():
+            return method(self, *args, **kwargs)
+    return locked
+
+
+def _writes(method):
+    """Run a VectorStore method under the store's exclusive lock"""
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock.write():
+            return method(self, *args, **kwargs)
+    return locked
+
+
+def maximal_marginal_relevance(query: np.ndarray, candidates: np.ndarray, lambda_mult: float = 0.5,
+                               k: Optional[int] = None) -> List[int]:
+    """Order candidate vectors by maximal marginal relevance.
+
+    Each step picks the candidate maximizing
+    ``lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, picked))``
+    with cosine similarity; returns candidate positions in pick order.
+    """
+    vectors = np.asarray(candidates, dtype='float32')
+    vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-8)
+    query = np.asarray(query, dtype='float32').ravel()
+    relevance = vectors @ (query / (np.linalg.norm(query) + 1e-8))
+    similarity = vectors @ vectors.T
+
+    n = len(vectors)
+    k = n if k is None else min(k, n)
+    redundancy = np.zeros(n, dtype='float32')
+    available = np.ones(n, dtype=bool)
+    order = []
+    for _ in range(k):
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        order.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return order
+
 
 class VectorStore:
-    def __init__(self, dimension: int = 768):
+    """FAISS-backed document store with pluggable index types.
+
+    Supported index types are ``flat`` (exact), ``ivf_flat``, ``ivf_pq`` and
+    ``hnsw``. Approximate indexes are trained on a sample of the stored
+    vectors. A flat store is promoted to ``promote_to`` automatically once it
+    holds ``auto_promote_threshold`` vectors. With ``metric='cosine'``
+    vectors are L2-normalized and searched by inner product.
+
+    Document text is also kept in a BM25 LexicalIndex; searches that pass the
+    query text fuse lexical and vector rankings with reciprocal rank fusion.
+    A FileCatalog of per-file metadata lets searches be restricted with a
+    MetadataFilter, applied inside FAISS through an ID selector.
+
+    Near-duplicate chunks can be stored as aliases of a representative: they
+    get a document ID but no vector, and are reported with the representative
+    in search results. They are not in the lexical index either: BM25 finds
+    them through the representative's text (which is what lets a filtered
+    search return an alias), so terms of an alias's own file path don't
+    match it.
+
+    The store can be searched while an ingestion job updates it: searches
+    share ``lock`` and every change holds it exclusively, so a search sees
+    the store before or after a batch, never halfway through one.
+    """
+
+    INDEX_TYPES = ('flat', 'ivf_flat', 'ivf_pq', 'hnsw')
+    METRICS = ('l2', 'cosine', 'ip')
+
+    # On-disk format written by save()
+    FORMAT = 'vector_store'
+    FORMAT_VERSION = 4
+
+    # Training sample size per IVF list, and the cap on the whole sample
+    TRAINING_POINTS_PER_LIST = 39
+    MAX_TRAINING_POINTS = 100000
+
+    def __init__(self, dimension: int = 768, index_type: str = 'flat', metric: str = 'l2',
+                 auto_promote_threshold: Optional[int] = 100000, promote_to: str = 'ivf_flat',
+                 nprobe: int = 16, hnsw_m: int = 32, ef_search: int = 64, pq_m: Optional[int] = None,
+                 hybrid: bool = True, rrf_k: int = 60):
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(f"Unknown index type: {index_type}")
+        if promote_to not in self.INDEX_TYPES:
+            raise ValueError(f"Unknown index type: {promote_to}")
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+
         self.dimension = dimension
-        self.index = faiss.IndexFlatL2(dimension)
-        self.documents: List[Dict] = []
+        self.metric = metric
+        self.auto_promote_threshold = auto_promote_threshold
+        self.promote_to = promote_to
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.pq_m = pq_m or self._default_pq_m(dimension)
+        self.hybrid = hybrid
+        self.rrf_k = rrf_k
+
+        self.documents = DocumentTable()
+        self.lexical = LexicalIndex()
+        self.files = FileCatalog()
+        self.duplicates = DuplicateIndex()
+        # Alias document ID → representative ID, and representative → alias IDs
+        self._alias_of: Dict[int, int] = {}
+        self._aliases: Dict[int, List[int]] = {}
+        self._next_id = 0
+        # Changes whenever documents are added or removed; identifies the indexed content
+        self._generation = uuid.uuid4().hex[:12]
+        self._revision = 0
+        # IDs of vectors whose documents were removed but that are still in the index (HNSW, IVF)
+        self._tombstones = set()
+        self._trained_size = 1
+
+        # Index types that need training start flat and are rebuilt once there is data
+        self.index_type = 'flat'
+        self.index = self._create_index('flat', 0)
+        self._target_index_type = index_type
+        # Set while the index is memory-mapped from this file and therefore read-only
+        self._mapped_index_path: Optional[str] = None
+        # Searches share it; anything that changes the store (or reassigns its parts) holds it alone
+        self.lock = ReadWriteLock()
+        # Concurrent searches may both find an IVF index without the direct map MMR needs
+        self._direct_map_lock = threading.Lock()
 
-    def add_documents(self, documents: List[Dict], embeddings: np.ndarray):
-        """Add documents and their embeddings to the store"""
+    @_writes
+    def add_documents(self, documents: List[Dict], embeddings: np.ndarray,
+                      signatures: Optional[List[int]] = None) -> List[int]:
+        """Add documents and their embeddings to the store and return their vector IDs.
+
+        ``signatures`` are the documents' SimHash values, recorded so later
+        near-duplicates can be stored as aliases of these documents.
+        """
         if len(documents) != embeddings.shape[0]:
             raise ValueError("Number of documents must match number of embeddings")
 
-        self.index.add(embeddings)
-        self.documents.extend(documents)
+        self._ensure_writable()
+        ids = np.arange(self._next_id, self._next_id + len(documents), dtype='int64')
+        self.index.add_with_ids(self._prepare(embeddings), ids)
+        self._next_id += len(documents)
+
+        for doc_id, doc in zip(ids.tolist(), documents):
+            self.documents[doc_id] = doc
+            # File paths are searchable too, so "repo_handler" finds utils/repo_handler.py
+            self.lexical.add(doc_id, f"{doc.get('source', '')}\n{doc['content']}")
+        self.files.add(ids.tolist(), documents)
+        for doc_id, signature in zip(ids.tolist(), signatures or []):
+            self.duplicates.add(doc_id, signature)
+
+        self._revision += 1
+        self._maybe_promote()
+        return ids.tolist()
+
+    @_writes
+    def add_aliases(self, representative_id: int, documents: List[Dict]) -> List[int]:
+        """Store near-duplicates of a stored document without vectors and return their IDs"""
+        representative_id = int(representative_id)
+        if representative_id not in self.documents or representative_id in self._alias_of:
+            raise ValueError(f"No representative document with ID {representative_id}")
+
+        ids = list(range(self._next_id, self._next_id + len(documents)))
+        self._next_id += len(documents)
+        for doc_id, doc in zip(ids, documents):
+            self.documents[doc_id] = doc
+            self._alias_of[doc_id] = representative_id
+        self._aliases.setdefault(representative_id, []).extend(ids)
+        self.files.add(ids, documents)
+        self._revision += 1
+        return ids
+
+    @_writes
+    def remove_documents(self, ids: Iterable[int]) -> int:
+        """Remove documents by vector ID and return how many were removed"""
+        ids = [int(i) for i in ids if int(i) in self.documents]
+        if not ids:
+            return 0
+
+        self._ensure_writable()
+        # Aliases have no vector; representatives hand theirs to a surviving alias
+        vector_ids = []
+        for doc_id in ids:
+            representative_id = self._alias_of.pop(doc_id, None)
+            if representative_id is None:
+                vector_ids.append(doc_id)
+                continue
+            self._aliases[representative_id].remove(doc_id)
+            if not self._aliases[representative_id]:
+                del self._aliases[representative_id]
+        for doc_id in vector_ids:
+            if doc_id in self._aliases:
+                self._promote_alias(doc_id)
+
+        if self.index_type != 'flat':
+            # HNSW graphs can't delete vectors, and IVF lists don't renumber on removal, which
+            # would misalign the ID map; search skips IDs without a document instead
+            self._tombstones.update(vector_ids)
+        else:
+            self.index.remove_ids(np.asarray(vector_ids, dtype='int64'))
+        self.files.remove(ids, [self.documents[doc_id]['source'] for doc_id in ids])
+        for doc_id in ids:
+            del self.documents[doc_id]
+        self.lexical.remove(ids)
+        self.duplicates.remove(ids)
+        self._revision += 1
+
+        if len(self._tombstones) > 0.2 * self.index.ntotal:
+            self.rebuild(self.index_type)
+        return len(ids)
+
+    def _promote_alias(self, representative_id: int):
+        """Move a representative's vector to its first alias before the representative is removed"""
+        promoted, *rest = self._aliases.pop(representative_id)
+        vector = self._reconstruct([representative_id])
+        self.index.add_with_ids(vector, np.asarray([promoted], dtype='int64'))
+        doc = self.documents[promoted]
+        self.lexical.add(promoted, f"{doc.get('source', '')}\n{doc['content']}")
+        signature = self.duplicates.signature(representative_id)
+        if signature is not None:
+            self.duplicates.add(promoted, signature)
+        del self._alias_of[promoted]
+        for doc_id in rest:
+            self._alias_of[doc_id] = promoted
+        if rest:
+            self._aliases[promoted] = rest
+
+    @property
+    def version(self) -> str:
+        """Opaque identifier of the current indexed content, for cache keys"""
+        return f"{self._generation}-{self._revision}"
 
-    def search(self, query_embedding: np.ndarray, k: int = 3, max_chars: int = 2000):
-        """Search for similar documents with content length limit"""
-        query_embedding = query_embedding.reshape(1, -1)
-        # Get more results initially to filter by content length
-        distances, indices = self.index.search(query_embedding, k * 2)
+    @_reads
+    def has_documents(self) -> bool:
+        """Check if the store contains any documents"""
+        return bool(self.documents)
+
+    @_reads
+    def has_ids(self, ids: Iterable[int]) -> bool:
+        """Check that every given vector ID is present in the store"""
+        return all(int(i) in self.documents for i in ids)
+
+    @_reads
+    def holds_exactly(self, ids: Iterable[int]) -> bool:
+        """Check that the store holds the given vector IDs and no others"""
+        ids = set(int(i) for i in ids)
+        return len(ids) == len(self.documents) and self.has_ids(ids)
+
+    @_writes
+    def clear(self):
+        """Remove every document and vector, keeping the configuration; IDs are not reused"""
+        self.documents = DocumentTable()
+        self.lexical = LexicalIndex()
+        self.files = FileCatalog()
+        self.duplicates = DuplicateIndex()
+        self._alias_of = {}
+        self._aliases = {}
+        self._tombstones = set()
+        self._trained_size = 1
+        self.index_type = 'flat'
+        self.index = self._create_index('flat', 0)
+        self._mapped_index_path = None
+        self._generation = uuid.uuid4().hex[:12]
+        self._revision = 0
+
+    def search(self, query_embedding: np.ndarray, k: int = 3, max_chars: Optional[int] = 2000,
+               query_text: Optional[str] = None, filters: Optional[MetadataFilter] = None,
+               mmr_lambda: Optional[float] = None):
+        """Search for similar documents with content length limit (None for no limit).
+
+        With ``query_text`` (and hybrid search enabled) the vector ranking is
+        fused with a BM25 ranking of the same query. With ``filters`` only
+        chunks of matching files are considered. With ``mmr_lambda`` the
+        candidates are re-ranked by maximal marginal relevance: 1.0 is pure
+        relevance, lower values favour results unlike those already picked.
+        """
+        return self.search_batch(np.asarray(query_embedding).reshape(1, -1), k=k, filters=filters,
+                                 max_chars=max_chars, query_texts=[query_text], mmr_lambda=mmr_lambda)[0]
+
+    @_reads
+    def search_batch(self, query_embeddings: np.ndarray, k: int = 3, filters: Optional[MetadataFilter] = None,
+                     max_chars: Optional[int] = None, query_texts: Optional[List[Optional[str]]] = None,
+                     mmr_lambda: Optional[float] = None) -> List[List[Dict]]:
+        """Search for several queries with one FAISS call; returns one result list per query.
+
+        ``query_texts`` (one per query, or None) enables hybrid ranking and
+        ``mmr_lambda`` diversity re-ranking as in search(); ``filters``
+        applies to every query.
+        """
+        query_embeddings = np.atleast_2d(query_embeddings)
+        allowed = None
+        allowed_aliases = None
+        if filters is not None and not filters.is_empty():
+            allowed = self.files.matching_ids(filters)
+            if not len(allowed):
+                return [[] for _ in range(len(query_embeddings))]
+            if self._alias_of:
+                # Aliases have no vectors; search their representatives and report the alias
+                # unless the representative matches the filter itself
+                allowed_aliases = {}
+                for doc_id in allowed.tolist():
+                    if doc_id in self._alias_of:
+                        allowed_aliases.setdefault(self._alias_of[doc_id], doc_id)
+                if allowed_aliases:
+                    representatives = np.fromiter(allowed_aliases, dtype='int64')
+                    for representative_id in representatives[np.isin(representatives, allowed)].tolist():
+                        del allowed_aliases[representative_id]
+                    allowed = np.union1d(allowed, representatives)
+
+        query_texts = query_texts or [None] * len(query_embeddings)
+        hybrid = self.hybrid and any(query_texts)
+        diversify = mmr_lambda is not None and mmr_lambda < 1
+        candidates = max(k * 4, 20) if hybrid or diversify else k * 2
+        vector_rankings = self._vector_rankings(query_embeddings, candidates, allowed)
+
+        results = []
+        for query_embedding, ranking, query_text in zip(query_embeddings, vector_rankings, query_texts):
+            if query_text and self.hybrid:
+                ranking = reciprocal_rank_fusion([
+                    ranking,
+                    [doc_id for doc_id, _ in self.lexical.search(query_text, candidates, allowed)],
+                ], k=self.rrf_k)
+            if diversify and len(ranking) > 1:
+                ranking = ranking[:candidates]
+                order = maximal_marginal_relevance(self._prepare(query_embedding.reshape(1, -1))[0],
+                                                   self._reconstruct(ranking), mmr_lambda)
+                ranking = [ranking[i] for i in order]
+            results.append(self._collect(ranking, k, max_chars, allowed_aliases))
+        return results
 
+    def _collect(self, ranked: Iterable[int], k: int, max_chars: Optional[int],
+                 allowed_aliases: Optional[Dict[int, int]] = None) -> List[Dict]:
+        """Top-k documents of a ranking whose total content fits in max_chars"""
         results = []
         total_chars = 0
 
-        for idx in indices[0]:
-            if idx < len(self.documents):
-                doc = self.documents[idx]
+        for idx in ranked:
+            idx = int(idx)
+            if allowed_aliases and idx in allowed_aliases:
+                # The representative is outside the filter; its alias is not
+                idx = allowed_aliases[idx]
+            doc = self.documents.get(idx)
+            if doc is not None and idx in self._aliases:
+                doc = dict(doc, aliases=self._alias_locations(idx))
+            if doc is not None:
                 content_length = len(doc['content'])
-                if total_chars + content_length <= max_chars:
+                if max_chars is None or total_chars + content_length <= max_chars:
                     results.append(doc)
                     total_chars += content_length
                     if len(results) >= k:
@@ -38,14 +378,396 @@ class VectorStore:
 
         return results
 
+    def _alias_locations(self, representative_id: int) -> List[Dict]:
+        """Where a representative's near-duplicates are, for citations"""
+        locations = []
+        for doc_id in self._aliases.get(representative_id, []):
+            doc = self.documents[doc_id]
+            locations.append({'source': doc['source'], 'start_line': doc.get('start_line'),
+                              'end_line': doc.get('end_line')})
+        return locations
+
+    @_reads
+    def documents_at(self, locations: Iterable[Tuple[str, int]],
+                     filters: Optional[MetadataFilter] = None) -> List[Dict]:
+        """Chunks containing the given (source, line) locations, in order and without duplicates"""
+        allowed = None
+        if filters is not None and not filters.is_empty():
+            allowed = self.files.matching_ids(filters)
+
+        results = []
+        found = set()
+        for source, line in locations:
+            entry = self.files.files.get(source)
+            if entry is None:
+                continue
+            ids = entry['ids'] if allowed is None else entry['ids'][np.isin(entry['ids'], allowed)]
+            for doc_id in ids.tolist():
+                doc = self.documents.get(doc_id)
+                if doc is not None and doc.get('start_line', 1) <= line <= doc.get('end_line', line):
+                    if doc_id not in found:
+                        found.add(doc_id)
+                        results.append(doc)
+                    break
+        return results
+
+    def _vector_ranking(self, query_embedding: np.ndarray, n: int,
+                        allowed: Optional[np.ndarray] = None) -> List[int]:
+        """IDs of the nearest n live vectors (among ``allowed`` IDs, if given), best first"""
+        return self._vector_rankings(query_embedding.reshape(1, -1), n, allowed)[0]
+
+    def _vector_rankings(self, query_embeddings: np.ndarray, n: int,
+                         allowed: Optional[np.ndarray] = None) -> List[List[int]]:
+        """_vector_ranking for a matrix of queries, in a single index search"""
+        query_embeddings = self._prepare(query_embeddings)
+        fetch = min(max(self.index.ntotal, 1), n)
+        # Selectors are checked during the scan, so filtered results need no overfetch
+        if allowed is not None:
+            # Only live documents are in the file catalog
+            selector = faiss.IDSelectorBatch(np.ascontiguousarray(allowed, dtype='int64'))
+            _, indices = self.index.search(query_embeddings, fetch, params=self._search_params(selector))
+        elif self._tombstones:
+            excluded = faiss.IDSelectorBatch(np.fromiter(self._tombstones, dtype='int64'))
+            selector = faiss.IDSelectorNot(excluded)
+            _, indices = self.index.search(query_embeddings, fetch, params=self._search_params(selector))
+        else:
+            _, indices = self.index.search(query_embeddings, fetch)
+
+        return [[i for i in row if i >= 0] for row in indices.tolist()]
+
+    def _search_params(self, selector) -> 'faiss.SearchParameters':
+        """Per-query search parameters carrying an ID selector and the index's nprobe / efSearch"""
+        if self.index_type == 'hnsw':
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+        if self.index_type in ('ivf_flat', 'ivf_pq'):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        return faiss.SearchParameters(sel=selector)
+
+    @_reads
+    def memory_usage(self) -> int:
+        """Approximate heap bytes held by the store; memory-mapped data is not counted"""
+        n_vectors = self.index.ntotal
+        # ID map
+        per_vector = 8
+        if self.index_type == 'hnsw':
+            # Level-0 neighbour lists (2*M links) are read into memory even when mapped
+            per_vector += self.hnsw_m * 2 * 4
+        if not self._mapped_index_path:
+            if self.index_type == 'ivf_pq':
+                per_vector += self.pq_m + 8
+            else:
+                per_vector += self.dimension * 4 + (8 if self.index_type == 'ivf_flat' else 0)
+        return (self.documents.memory_usage() + self.lexical.memory_usage() + self.files.memory_usage()
+                + self.duplicates.memory_usage() + len(self._alias_of) * 150 + n_vectors * per_vector)
+
+    # ------------------------------------------------------------------
+    # Index construction
+    # ------------------------------------------------------------------
+
+    @_writes
+    def rebuild(self, index_type: Optional[str] = None):
+        """Rebuild the index (optionally as a different type), training on a sample of the stored vectors"""
+        index_type = index_type or self._target_index_type
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(f"Unknown index type: {index_type}")
+
+        vectors, ids = self._stored_vectors()
+        if index_type != 'flat' and len(ids) < self._min_training_points(index_type):
+            # Not enough data to train yet; stay exact until there is
+            logger.warning(f"Only {len(ids)} vectors, keeping a flat index instead of {index_type}")
+            index_type = 'flat'
+
+        index = self._create_index(index_type, len(ids))
+        if not index.is_trained:
+            sample = vectors
+            if len(vectors) > self.MAX_TRAINING_POINTS:
+                rng = np.random.default_rng(0)
+                sample = vectors[rng.choice(len(vectors), self.MAX_TRAINING_POINTS, replace=False)]
+            index.train(sample)
+        if len(ids):
+            index.add_with_ids(vectors, ids)
+
+        self.index = index
+        self.index_type = index_type
+        self._trained_size = max(len(ids), 1)
+        self._tombstones = set()
+        self._apply_search_params()
+
+    def _maybe_promote(self):
+        """Switch to an approximate index once there is enough data, and retrain IVF as it grows"""
+        n_vectors = self.index.ntotal
+        if self.index_type == 'flat':
+            if self._target_index_type != 'flat':
+                target = self._target_index_type
+            elif self.auto_promote_threshold and n_vectors >= self.auto_promote_threshold:
+                target = self.promote_to
+            else:
+                return
+            if target != 'flat' and n_vectors >= self._min_training_points(target):
+                self.rebuild(target)
+        elif self.index_type in ('ivf_flat', 'ivf_pq') and n_vectors >= 4 * self._trained_size:
+            # Coarse lists trained on a small store get overloaded; retrain at each 4x growth
+            self.rebuild(self.index_type)
+
+    def _create_index(self, index_type: str, n_vectors: int):
+        """Build an empty, ID-mapped FAISS index of the given type"""
+        faiss_metric = faiss.METRIC_L2 if self.metric == 'l2' else faiss.METRIC_INNER_PRODUCT
+        if index_type == 'flat':
+            description = 'Flat'
+        elif index_type == 'ivf_flat':
+            description = f'IVF{self._nlist(n_vectors)},Flat'
+        elif index_type == 'ivf_pq':
+            description = f'IVF{self._nlist(n_vectors)},PQ{self.pq_m}'
+        else:
+            description = f'HNSW{self.hnsw_m}'
+        index = faiss.index_factory(self.dimension, description, faiss_metric)
+        if index_type == 'ivf_pq':
+            # Polysemous codes are only used for Hamming pre-filtering and dominate training time
+            faiss.downcast_index(index).do_polysemous_training = False
+        return faiss.IndexIDMap2(index)
+
+    def _apply_search_params(self):
+        """Set nprobe / efSearch on the underlying index"""
+        inner = faiss.downcast_index(self.index.index)
+        if isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = self.ef_search
+        else:
+            try:
+                faiss.extract_index_ivf(inner).nprobe = self.nprobe
+            except RuntimeError:
+                pass
+
+    def _nlist(self, n_vectors: int) -> int:
+        """Number of IVF lists: about 4 * sqrt(n), with enough points per list to train"""
+        return max(1, min(int(4 * math.sqrt(max(n_vectors, 1))), n_vectors // self.TRAINING_POINTS_PER_LIST))
+
+    def _min_training_points(self, index_type: str) -> int:
+        """Smallest number of vectors an index type can sensibly be trained on"""
+        if index_type == 'ivf_flat':
+            return self.TRAINING_POINTS_PER_LIST
+        if index_type == 'ivf_pq':
+            # 8-bit PQ codebooks have 256 centroids per sub-quantizer
+            return 256 * self.TRAINING_POINTS_PER_LIST
+        if index_type == 'hnsw':
+            return 1
+        return 0
+
+    @staticmethod
+    def _default_pq_m(dimension: int) -> int:
+        """Largest sub-quantizer count <= dimension / 8 that divides the dimension"""
+        for m in range(max(1, dimension // 8), 0, -1):
+            if dimension % m == 0:
+                return m
+        return 1
+
+    def _prepare(self, embeddings: np.ndarray) -> np.ndarray:
+        """Convert to contiguous float32, normalizing for cosine similarity"""
+        vectors = np.array(embeddings, dtype='float32', order='C', copy=True)
+        if self.metric == 'cosine':
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _stored_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Reconstruct the vectors and IDs of all live documents from the index"""
+        self._ensure_writable()
+        ids = faiss.vector_to_array(self.index.id_map).astype('int64')
+        if not len(ids):
+            return np.zeros((0, self.dimension), dtype='float32'), ids
+
+        inner = self._enable_reconstruction()
+        vectors = inner.reconstruct_n(0, inner.ntotal)
+
+        live = self.documents.contains_many(ids)
+        return np.ascontiguousarray(vectors[live]), ids[live]
+
+    def _enable_reconstruction(self):
+        """Return the underlying index, giving IVF indexes the direct map they need to reconstruct vectors"""
+        inner = faiss.downcast_index(self.index.index)
+        try:
+            ivf = faiss.extract_index_ivf(inner)
+        except RuntimeError:
+            return inner
+        with self._direct_map_lock:
+            if ivf.direct_map.no():
+                ivf.make_direct_map()
+        return inner
+
+    def _reconstruct(self, ids: List[int]) -> np.ndarray:
+        """Stored (prepared) vectors for the given vector IDs"""
+        self._enable_reconstruction()
+        return self.index.reconstruct_batch(np.asarray(ids, dtype='int64'))
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+
+    @_writes
+    def evaluate(self, query_embeddings: np.ndarray, k: int = 10,
+                 ground_truth: Optional[np.ndarray] = None) -> Dict:
+        """Measure recall@k against exact search, per-query latency and batched throughput.
+
+        ``ground_truth`` holds the true top-k vector IDs per query. Without it,
+        exact search runs over the vectors reconstructed from the index, so for
+        IVF-PQ recall is relative to the quantized vectors.
+        """
+        queries = self._prepare(np.atleast_2d(query_embeddings))
+        if ground_truth is not None:
+            truth_ids = np.atleast_2d(ground_truth)[:, :k]
+            k = truth_ids.shape[1]
+            n_vectors = len(self.documents)
+        else:
+            vectors, ids = self._stored_vectors()
+            k = min(k, len(ids))
+            n_vectors = len(ids)
+            if k:
+                exact = faiss.IndexFlat(self.dimension,
+                                        faiss.METRIC_L2 if self.metric == 'l2' else faiss.METRIC_INNER_PRODUCT)
+                exact.add(vectors)
+                _, truth = exact.search(queries, k)
+                truth_ids = ids[truth]
+        if not k:
+            return {'index_type': self.index_type, 'vectors': 0, 'k': 0, 'recall_at_k': 0.0}
+
+        latencies = []
+        found = []
+        for query in queries:
+            start = time.perf_counter()
+            _, result = self.index.search(query.reshape(1, -1), k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append(result[0])
+
+        # The same queries as one batched call, which FAISS runs as a matrix multiply
+        start = time.perf_counter()
+        self.index.search(queries, k)
+        batch_seconds = time.perf_counter() - start
+
+        recall = np.mean([len(set(f.tolist()) & set(t.tolist())) / k for f, t in zip(found, truth_ids)])
+        return {
+            'index_type': self.index_type,
+            'metric': self.metric,
+            'vectors': int(n_vectors),
+            'k': k,
+            'recall_at_k': round(float(recall), 4),
+            'latency_ms': {
+                'mean': round(float(np.mean(latencies)), 4),
+                'p50': round(float(np.percentile(latencies, 50)), 4),
+                'p95': round(float(np.percentile(latencies, 95)), 4),
+                'p99': round(float(np.percentile(latencies, 99)), 4),
+            },
+            'batch_queries_per_second': round(len(queries) / batch_seconds, 1) if batch_seconds else None,
+        }
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    @_reads
     def save(self, path: str):
-        """Save vector store to disk"""
-        faiss.write_index(self.index, f"{path}.index")
-        with open(f"{path}.docs", 'wb') as f:
-            pickle.dump(self.documents, f)
-
-    def load(self, path: str):
-        """Load vector store from disk"""
-        self.index = faiss.read_index(f"{path}.index")
-        with open(f"{path}.docs", 'rb') as f:
-            self.documents = pickle.load(f)
\ No newline at end of file
+        """Save the vector store to the directory ``path``.
+
+        The directory holds a versioned ``meta.json``, the FAISS index and
+        the document columns. It is written next to ``path`` and swapped in,
+        so stores that have the previous version mapped keep working.
+        """
+        path = os.path.abspath(path)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        index_file = os.path.join(tmp_path, 'index.faiss')
+        if self._mapped_index_path:
+            # A mapped index is unchanged since it was loaded; IVF lists mapped
+            # from disk can't be re-serialized, so copy the file instead
+            shutil.copyfile(self._mapped_index_path, index_file)
+        else:
+            faiss.write_index(self.index, index_file)
+        self.documents.write(os.path.join(tmp_path, 'documents'))
+        self.lexical.write(os.path.join(tmp_path, 'lexical'))
+        self.files.write(os.path.join(tmp_path, 'files'))
+        np.save(os.path.join(tmp_path, 'tombstones.npy'), np.array(sorted(self._tombstones), dtype='int64'))
+        self.duplicates.write(os.path.join(tmp_path, 'duplicates'))
+        np.save(os.path.join(tmp_path, 'aliases.npy'),
+                np.array(sorted(self._alias_of.items()), dtype='int64').reshape(-1, 2))
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({
+                'format': self.FORMAT,
+                'version': self.FORMAT_VERSION,
+                'dimension': self.dimension,
+                'metric': self.metric,
+                'index_type': self.index_type,
+                'target_index_type': self._target_index_type,
+                'next_id': self._next_id,
+                'generation': self._generation,
+                'revision': self._revision,
+                'documents': len(self.documents),
+                'tombstones': len(self._tombstones),
+                'trained_size': self._trained_size,
+            }, f, indent=2)
+
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+        if self._mapped_index_path:
+            self._mapped_index_path = os.path.join(path, 'index.faiss')
+
+    @_writes
+    def load(self, path: str, mmap: bool = True):
+        """Load a vector store saved by save().
+
+        With ``mmap`` the index and document columns are memory-mapped rather
+        than read, so loading is near-instant and the page cache is shared
+        between processes. The index is copied into memory on first change.
+        """
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != self.FORMAT or meta.get('version') != self.FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector store format in {path}: "
+                             f"{meta.get('format')} version {meta.get('version')}")
+
+        index_file = os.path.join(os.path.abspath(path), 'index.faiss')
+        self.index_type = meta['index_type']
+        if mmap:
+            self.index = faiss.read_index(index_file, self._mmap_flags(self.index_type))
+            self._mapped_index_path = index_file
+        else:
+            self.index = faiss.read_index(index_file)
+            self._mapped_index_path = None
+
+        self.documents = DocumentTable.open(os.path.join(path, 'documents'))
+        self.lexical = LexicalIndex.open(os.path.join(path, 'lexical'))
+        self.files = FileCatalog.open(os.path.join(path, 'files'))
+        self.duplicates = DuplicateIndex.open(os.path.join(path, 'duplicates'))
+        self._alias_of = {}
+        self._aliases = {}
+        for alias_id, representative_id in np.load(os.path.join(path, 'aliases.npy')).tolist():
+            self._alias_of[alias_id] = representative_id
+            self._aliases.setdefault(representative_id, []).append(alias_id)
+        self.dimension = meta['dimension']
+        self.metric = meta['metric']
+        self._target_index_type = meta['target_index_type']
+        self._next_id = meta['next_id']
+        self._generation = meta.get('generation', uuid.uuid4().hex[:12])
+        self._revision = meta.get('revision', 0)
+        tombstones_file = os.path.join(path, 'tombstones.npy')
+        self._tombstones = set(np.load(tombstones_file).tolist()) if os.path.exists(tombstones_file) else set()
+        self._trained_size = meta['trained_size']
+        self._apply_search_params()
+
+    @staticmethod
+    def _mmap_flags(index_type: str) -> int:
+        """faiss.read_index flags that map the bulk of an index instead of reading it"""
+        if index_type in ('ivf_flat', 'ivf_pq'):
+            # Inverted lists are mapped straight from the index file
+            return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        # Flat and HNSW vector storage
+        return faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+    def _ensure_writable(self):
+        """Read a memory-mapped index fully into memory before it is modified"""
+        if self._mapped_index_path:
+            self.index = faiss.read_index(self._mapped_index_path)
+            self._mapped_index_path = None
+            self._apply_search_params()